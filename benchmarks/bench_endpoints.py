@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Load test for the main console and API endpoints.
+
+Seeds a database with a synthetic inventory (see synthetic.py), then sends a
+fixed number of requests to each endpoint from a pool of threads and records
+the latency of every request. Requests go through the Flask test client by
+default, or over HTTP to a running server (e.g. gunicorn) with --url. The
+results are written to a JSON report with throughput and p50/p95/p99 latency
+per endpoint; pass an earlier report as --baseline to print the change.
+
+Example:
+    # In-process, 100k certificates, 8 concurrent clients
+    python benchmarks/bench_endpoints.py --certificates 100000 --concurrency 8 --output before.json
+
+    # Against gunicorn sharing a pre-seeded database, compared with a previous run
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/synthetic.py --certificates 1000000
+    DATABASE_URL=sqlite:////tmp/bench.db gunicorn -w 4 -b 127.0.0.1:8000 main:app &
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/bench_endpoints.py --url http://127.0.0.1:8000 \\
+        --certificates 0 --servers 0 --baseline before.json --output after.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from harness import ROOT, database_url, prepare
+
+STATUSES = (None, 'valid', 'expiring', 'expired', 'revoked')
+ENDPOINTS = ('index', 'list_certificates', 'api_certificates', 'get_certificate',
+             'issue_certificate', 'revoke_certificate')
+
+
+class Workload:
+    """Builds the request for the n-th call to each endpoint."""
+
+    def __init__(self, cert_ids, revocable_ids, key_spec, seed):
+        self.cert_ids = cert_ids
+        self.revocable_ids = revocable_ids
+        self.key_type, _, key_bits = key_spec.partition(':')
+        self.key_bits = int(key_bits or 0)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def request(self, endpoint, n):
+        """Return ``(method, path, query, json_body)``."""
+        with self.lock:
+            if endpoint == 'index':
+                return 'GET', '/', None, None
+            if endpoint == 'list_certificates':
+                return 'GET', '/certificates', None, None
+            if endpoint == 'api_certificates':
+                query = {'limit': 100}
+                status = self.rng.choice(STATUSES)
+                if status:
+                    query['status'] = status
+                if self.rng.random() < 0.5:
+                    query['sort'] = 'valid_until'
+                return 'GET', '/api/v1/certificates', query, None
+            if endpoint == 'get_certificate':
+                return 'GET', f'/api/v1/certificates/{self.rng.choice(self.cert_ids)}', None, None
+            if endpoint == 'issue_certificate':
+                return 'POST', '/api/v1/certificates/issue', None, {
+                    'common_name': f'bench-{n}-{self.rng.randrange(10 ** 9)}.example.com',
+                    'role': 'server',
+                    'ttl': '8760h',
+                    'key_type': self.key_type,
+                    'key_bits': self.key_bits,
+                }
+            if endpoint == 'revoke_certificate':
+                # Each id is revoked once so every call takes the success path
+                cert_id = self.revocable_ids.pop() if self.revocable_ids else self.rng.choice(self.cert_ids)
+                return 'POST', f'/api/v1/certificates/{cert_id}/revoke', None, {'reason': 'superseded'}
+        raise ValueError(f'Unknown endpoint: {endpoint}')
+
+
+class TestClientTransport:
+    """Calls the application in-process, one test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def send(self, method, path, query, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, query_string=query, json=body)
+        size = len(response.get_data())
+        response.close()
+        return response.status_code, size
+
+
+class HTTPTransport:
+    """Calls a running server, one keep-alive session per thread."""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+
+    def send(self, method, path, query, body):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        response = session.request(method, self.base_url + path, params=query, json=body, timeout=300)
+        return response.status_code, len(response.content)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_endpoint(transport, workload, endpoint, requests_count, concurrency):
+    latencies = []
+    statuses = Counter()
+    sizes = []
+    lock = threading.Lock()
+
+    def call(n):
+        method, path, query, body = workload.request(endpoint, n)
+        started = time.perf_counter()
+        try:
+            status, size = transport.send(method, path, query, body)
+        except Exception as err:
+            status, size = type(err).__name__, 0
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] += 1
+            sizes.append(size)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+    ms = [value * 1000 for value in latencies]
+    return {
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'errors': errors,
+        'status_codes': dict(statuses),
+        'elapsed_seconds': round(wall, 3),
+        'throughput_rps': round(requests_count / wall, 1),
+        'latency_ms': {
+            'min': round(ms[0], 3),
+            'mean': round(sum(ms) / len(ms), 3),
+            'p50': round(percentile(ms, 50), 3),
+            'p95': round(percentile(ms, 95), 3),
+            'p99': round(percentile(ms, 99), 3),
+            'max': round(ms[-1], 3),
+        },
+        'mean_response_bytes': round(sum(sizes) / len(sizes)),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(endpoint, result, baseline=None):
+    latency = result['latency_ms']
+    line = (f"{endpoint:<20} {result['throughput_rps']:9.1f} req/s  p50 {latency['p50']:9.2f} ms  "
+            f"p95 {latency['p95']:9.2f} ms  p99 {latency['p99']:9.2f} ms  errors {result['errors']}")
+    if baseline:
+        old = baseline['latency_ms']['p95']
+        line += (f"  | throughput {(result['throughput_rps'] / baseline['throughput_rps'] - 1) * 100:+.0f}%"
+                 f", p95 {(latency['p95'] / old - 1) * 100:+.0f}%" if old else '')
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the console and API endpoints')
+    parser.add_argument('--certificates', type=int, default=10000,
+                        help='Synthetic certificates to add before the run (default: 10000)')
+    parser.add_argument('--servers', type=int, default=100, help='Synthetic Vault servers to add (default: 100); with --certificates 0, '
+                             'the database is used as is')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f"Comma-separated endpoints to run (default: {','.join(ENDPOINTS)})")
+    parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint (default: 500)')
+    parser.add_argument('--page-requests', type=int, default=20,
+                        help='Requests for the full-table HTML pages (index, list_certificates) (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint first (default: 5)')
+    parser.add_argument('--url', help='Base URL of a running server; the Flask test client is used otherwise')
+    parser.add_argument('--key-spec', default='rsa:2048', help='key_type:key_bits for issuance (default: rsa:2048)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    parser.add_argument('--output', default='bench-endpoints.json', help='Report file (default: bench-endpoints.json)')
+    parser.add_argument('--baseline', help='Earlier report to compare against')
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(',') if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    prepare(DATABASE_URL=database_url(parser, args.url))
+    from main import app, db, Certificate, REVOCABLE_STATUSES, init_database, key_pool
+    from synthetic import seed_inventory
+
+    with app.app_context():
+        init_database()
+        if args.certificates or args.servers:
+            started = time.perf_counter()
+            seed_inventory(args.certificates, args.servers, args.seed)
+            print(f"Seeded {args.certificates:,} certificates and {args.servers:,} servers "
+                  f"in {time.perf_counter() - started:.1f}s")
+        total = db.session.scalar(db.select(db.func.count()).select_from(Certificate))
+        cert_ids = db.session.scalars(
+            db.select(Certificate.id).order_by(db.func.random()).limit(10000)
+        ).all()
+        revoke_budget = (args.requests + args.warmup) if 'revoke_certificate' in endpoints else 0
+        revocable_ids = db.session.scalars(
+            db.select(Certificate.id)
+            .where(Certificate.status.in_(REVOCABLE_STATUSES))
+            .order_by(db.func.random())
+            .limit(revoke_budget)
+        ).all()
+
+    transport = HTTPTransport(args.url) if args.url else TestClientTransport(app)
+    workload = Workload(cert_ids, list(revocable_ids), args.key_spec, args.seed)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file).get('endpoints', {})
+
+    print(f"{total:,} certificates, {args.concurrency} concurrent clients, "
+          f"{'HTTP ' + args.url if args.url else 'Flask test client'}")
+    results = {}
+    try:
+        for endpoint in endpoints:
+            count = args.page_requests if endpoint in ('index', 'list_certificates') else args.requests
+            for n in range(args.warmup):
+                transport.send(*workload.request(endpoint, n))
+            results[endpoint] = run_endpoint(transport, workload, endpoint, count, args.concurrency)
+            print_result(endpoint, results[endpoint], baseline.get(endpoint))
+    finally:
+        key_pool.shutdown()
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'database': os.environ['DATABASE_URL'].split(':', 1)[0],
+        'transport': 'http' if args.url else 'test_client',
+        'certificates': total,
+        'concurrency': args.concurrency,
+        'endpoints': results,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
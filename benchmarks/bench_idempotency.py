@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Concurrent duplicate issuance benchmark.
+
+Fires bursts of identical issuance requests at the same time, with and
+without an Idempotency-Key, and reports how long each burst takes, how
+many responses were replayed or coalesced and how many certificates it
+issued. Bursts without a key are only coalesced when the server runs with
+ISSUE_COALESCING=1. What each burst must return is checked in
+tests/test_idempotency.py.
+
+Requests go through the Flask test client by default, or over HTTP to a
+running server with --url.
+
+Example:
+    python benchmarks/bench_idempotency.py --duplicates 500 --rounds 5
+
+    # Against gunicorn, so duplicates also land on different workers
+    flask --app main init-db
+    gunicorn -w 4 --threads 16 -b 127.0.0.1:8000 main:app &
+    python benchmarks/bench_idempotency.py --url http://127.0.0.1:8000 --duplicates 500
+"""
+
+import argparse
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import database_url, prepare
+
+ISSUE_PATH = '/api/v1/certificates/issue'
+
+
+class TestClientTransport:
+    """Calls the application in-process, one test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, path, body, headers):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.post(path, json=body, headers=headers)
+        result = response.status_code, response.headers.get('Idempotent-Replayed') == 'true', response.get_json()
+        response.close()
+        return result
+
+
+class HTTPTransport:
+    """Calls a running server, one keep-alive session per thread."""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+
+    def post(self, path, body, headers):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        response = session.post(self.base_url + path, json=body, headers=headers, timeout=300)
+        return response.status_code, response.headers.get('Idempotent-Replayed') == 'true', response.json()
+
+
+def burst(transport, executor, count, body, key):
+    """Send ``count`` copies of one request at once and return the responses with their latencies."""
+    headers = {'Idempotency-Key': key} if key else {}
+    start = threading.Event()
+
+    def send():
+        start.wait()
+        started = time.perf_counter()
+        status, was_replayed, response = transport.post(ISSUE_PATH, body, headers)
+        return status, was_replayed, response, time.perf_counter() - started
+
+    futures = [executor.submit(send) for _ in range(count)]
+    start.set()
+    return [future.result() for future in futures]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time bursts of concurrent duplicate issuance requests')
+    parser.add_argument('--duplicates', type=int, default=200, help='Identical requests per burst (default: 200)')
+    parser.add_argument('--rounds', type=int, default=3, help='Bursts with and without a key (default: 3)')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent clients (default: 64)')
+    parser.add_argument('--url', help='Base URL of a running server; the Flask test client is used otherwise')
+    parser.add_argument('--key-spec', default='rsa:2048', help='key_type:key_bits for issuance (default: rsa:2048)')
+    args = parser.parse_args()
+
+    prepare(DATABASE_URL=database_url(parser, args.url))
+    from main import app, db, Certificate, init_database, key_pool
+
+    with app.app_context():
+        init_database()
+
+    def certificate_count():
+        with app.app_context():
+            return db.session.scalar(db.select(db.func.count()).select_from(Certificate))
+
+    transport = HTTPTransport(args.url) if args.url else TestClientTransport(app)
+    key_type, _, key_bits = args.key_spec.partition(':')
+    run_id = uuid.uuid4().hex[:8]
+
+    def timed_burst(executor, body, key):
+        """Send one burst and return its responses, wall time and the certificates it issued."""
+        before = certificate_count()
+        started = time.perf_counter()
+        responses = burst(transport, executor, args.duplicates, body, key)
+        return responses, time.perf_counter() - started, certificate_count() - before
+
+    def report(label, responses, elapsed, issued):
+        statuses = Counter(status for status, _, _, _ in responses)
+        shared = sum(1 for _, was_replayed, _, _ in responses if was_replayed)
+        latencies = [seconds for _, _, _, seconds in responses]
+        print(f"{label}: {dict(statuses)} in {elapsed:.2f}s, {len(responses) / elapsed:.0f} requests/s, "
+              f"p50 {percentile(latencies, 0.5) * 1e3:.0f}ms p99 {percentile(latencies, 0.99) * 1e3:.0f}ms, "
+              f"{shared} shared, {issued} issued")
+
+    print(f"{args.duplicates} duplicates per burst, {args.concurrency} concurrent clients, "
+          f"{'HTTP ' + args.url if args.url else 'Flask test client'}")
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for n in range(args.rounds):
+                body = {'common_name': f'idem-{run_id}-{n}.example.com', 'role': 'server', 'ttl': '720h',
+                        'key_type': key_type, 'key_bits': int(key_bits or 0)}
+                report(f"keyed round {n}", *timed_burst(executor, body, f'bench-{run_id}-{n}'))
+                unkeyed_body = dict(body, common_name=f'idem-{run_id}-{n}-nokey.example.com')
+                report(f"unkeyed round {n}", *timed_burst(executor, unkeyed_body, None))
+    finally:
+        key_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
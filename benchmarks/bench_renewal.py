@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Fleet renewal planner and pipeline benchmark.
+
+Seeds a throwaway SQLite database with a synthetic inventory plus a wave of
+certificates that all expire within a few minutes of each other, then runs
+the renewal commands through the Flask CLI runner and reports how long
+``plan-renewals`` takes with and without --dry-run, its load curve, and
+how fast ``renew-certificates`` works off a backlog of due renewals. The
+planner and pipeline rules are checked in tests/test_renewal.py.
+
+Example:
+    python benchmarks/bench_renewal.py --certificates 100000 --wave 20000 --backlog 2000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from harness import prepare, sqlite_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the renewal planner and the bulk renewal pipeline')
+    parser.add_argument('--certificates', type=int, default=20000,
+                        help='Synthetic certificates besides the wave (default: 20000)')
+    parser.add_argument('--wave', type=int, default=5000, help='Certificates in the wave (default: 5000)')
+    parser.add_argument('--wave-minutes', type=int, default=10,
+                        help='Minutes the wave expires within (default: 10)')
+    parser.add_argument('--wave-expires-in', type=float, default=20, help='Days until the wave expires (default: 20)')
+    parser.add_argument('--rate', type=float, default=2, help='Planned renewals per second (default: 2)')
+    parser.add_argument('--backlog', type=int, default=1000,
+                        help='Renewals made due at once to exercise the pipeline (default: 1000)')
+    parser.add_argument('--run-rate', type=float, default=200,
+                        help='Rate limit of renew-certificates (default: 200)')
+    parser.add_argument('--workers', type=int, default=8, help='renew-certificates workers (default: 8)')
+    parser.add_argument('--key-spec', default='ec:256', help='key_type:key_bits of new keys (default: ec:256)')
+    args = parser.parse_args()
+
+    prepare(DATABASE_URL=sqlite_url('renewal.db'), KEY_POOL_PREWARM='')
+    from main import (app, db, Certificate, CertificateName, RenewalTask, init_database, key_pool, name_rows,
+                      refresh_certificate_stats, _bump_version, _create_issuers)
+    from synthetic import seed_inventory
+
+    with app.app_context():
+        init_database()
+        seed_inventory(args.certificates, 0)
+        # The wave: one onboarding day's certificates, expiring within minutes
+        issuer = 'Vault Intermediate CA'
+        issuer_id = _create_issuers([issuer])[issuer]
+        first_id = db.session.scalar(db.select(db.func.max(Certificate.id))) + 1
+        expires = datetime.now() + timedelta(days=args.wave_expires_in)
+        rows, names = [], []
+        for offset in range(args.wave):
+            cert_id = first_id + offset
+            valid_until = expires + timedelta(seconds=offset * args.wave_minutes * 60 / max(args.wave, 1))
+            common_name = f'wave-{cert_id}.svc.cluster.local'
+            rows.append({'id': cert_id, 'name': f'wave-{cert_id}', 'common_name': common_name, 'issuer': issuer,
+                         'issuer_id': issuer_id, 'valid_from': valid_until - timedelta(days=90),
+                         'valid_until': valid_until, 'status': 'valid'})
+            names.extend(name_rows(cert_id, common_name, [f'alt-{cert_id}.svc.cluster.local']))
+        db.session.execute(db.insert(Certificate), rows)
+        db.session.execute(db.insert(CertificateName), names)
+        _bump_version('certificates')
+        refresh_certificate_stats()
+
+    runner = app.test_cli_runner()
+
+    def invoke(*command):
+        started = time.perf_counter()
+        result = runner.invoke(args=list(command))
+        elapsed = time.perf_counter() - started
+        if result.exception:
+            raise result.exception
+        return result.output, elapsed
+
+    rate = str(args.rate)
+    try:
+        print(f"{args.certificates} certificates and a wave of {args.wave} expiring within "
+              f"{args.wave_minutes} minutes in {args.wave_expires_in:g} days, {rate}/s")
+
+        output, elapsed = invoke('plan-renewals', '--dry-run', '--rate', rate)
+        print('\n'.join('    ' + line for line in output.splitlines()))
+        print(f"dry run in {elapsed:.2f}s")
+        _, elapsed = invoke('plan-renewals', '--rate', rate)
+        print(f"plan stored in {elapsed:.2f}s")
+
+        with app.app_context():
+            backlog = db.session.scalars(db.select(RenewalTask.certificate_id)
+                                         .order_by(RenewalTask.scheduled_at).limit(args.backlog)).all()
+            db.session.execute(db.update(RenewalTask).where(RenewalTask.certificate_id.in_(backlog))
+                               .values(scheduled_at=datetime.now() - timedelta(hours=1)))
+            db.session.commit()
+        output, elapsed = invoke('renew-certificates', '--once', '--rate', str(args.run_rate),
+                                 '--workers', str(args.workers), '--key-spec', args.key_spec)
+        print('    ' + output.splitlines()[-1])
+        print(f"{len(backlog)} due renewals in {elapsed:.2f}s, {len(backlog) / elapsed:.1f} renewals/s "
+              f"at up to {args.run_rate:g}/s")
+
+        _, elapsed = invoke('plan-renewals', '--rate', rate)
+        print(f"replanned in {elapsed:.2f}s")
+    finally:
+        key_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
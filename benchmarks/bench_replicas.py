@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Read replica routing benchmark.
+
+Runs the application against a primary and one read replica and times the
+replica-read endpoints served from the replica and, with the replica taken
+out of rotation, from the primary, as well as the monitor's health check.
+The routing rules themselves are checked in tests/test_replicas.py.
+
+By default both databases are SQLite files in a temporary directory and
+the replica is brought up to date by copying the primary over it with the
+SQLite backup API. With --primary and --replica pointing at a real primary
+and replica (e.g. PostgreSQL streaming replication), replication is left
+to the database.
+
+Example:
+    python benchmarks/bench_replicas.py --certificates 50000
+
+    python benchmarks/bench_replicas.py --primary postgresql://localhost/pki \\
+        --replica postgresql://localhost:5433/pki --certificates 0
+"""
+
+import argparse
+import logging
+import sqlite3
+import tempfile
+import time
+
+from harness import prepare, sqlite_url
+
+PATHS = ('/api/v1/certificates?limit=50', '/api/v1/certificates?limit=50&sort=valid_until',
+         '/api/v1/servers', '/', '/certificates')
+
+
+def sqlite_path(url):
+    return url[len('sqlite:///'):] if url.startswith('sqlite:///') else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time replica-read endpoints on a read replica and on the primary')
+    parser.add_argument('--primary', help='Primary database URL (default: a temporary SQLite file)')
+    parser.add_argument('--replica', help='Replica database URL (default: a temporary SQLite file)')
+    parser.add_argument('--certificates', type=int, default=20000,
+                        help='Synthetic certificates to add to the primary first (default: 20000)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and database (default: 200)')
+    parser.add_argument('--catch-up-timeout', type=float, default=30,
+                        help='Seconds to wait for a real replica to catch up (default: 30)')
+    args = parser.parse_args()
+    if bool(args.primary) != bool(args.replica):
+        parser.error('--primary and --replica go together')
+
+    directory = tempfile.mkdtemp()
+    primary_url = args.primary or sqlite_url('primary.db', directory)
+    replica_url = args.replica or sqlite_url('replica.db', directory)
+    simulated = sqlite_path(primary_url) is not None and sqlite_path(replica_url) is not None
+    # Checks are run by the script, and nothing lags long enough to matter
+    prepare(DATABASE_URL=primary_url, DATABASE_REPLICA_URLS=replica_url, REPLICA_CHECK_INTERVAL='3600',
+            REPLICA_MAX_LAG='3600', KEY_POOL_PREWARM='')
+    from main import app, init_database, key_pool, replica_pool
+    from synthetic import seed_inventory
+
+    with app.app_context():
+        init_database()
+        if args.certificates:
+            seed_inventory(args.certificates, 10)
+    replica = replica_pool.replicas[0]
+    # Taking the replica out of rotation and back is deliberate here
+    logging.getLogger('replicas').setLevel(logging.ERROR)
+
+    if simulated:
+        source = sqlite3.connect(sqlite_path(primary_url))
+        target = sqlite3.connect(sqlite_path(replica_url))
+        source.backup(target)
+        source.close()
+        target.close()
+    deadline = time.monotonic() + args.catch_up_timeout
+    while True:
+        started = time.perf_counter()
+        replica_pool.check()
+        check_seconds = time.perf_counter() - started
+        if replica.healthy and replica.lag == 0 or time.monotonic() > deadline:
+            break
+        time.sleep(0.2)
+    if not replica.healthy:
+        parser.exit(1, f"Replica did not catch up: {replica.error or f'lag {replica.lag}'}\n")
+
+    def timed(client, path):
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            client.get(path).close()
+        return (time.perf_counter() - started) / args.requests * 1000
+
+    print(f"primary {primary_url}\nreplica {replica_url}\n"
+          f"{args.certificates} certificates, {args.requests} requests per endpoint; health check {check_seconds * 1000:.1f}ms")
+    print(f"{'endpoint':<50} {'replica ms':>10} {'primary ms':>10}")
+    try:
+        client = app.test_client()
+        for path in PATHS:
+            client.get(path).close()
+            on_replica = timed(client, path)
+            replica_pool.mark_down(replica, 'benchmark')
+            on_primary = timed(client, path)
+            replica_pool.check()
+            print(f"{path:<50} {on_replica:>10.2f} {on_primary:>10.2f}")
+    finally:
+        key_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for certificate list serialization.
+
+Compares the original ORM path (hydrate every Certificate, build a dict with
+per-field isoformat() calls, encode with jsonify) against the column-tuple
+fast path in serialization.py, with orjson and with the stdlib fallback.
+
+Example:
+    python benchmarks/bench_serialization.py --rows 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def seed(db, Certificate, rows):
+    now = datetime.now()
+    db.session.execute(db.delete(Certificate))
+    batch = []
+    for index in range(rows):
+        batch.append({
+            'name': f'svc-{index}',
+            'common_name': f'svc-{index}.example.com',
+            'issuer': 'Vault Intermediate CA',
+            # Certificates issued in waves share their validity timestamps
+            'valid_from': now - timedelta(minutes=index // 1000),
+            'valid_until': now + timedelta(days=365, minutes=index // 1000),
+            'status': 'valid',
+        })
+        if len(batch) == 10000:
+            db.session.execute(db.insert(Certificate), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Certificate), batch)
+    db.session.commit()
+
+
+def orm_path(app, Certificate):
+    """The original api_certificates implementation."""
+    from flask import jsonify
+
+    certs = Certificate.query.all()
+    result = []
+    for cert in certs:
+        result.append({
+            'id': cert.id,
+            'name': cert.name,
+            'common_name': cert.common_name,
+            'issuer': cert.issuer,
+            'valid_from': cert.valid_from.isoformat(),
+            'valid_until': cert.valid_until.isoformat(),
+            'status': cert.status,
+            'created_at': cert.created_at.isoformat() if cert.created_at else None
+        })
+    return jsonify(certificates=result).get_data()
+
+
+def tuple_path(db, Certificate):
+    import serialization
+
+    columns = [getattr(Certificate, field) for field in serialization.CERTIFICATE_FIELDS]
+    rows = db.session.execute(db.select(*columns)).all()
+    return serialization.dumps({'certificates': serialization.rows_to_dicts(serialization.CERTIFICATE_FIELDS, rows)})
+
+
+def measure(label, func, rows, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(func())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {best * 1000:9.1f} ms  {rows / best:12,.0f} rows/s  {size / 1e6:7.1f} MB")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark certificate list serialization')
+    parser.add_argument('--rows', type=int, default=100000, help='Number of certificates (default: 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the best is reported (default: 3)')
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    import serialization
+    from main import app, db, Certificate, init_database
+
+    with app.test_request_context():
+        init_database()
+        seed(db, Certificate, args.rows)
+        print(f"{args.rows:,} certificates, JSON backend: {serialization.JSON_BACKEND}")
+        before = measure('ORM + jsonify (before)', lambda: orm_path(app, Certificate), args.rows, args.repeat)
+        after = measure(f'tuples + {serialization.JSON_BACKEND} (after)', lambda: tuple_path(db, Certificate),
+                        args.rows, args.repeat)
+        if serialization.orjson:
+            backend = serialization.orjson
+            serialization.orjson = None
+            try:
+                measure('tuples + json (fallback)', lambda: tuple_path(db, Certificate), args.rows, args.repeat)
+            finally:
+                serialization.orjson = backend
+        print(f"Speedup: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Worker startup benchmark.
+
+Starts a fresh interpreter per run and measures how long importing the
+application (``import main``, which is what a gunicorn worker does for
+``main:app``) and serving the first request through the test client take,
+against a database that already has its schema. The median of the runs is
+reported. Pass --root to measure another checkout, e.g. an older revision
+in a git worktree, and compare.
+
+A local SQLite database connects instantly; --connect-delay adds a sleep to
+every new database connection to stand in for a remote or cold PostgreSQL
+server (TCP, TLS and authentication round trips).
+
+Example:
+    python benchmarks/bench_startup.py --runs 10 --connect-delay 0.2
+    git worktree add /tmp/before HEAD~1 && python benchmarks/bench_startup.py --root /tmp/before
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Run in the child interpreter; prints the phase timings as JSON
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+delay = float(sys.argv[3])
+if delay:
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    event.listen(Engine, "connect", lambda *args: time.sleep(delay))
+sys.path.insert(0, sys.argv[1])
+import main
+imported = time.perf_counter()
+response = main.app.test_client().get(sys.argv[2])
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_request_ms": (served - imported) * 1000,
+                  "total_ms": (served - started) * 1000}))
+'''
+
+SETUP = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+import main
+create_schema = getattr(main, "init_database", None)
+with main.app.app_context():
+    create_schema() if create_schema else main.db.create_all()
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import-to-first-request latency of a worker')
+    parser.add_argument('--root', default=ROOT, help='Checkout to measure (default: this one)')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start (default: 5)')
+    parser.add_argument('--path', default='/health', help='Path of the first request (default: /health)')
+    parser.add_argument('--connect-delay', type=float, default=0.0,
+                        help='Seconds added to every new database connection (default: 0)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not env.get('DATABASE_URL'):
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    env['KEY_POOL_PREWARM'] = ''
+    subprocess.run([sys.executable, '-c', SETUP, args.root], env=env, check=True, capture_output=True)
+
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, '-c', CHILD, args.root, args.path, str(args.connect_delay)],
+                                env=env, check=True, capture_output=True, text=True)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    report = {phase: round(statistics.median(run[phase] for run in runs), 1)
+              for phase in ('import_ms', 'first_request_ms', 'total_ms')}
+    print(f"import {report['import_ms']:.1f} ms, first request {report['first_request_ms']:.1f} ms, "
+          f"total {report['total_ms']:.1f} ms (median of {args.runs})")
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(dict(report, runs=runs, root=os.path.abspath(args.root)), output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
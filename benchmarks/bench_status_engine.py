@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Status engine reload benchmark.
+
+Seeds a throwaway SQLite database with certificates expiring around now,
+then reloads the status engine's horizon a number of times while threads
+keep scheduling newly issued certificates, as the issuance endpoints do.
+Reports how long each reload takes and how long ``schedule`` calls wait
+for it. The correctness checks are in tests/test_status_engine.py.
+
+Example:
+    python benchmarks/bench_status_engine.py --certificates 200000 --rounds 10 --threads 8
+"""
+
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from harness import prepare, sqlite_url
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time status engine reloads under concurrent scheduling')
+    parser.add_argument('--certificates', type=int, default=50000,
+                        help='Certificates seeded around the start time (default: 50000)')
+    parser.add_argument('--rounds', type=int, default=5, help='Horizon reloads (default: 5)')
+    parser.add_argument('--threads', type=int, default=4, help='Scheduling threads (default: 4)')
+    parser.add_argument('--pause', type=float, default=0.001,
+                        help='Seconds each thread waits between schedule calls (default: 0.001)')
+    args = parser.parse_args()
+
+    prepare(DATABASE_URL=sqlite_url('status.db'), KEY_POOL_PREWARM='')
+    from main import app, db, Certificate, init_database, key_pool
+    from status_engine import StatusEngine
+
+    horizon = timedelta(hours=1)
+    engine = StatusEngine(db, Certificate, horizon=horizon)
+    rng = random.Random(0)
+    now = datetime.now()
+    with app.app_context():
+        init_database()
+        rows = []
+        for n in range(args.certificates):
+            valid_until = now + timedelta(days=rng.uniform(-2, 60))
+            rows.append({'name': f'seed-{n}', 'common_name': f'seed-{n}.example.com', 'issuer': 'Vault Intermediate CA',
+                         'valid_from': valid_until - timedelta(days=90), 'valid_until': valid_until,
+                         'status': 'valid'})
+        db.session.execute(db.insert(Certificate), rows)
+        db.session.commit()
+
+    def schedule(stop, waits):
+        """Schedule certificates expiring within the horizon until ``stop`` is set."""
+        local = random.Random(threading.get_ident())
+        cert_id = args.certificates + threading.get_ident() % 10 ** 6 * 10 ** 6
+        while not stop.is_set():
+            cert_id += 1
+            valid_until = datetime.now() + timedelta(seconds=local.uniform(60, horizon.total_seconds()))
+            started = time.perf_counter()
+            engine.schedule(cert_id, valid_until)
+            waits.append(time.perf_counter() - started)
+            time.sleep(args.pause)
+
+    print(f"{args.certificates} certificates, {args.threads} threads scheduling during {args.rounds} reloads")
+    try:
+        with app.app_context():
+            engine.run_once()
+            for round_number in range(args.rounds):
+                stop = threading.Event()
+                waits = []
+                threads = [threading.Thread(target=schedule, args=(stop, waits)) for _ in range(args.threads)]
+                for thread in threads:
+                    thread.start()
+                started = time.perf_counter()
+                changed = engine.catch_up()
+                engine.load()
+                reload_seconds = time.perf_counter() - started
+                stop.set()
+                for thread in threads:
+                    thread.join()
+                print(f"round {round_number}: reload {reload_seconds:.3f}s, {changed} caught up, "
+                      f"{engine.pending} in the heap, {len(waits) / reload_seconds:.0f} schedules/s, "
+                      f"schedule p50 {percentile(waits, 0.5) * 1e6:.0f}us p99 {percentile(waits, 0.99) * 1e6:.0f}us "
+                      f"max {max(waits, default=0) * 1e3:.1f}ms")
+                db.session.rollback()
+    finally:
+        key_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Setup shared by the benchmark scripts.
+
+The application reads its settings from the environment when ``main`` is
+imported, so scripts call ``prepare`` first and import ``main`` after it.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def sqlite_url(filename, directory=None):
+    """URL of a SQLite file in ``directory``, a new temporary directory by default."""
+    return f"sqlite:///{os.path.join(directory or tempfile.mkdtemp(), filename)}"
+
+
+def prepare(**environment):
+    """Set the given environment variables and make the application importable."""
+    os.environ.update(environment)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def database_url(parser, server_url=None):
+    """DATABASE_URL if set, else a temporary SQLite file; a running server at ``server_url`` needs it set."""
+    if os.environ.get('DATABASE_URL'):
+        return os.environ['DATABASE_URL']
+    if server_url:
+        parser.error('--url needs DATABASE_URL set to the database of the server under test')
+    return sqlite_url('bench.db')
@@ -0,0 +1,193 @@
+"""
+Compressed storage of certificate bodies and issuer chains.
+
+Certificates are stored as DER, compressed with zstd when the
+``zstandard`` package is installed and with zlib otherwise; the encoding is
+recorded per row, so rows written with either remain readable. Bodies live
+in a side table keyed by certificate id and are only read by the download
+endpoint, never by list queries. Issuer chains are shared by most
+certificates, so each distinct chain is stored once, keyed by the SHA-256
+digest of its DER bytes.
+
+Downloads decompress incrementally and are sent as a stream of chunks.
+
+Issuance in this application is simulated; ``SimulatedIssuer`` signs
+certificates with a throwaway CA, using the ``cryptography`` package.
+Without it, certificates are issued without a body. The serial number of a
+certificate is its id, as the revocation endpoints assume.
+"""
+
+import base64
+import hashlib
+import ipaddress
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    x509 = None
+
+ENCODINGS = ('zstd', 'zlib', 'none')
+DEFAULT_ENCODING = 'zstd' if zstandard else 'zlib'
+
+# Bytes yielded per chunk by the download stream
+CHUNK_SIZE = 16384
+
+
+def compress(data, encoding=DEFAULT_ENCODING):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if encoding == 'zlib':
+        return zlib.compress(data, 9)
+    if encoding == 'none':
+        return data
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def iter_decompressed(data, encoding, chunk_size=CHUNK_SIZE):
+    """Yield the decompressed bytes of a stored value in chunks."""
+    if encoding == 'none':
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        return
+    if encoding == 'zstd':
+        reader = zstandard.ZstdDecompressor().stream_reader(data)
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    decompressor = zlib.decompressobj()
+    pending = data
+    while pending:
+        chunk = decompressor.decompress(pending, chunk_size)
+        pending = decompressor.unconsumed_tail
+        if chunk:
+            yield chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def decompress(data, encoding):
+    return b''.join(iter_decompressed(data, encoding))
+
+
+def split_der(data):
+    """Split concatenated DER certificates using their outer SEQUENCE lengths."""
+    certificates = []
+    offset = 0
+    while offset < len(data):
+        if data[offset] != 0x30 or offset + 2 > len(data):
+            raise ValueError('Invalid DER data')
+        length = data[offset + 1]
+        header = 2
+        if length & 0x80:
+            count = length & 0x7f
+            length = int.from_bytes(data[offset + 2:offset + 2 + count], 'big')
+            header += count
+        end = offset + header + length
+        if end > len(data):
+            raise ValueError('Truncated DER data')
+        certificates.append(data[offset:end])
+        offset = end
+    return certificates
+
+
+def chain_digest(der_chain):
+    return hashlib.sha256(b''.join(der_chain)).hexdigest()
+
+
+def der_to_pem(der):
+    body = base64.b64encode(der).decode()
+    lines = [body[start:start + 64] for start in range(0, len(body), 64)]
+    return '-----BEGIN CERTIFICATE-----\n' + '\n'.join(lines) + '\n-----END CERTIFICATE-----\n'
+
+
+class SimulatedIssuer:
+    """Signs certificates with a throwaway CA, standing in for Vault's PKI engine."""
+
+    def __init__(self, ca_name, store=None):
+        """
+        Args:
+            ca_name (str): Common name of the CA
+            store (callable): ``store(key_pem, certificate_der)`` saving a newly
+                generated CA and returning the ``(key_pem, certificate_der)``
+                to sign with, which is an earlier one if a CA was saved
+                before. Without it the CA lives only in this process.
+        """
+        self.ca_name = ca_name
+        self.store = store
+        self._lock = threading.Lock()
+        self._ca = None
+
+    @property
+    def available(self):
+        return x509 is not None
+
+    def _generate(self):
+        key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, self.ca_name)])
+        now = datetime.now()
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=3650))
+            .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+            .sign(key, hashes.SHA256())
+        )
+        return key, certificate
+
+    def load(self):
+        """Return the CA as ``(private_key, certificate)``, creating it on first use."""
+        with self._lock:
+            if self._ca is None:
+                key, certificate = self._generate()
+                if self.store is not None:
+                    key_pem, certificate_der = self.store(
+                        key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                          serialization.NoEncryption()).decode(),
+                        certificate.public_bytes(serialization.Encoding.DER)
+                    )
+                    key = serialization.load_pem_private_key(key_pem.encode(), password=None)
+                    certificate = x509.load_der_x509_certificate(certificate_der)
+                self._ca = (key, certificate)
+            return self._ca
+
+    def sign(self, serial_number, common_name, private_key_pem, not_before, not_after, alt_names=(), ip_sans=()):
+        """Return ``(certificate_der, [issuer_der, ...])`` for the given serial number, key and names."""
+        ca_key, ca_certificate = self.load()
+        # The key comes from the key pool, and RSA validation would make up most
+        # of the time spent here, inside the caller's transaction
+        public_key = serialization.load_pem_private_key(private_key_pem.encode(), password=None,
+                                                        unsafe_skip_rsa_key_validation=True).public_key()
+        builder = (
+            x509.CertificateBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)]))
+            .issuer_name(ca_certificate.subject)
+            .public_key(public_key)
+            .serial_number(serial_number)
+            .not_valid_before(not_before)
+            .not_valid_after(not_after)
+        )
+        sans = [x509.DNSName(name) for name in alt_names]
+        sans.extend(x509.IPAddress(ipaddress.ip_address(address)) for address in ip_sans)
+        if sans:
+            builder = builder.add_extension(x509.SubjectAlternativeName(sans), critical=False)
+        certificate = builder.sign(ca_key, hashes.SHA256())
+        return (certificate.public_bytes(serialization.Encoding.DER),
+                [ca_certificate.public_bytes(serialization.Encoding.DER)])
@@ -8,30 +8,91 @@ and revoking certificates.
 """
 
 import argparse
+import csv
 import json
+import random
 import requests
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 import time
+import uuid
+
+class PrivateKeyUnavailable(Exception):
+    """
+    A retried issuance request was answered with the stored response of an
+    earlier attempt, which does not include the private key. The
+    certificates were issued, but cannot be used without the key; revoke
+    them and issue new ones.
+    """
+    
+    def __init__(self, message, certificate_ids):
+        super().__init__(f"{message} (certificate IDs: {', '.join(map(str, certificate_ids))})")
+        self.certificate_ids = certificate_ids
 
 class VaultPKIClient:
     """Client for interacting with the Vault PKI Management API"""
     
-    def __init__(self, base_url, api_key=None):
+    # Number of GET responses remembered for conditional requests
+    ETAG_CACHE_SIZE = 128
+    
+    # HTTP status codes worth retrying
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+    
+    def __init__(self, base_url, api_key=None, timeout=30, max_retries=3, backoff=0.5):
         """
         Initialize the client with the base URL and API key.
         
         Args:
             base_url (str): Base URL of the API (e.g., "http://localhost:5000/api/v1")
             api_key (str, optional): API key for authentication (if required)
+            timeout (float, optional): Seconds to wait for each response (default: 30)
+            max_retries (int, optional): Retries after a 5xx response, timeout or
+                connection error (default: 3)
+            backoff (float, optional): Base delay in seconds for exponential
+                backoff between retries; each delay is jittered (default: 0.5)
         """
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
-        self.session = requests.Session()
-        
-        # Set up API key authentication if provided
-        if api_key:
-            self.session.headers.update({'Authorization': f'Bearer {api_key}'})
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._local = threading.local()
+        self._etag_cache = OrderedDict()
+        self._etag_lock = threading.Lock()
+    
+    @property
+    def session(self):
+        """HTTP session of the calling thread, so concurrent calls keep their own connections"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            # Set up API key authentication if provided
+            if self.api_key:
+                session.headers.update({'Authorization': f'Bearer {self.api_key}'})
+        return session
+    
+    def _request(self, method, url, **kwargs):
+        """
+        Send a request, retrying 5xx responses, timeouts and connection errors
+        with jittered exponential backoff
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            # Full jitter keeps concurrent workers from retrying in lockstep
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            attempt += 1
     
     def _get_url(self, endpoint):
         """Construct full URL for the given endpoint"""
@@ -53,22 +114,196 @@ class VaultPKIClient:
             print(f"Error: {error_msg}", file=sys.stderr)
             raise
     
-    def get_certificates(self):
-        """Get a list of all certificates"""
-        response = self.session.get(self._get_url('/certificates'))
-        return self._handle_response(response)
+    @staticmethod
+    def _check_private_keys(response, data):
+        """
+        Raise PrivateKeyUnavailable if a replayed issuance response has
+        certificates without their private key
+        """
+        if response.headers.get('Idempotent-Replayed') != 'true':
+            return data
+        issued = [data] if 'certificate_id' in data else [
+            item for item in data.get('results') or () if item.get('success')]
+        missing = [item['certificate_id'] for item in issued if item.get('private_key') is None]
+        if missing:
+            message = data.get('warning') or 'The private key was not returned'
+            print(f"Error: {message}", file=sys.stderr)
+            raise PrivateKeyUnavailable(message, missing)
+        return data
+    
+    @staticmethod
+    def _error_message(err):
+        """API error message carried by an exception, falling back to its text"""
+        response = getattr(err, 'response', None)
+        if response is not None:
+            try:
+                return response.json()['error']
+            except (ValueError, KeyError, TypeError):
+                pass
+        return str(err)
     
-    def get_certificate(self, certificate_id):
-        """Get details for a specific certificate"""
-        response = self.session.get(self._get_url(f'/certificates/{certificate_id}'))
-        return self._handle_response(response)
+    def _get(self, endpoint, params=None):
+        """
+        Send a GET request, revalidating a previously seen response with its ETag
+        
+        When the server answers 304 Not Modified, the remembered body is
+        returned without being downloaded or parsed again.
+        """
+        request = requests.Request('GET', self._get_url(endpoint), params=params)
+        url = self.session.prepare_request(request).url
+        with self._etag_lock:
+            cached = self._etag_cache.get(url)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        
+        response = self._request('GET', url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        data = self._handle_response(response)
+        etag = response.headers.get('ETag')
+        if etag:
+            with self._etag_lock:
+                self._etag_cache[url] = (etag, data)
+                self._etag_cache.move_to_end(url)
+                while len(self._etag_cache) > self.ETAG_CACHE_SIZE:
+                    self._etag_cache.popitem(last=False)
+        return data
+    
+    def get_certificates(self, cursor=None, limit=None, sort=None, **filters):
+        """
+        Get one page of certificates
+        
+        Args:
+            cursor (str, optional): Cursor returned as ``next_cursor`` by the previous page
+            limit (int, optional): Maximum number of certificates in the page
+            sort (str, optional): Sort key, either "id" (default) or "valid_until"
+            **filters: Server-side filters (status, issuer, common_name prefix,
+                expires_before, expires_after), or archived="true" to list
+                archived certificates instead
+            
+        Returns:
+            dict: The API response with ``certificates`` and ``next_cursor``
+        """
+        params = {key: value for key, value in filters.items() if value is not None}
+        if cursor:
+            params['cursor'] = cursor
+        if limit:
+            params['limit'] = limit
+        if sort:
+            params['sort'] = sort
+        return self._get('/certificates', params=params)
+    
+    def iter_certificates(self, limit=None, sort=None, **filters):
+        """
+        Iterate over all certificates matching the filters, following the
+        pagination cursors transparently
+        
+        Yields:
+            dict: One certificate at a time
+        """
+        cursor = None
+        while True:
+            page = self.get_certificates(cursor=cursor, limit=limit, sort=sort, **filters)
+            yield from page['certificates']
+            cursor = page.get('next_cursor')
+            if not cursor:
+                break
+    
+    def export_certificates(self, path, export_format="ndjson", chunk_size=65536, **filters):
+        """
+        Stream the certificate inventory to a file
+        
+        The response is written to disk as it arrives, so memory use does not
+        depend on the size of the inventory.
+        
+        Args:
+            path (str): Destination file
+            export_format (str): "ndjson" (default) or "csv"
+            chunk_size (int): Number of bytes written per chunk
+            **filters: Server-side filters, as for get_certificates
+            
+        Returns:
+            int: Number of bytes written
+        """
+        params = {key: value for key, value in filters.items() if value is not None}
+        params['format'] = export_format
+        written = 0
+        with self._request('GET', self._get_url('/certificates/export'), params=params, stream=True) as response:
+            if not response.ok:
+                self._handle_response(response)
+            with open(path, 'wb') as output:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    output.write(chunk)
+                    written += len(chunk)
+        return written
+    
+    def search_certificates(self, name, match=None, limit=None, **filters):
+        """
+        Iterate over the certificates whose common name or SANs match a name,
+        following the pagination cursors transparently
+        
+        Args:
+            name (str): DNS name, wildcard name (e.g. "*.payments.example.com")
+                or IP address
+            match (str, optional): "covers" (default), "exact" or "suffix"
+            limit (int, optional): Number of certificates fetched per request
+            **filters: Same server-side filters as ``get_certificates``
+        
+        Yields:
+            dict: One certificate at a time
+        """
+        params = {key: value for key, value in filters.items() if value is not None}
+        params['name'] = name
+        if match:
+            params['match'] = match
+        if limit:
+            params['limit'] = limit
+        while True:
+            page = self._get('/certificates/search', params=params)
+            yield from page['certificates']
+            if not page.get('next_cursor'):
+                break
+            params['cursor'] = page['next_cursor']
+    
+    def download_certificate(self, certificate_id, path, download_format="pem", chain=False, archived=False):
+        """
+        Download a certificate body to a file
+        
+        Args:
+            certificate_id (int): Certificate ID
+            path (str): Destination file
+            download_format (str): "pem" (default) or "der"
+            chain (bool): Append the issuer chain (PEM only)
+            archived (bool): Download an archived certificate
+        
+        Returns:
+            int: Number of bytes written
+        """
+        params = {'format': download_format}
+        if chain:
+            params['chain'] = 'true'
+        if archived:
+            params['archived'] = 'true'
+        response = self._request('GET', self._get_url(f'/certificates/{certificate_id}/download'), params=params)
+        if not response.ok:
+            self._handle_response(response)
+        with open(path, 'wb') as output:
+            output.write(response.content)
+        return len(response.content)
+    
+    def get_certificate(self, certificate_id, archived=False):
+        """Get details for a specific certificate, from the archive if ``archived``"""
+        return self._get(f'/certificates/{certificate_id}', params={'archived': 'true'} if archived else None)
     
     def issue_certificate(self, common_name, ttl="8760h", role="server", 
                           alt_names=None, ip_sans=None, key_type="rsa", 
-                          key_bits=2048, name=None):
+                          key_bits=2048, name=None, idempotency_key=None):
         """
         Issue a new certificate
         
+        The request carries an Idempotency-Key, generated unless one is
+        given, so retries after a timeout or 5xx response cannot issue a
+        second certificate.
+        
         Args:
             common_name (str): Common name for the certificate
             ttl (str): Time to live in format like "8760h" for 1 year
@@ -78,9 +313,15 @@ class VaultPKIClient:
             key_type (str, optional): Key type (default: "rsa")
             key_bits (int, optional): Key size in bits (default: 2048)
             name (str, optional): Custom name for the certificate
+            idempotency_key (str, optional): Key to reuse when calling again for the same certificate
             
         Returns:
             dict: The API response containing the issued certificate details
+            
+        Raises:
+            PrivateKeyUnavailable: If a retry was answered with the response
+                of an earlier attempt, which has no private key; the
+                certificate has to be revoked
         """
         data = {
             "common_name": common_name,
@@ -97,40 +338,274 @@ class VaultPKIClient:
         if name:
             data["name"] = name
         
-        response = self.session.post(
-            self._get_url('/certificates/issue'),
+        response = self._request(
+            'POST', self._get_url('/certificates/issue'),
+            json=data,
+            headers={'Idempotency-Key': idempotency_key or str(uuid.uuid4())}
+        )
+        return self._check_private_keys(response, self._handle_response(response))
+    
+    def issue_certificates_batch(self, specs, idempotency_key=None):
+        """
+        Issue several certificates with a single request
+        
+        Args:
+            specs (list): Issuance specs, each a dict with the same fields as
+                issue_certificate (common_name, ttl and role are required)
+            idempotency_key (str, optional): Key to reuse when calling again for
+                the same batch; one is generated otherwise
+            
+        Returns:
+            dict: The API response with per-item ``results``
+            
+        Raises:
+            PrivateKeyUnavailable: As for issue_certificate
+        """
+        response = self._request(
+            'POST', self._get_url('/certificates/issue/batch'),
+            json={'certificates': specs},
+            headers={'Idempotency-Key': idempotency_key or str(uuid.uuid4())}
+        )
+        # 207 Multi-Status carries per-item failures rather than an error
+        if response.status_code == 207:
+            return self._check_private_keys(response, response.json())
+        return self._check_private_keys(response, self._handle_response(response))
+    
+    def revoke_certificate(self, certificate_id, reason=None):
+        """Revoke a certificate"""
+        response = self._request(
+            'POST', self._get_url(f'/certificates/{certificate_id}/revoke'),
+            json={'reason': reason} if reason else None
+        )
+        return self._handle_response(response)
+    
+    def revoke_certificates_bulk(self, ids=None, issuer=None, common_name=None, reason=None):
+        """
+        Revoke every certificate matching all of the given selectors
+        
+        Args:
+            ids (list, optional): Certificate IDs
+            issuer (str, optional): Issuer name
+            common_name (str, optional): Common name pattern, "*" matches anything
+            reason (str, optional): CRL reason code (default: "unspecified")
+            
+        Returns:
+            dict: The API response with the revoked certificate IDs
+        """
+        data = {}
+        if ids is not None:
+            data['ids'] = ids
+        if issuer:
+            data['issuer'] = issuer
+        if common_name:
+            data['common_name'] = common_name
+        if reason:
+            data['reason'] = reason
+        response = self._request(
+            'POST', self._get_url('/certificates/revoke/bulk'),
             json=data
         )
         return self._handle_response(response)
     
-    def revoke_certificate(self, certificate_id):
-        """Revoke a certificate"""
-        response = self.session.post(
-            self._get_url(f'/certificates/{certificate_id}/revoke')
+    def get_crl(self, base=None):
+        """Get the full CRL, or only the entries added since CRL number ``base``"""
+        if base is None:
+            response = self._request('GET', self._get_url('/crl'))
+        else:
+            response = self._request('GET', self._get_url('/crl/delta'), params={'base': base})
+        return self._handle_response(response)
+    
+    def get_status(self, serials):
+        """
+        Get the revocation status of one certificate ID or a list of them
+        
+        Returns:
+            dict: The status entry, or ``{'responses': [...]}`` for a list
+        """
+        if isinstance(serials, int):
+            response = self._request('GET', self._get_url(f'/status/{serials}'))
+        else:
+            response = self._request('POST', self._get_url('/status'), json={'serials': list(serials)})
+        return self._handle_response(response)
+    
+    def get_certificate_chain(self, certificate_id, archived=False):
+        """Get the issuers of a certificate up to the root CA, from the archive if ``archived``"""
+        return self._get(f'/certificates/{certificate_id}/chain', params={'archived': 'true'} if archived else None)
+    
+    def get_issuers(self):
+        """Get the issuer hierarchy with certificate counts per issuer"""
+        return self._get('/issuers')
+    
+    def get_issuer(self, issuer_id):
+        """Get an issuer with its chain to the root and its child CAs"""
+        return self._get(f'/issuers/{issuer_id}')
+    
+    def create_issuer(self, name, parent_id=None):
+        """Register a CA, signed by the issuer ``parent_id`` or a root if None"""
+        response = self._request(
+            'POST', self._get_url('/issuers'),
+            json={'name': name, 'parent_id': parent_id}
+        )
+        return self._handle_response(response)
+    
+    def move_issuer(self, issuer_id, parent_id):
+        """Move an issuer under the CA ``parent_id``, or make it a root if None"""
+        response = self._request(
+            'PATCH', self._get_url(f'/issuers/{issuer_id}'),
+            json={'parent_id': parent_id}
         )
         return self._handle_response(response)
     
     def get_servers(self):
         """Get a list of all Vault servers"""
-        response = self.session.get(self._get_url('/servers'))
-        return self._handle_response(response)
+        return self._get('/servers')
     
     def get_server(self, server_id):
         """Get details for a specific Vault server"""
-        response = self.session.get(self._get_url(f'/servers/{server_id}'))
-        return self._handle_response(response)
+        return self._get(f'/servers/{server_id}')
     
     def unseal_server(self, server_id):
         """Unseal a Vault server"""
-        response = self.session.post(
-            self._get_url(f'/servers/{server_id}/unseal')
+        response = self._request(
+            'POST', self._get_url(f'/servers/{server_id}/unseal')
         )
         return self._handle_response(response)
     
+    def iter_events(self, topics=None, last_event_id=None):
+        """
+        Follow the live event feed, reconnecting whenever the server ends the stream
+        
+        Args:
+            topics (str, optional): Comma-separated topics, "certificate" and/or "server"
+            last_event_id (int, optional): Resume after this event id
+            
+        Yields:
+            dict: ``{'id', 'event', 'data'}`` per event; after a "reset" event
+            the feed restarts from the newest event
+        """
+        params = {'topics': topics} if topics else {}
+        while True:
+            headers = {'Accept': 'text/event-stream'}
+            if last_event_id is not None:
+                headers['Last-Event-ID'] = str(last_event_id)
+            # No read timeout: keepalive comments arrive every 15 seconds
+            with self._request('GET', self._get_url('/events'), params=params, headers=headers,
+                               stream=True, timeout=(self.timeout, None)) as response:
+                if response.status_code == 503 and response.headers.get('Retry-After', '').isdigit():
+                    # The worker has no free stream slot; come back when asked, spread out
+                    time.sleep(int(response.headers['Retry-After']) * random.uniform(1, 1.5))
+                    continue
+                if not response.ok:
+                    self._handle_response(response)
+                event = {}
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        field, _, value = line.partition(':')
+                        if field in ('id', 'event', 'data'):
+                            event[field] = value[1:] if value.startswith(' ') else value
+                        continue
+                    # A blank line ends the event; comments and retry hints carry no event
+                    if 'event' in event:
+                        if event['event'] == 'reset':
+                            last_event_id = None
+                        else:
+                            last_event_id = int(event['id'])
+                            yield {'id': last_event_id, 'event': event['event'], 'data': json.loads(event['data'])}
+                    event = {}
+    
     def check_health(self):
         """Check the health of the API service"""
-        response = self.session.get(self._get_url('/health'))
+        response = self._request('GET', self._get_url('/health'))
         return self._handle_response(response)
+    
+    def run_concurrently(self, operation, items, workers=8):
+        """
+        Call ``operation(item)`` for every item on a bounded pool of threads
+        
+        Each worker thread keeps its own session, so connections are reused
+        across the items it processes. At most ``2 * workers`` calls are
+        queued at a time, which keeps memory flat for very large inputs.
+        
+        Args:
+            operation (callable): Function called with one item, e.g. a bound
+                client method wrapped in a lambda
+            items (iterable): Items to process
+            workers (int, optional): Number of concurrent requests (default: 8)
+            
+        Returns:
+            dict: Totals, elapsed time, throughput and per-item ``failures``
+                (index, item and error message)
+        """
+        started = time.monotonic()
+        total = 0
+        failures = []
+        pending = {}
+        
+        def collect(done):
+            for future in done:
+                index, item = pending.pop(future)
+                try:
+                    future.result()
+                except Exception as err:
+                    failure = {'index': index, 'item': item, 'error': self._error_message(err)}
+                    if isinstance(err, PrivateKeyUnavailable):
+                        # Issued without a usable key, so the caller can revoke them
+                        failure['certificate_ids'] = err.certificate_ids
+                    failures.append(failure)
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index, item in enumerate(items):
+                if len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending[executor.submit(operation, item)] = (index, item)
+                total += 1
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        
+        elapsed = time.monotonic() - started
+        failures.sort(key=lambda failure: failure['index'])
+        return {
+            'total': total,
+            'succeeded': total - len(failures),
+            'failed': len(failures),
+            'elapsed_seconds': round(elapsed, 3),
+            'per_second': round(total / elapsed, 1) if elapsed else None,
+            'failures': failures
+        }
+
+
+def read_issue_specs(path):
+    """
+    Read issuance specs from a JSONL file (one JSON object per line) or a CSV
+    file with a header row (common_name, ttl, role, alt_names, ip_sans,
+    key_type, key_bits, name)
+    """
+    with open(path, newline='') as spec_file:
+        if path.endswith('.csv'):
+            specs = []
+            for row in csv.DictReader(spec_file):
+                spec = {key: value for key, value in row.items() if value}
+                if 'key_bits' in spec:
+                    spec['key_bits'] = int(spec['key_bits'])
+                specs.append(spec)
+            return specs
+        return [json.loads(line) for line in spec_file if line.strip()]
+
+
+def read_certificate_ids(path):
+    """
+    Read certificate IDs from a text file (one ID per line) or a CSV file with
+    a ``certificate_id`` or ``id`` column, such as an export
+    """
+    with open(path, newline='') as id_file:
+        if path.endswith('.csv'):
+            ids = []
+            for row in csv.DictReader(id_file):
+                ids.append(int(row.get('certificate_id') or row['id']))
+            return ids
+        return [int(line) for line in id_file if line.strip()]
 
 
 def print_json(data):
@@ -143,15 +618,54 @@ def main():
     parser.add_argument('--url', default='http://localhost:5000/api/v1',
                         help='Base URL of the API (default: http://localhost:5000/api/v1)')
     parser.add_argument('--api-key', help='API key for authentication (if required)')
+    parser.add_argument('--timeout', type=float, default=30, help='Request timeout in seconds (default: 30)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Retries after a 5xx response, timeout or connection error (default: 3)')
     
     subparsers = parser.add_subparsers(dest='command', help='Command to execute')
     
     # List certificates command
-    subparsers.add_parser('list-certificates', help='List all certificates')
+    list_certs_parser = subparsers.add_parser('list-certificates', help='List all certificates')
+    list_certs_parser.add_argument('--status', help='Only certificates with this status')
+    list_certs_parser.add_argument('--issuer', help='Only certificates issued by this issuer')
+    list_certs_parser.add_argument('--common-name', help='Only certificates whose common name starts with this prefix')
+    list_certs_parser.add_argument('--expires-before', help='Only certificates expiring before this ISO timestamp')
+    list_certs_parser.add_argument('--expires-after', help='Only certificates expiring at or after this ISO timestamp')
+    list_certs_parser.add_argument('--sort', choices=['id', 'valid_until'], help='Sort key (default: id)')
+    list_certs_parser.add_argument('--page-size', type=int, help='Number of certificates fetched per request')
+    list_certs_parser.add_argument('--archived', action='store_true', help='List archived certificates instead')
+    
+    # Export certificates command
+    export_parser = subparsers.add_parser('export', help='Stream the certificate inventory to a file')
+    export_parser.add_argument('output', help='Destination file')
+    export_parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson', help='Export format (default: ndjson)')
+    export_parser.add_argument('--status', help='Only certificates with this status')
+    export_parser.add_argument('--issuer', help='Only certificates issued by this issuer')
+    export_parser.add_argument('--common-name', help='Only certificates whose common name starts with this prefix')
+    export_parser.add_argument('--expires-before', help='Only certificates expiring before this ISO timestamp')
+    export_parser.add_argument('--expires-after', help='Only certificates expiring at or after this ISO timestamp')
+    export_parser.add_argument('--archived', action='store_true', help='Export archived certificates instead')
+    
+    # Search certificates command
+    search_parser = subparsers.add_parser('search-certificates', help='Find certificates by common name or SAN')
+    search_parser.add_argument('name', help='DNS name, wildcard name (*.example.com) or IP address')
+    search_parser.add_argument('--match', choices=['covers', 'exact', 'suffix'],
+                               help='covers: valid for the name (default); exact: the name itself; '
+                                    'suffix: the name and everything below it')
+    search_parser.add_argument('--status', help='Only certificates with this status')
     
     # Get certificate command
     get_cert_parser = subparsers.add_parser('get-certificate', help='Get certificate details')
     get_cert_parser.add_argument('certificate_id', type=int, help='Certificate ID')
+    get_cert_parser.add_argument('--archived', action='store_true', help='Look the certificate up in the archive')
+    
+    # Download certificate command
+    download_parser = subparsers.add_parser('download-certificate', help='Download a certificate body')
+    download_parser.add_argument('certificate_id', type=int, help='Certificate ID')
+    download_parser.add_argument('output', help='Destination file')
+    download_parser.add_argument('--format', choices=['pem', 'der'], default='pem', help='Format (default: pem)')
+    download_parser.add_argument('--chain', action='store_true', help='Append the issuer chain (PEM only)')
+    download_parser.add_argument('--archived', action='store_true', help='Download an archived certificate')
     
     # Issue certificate command
     issue_cert_parser = subparsers.add_parser('issue-certificate', help='Issue a new certificate')
@@ -163,10 +677,62 @@ def main():
     issue_cert_parser.add_argument('--key-type', default='rsa', help='Key type (default: rsa)')
     issue_cert_parser.add_argument('--key-bits', type=int, default=2048, help='Key size in bits (default: 2048)')
     issue_cert_parser.add_argument('--name', help='Custom name for the certificate')
+    issue_cert_parser.add_argument('--idempotency-key',
+                                   help='Idempotency-Key to send; rerunning with the same key returns the same certificate')
+    
+    # Batch issue command
+    issue_batch_parser = subparsers.add_parser('issue-batch', help='Issue certificates from a CSV or JSONL file')
+    issue_batch_parser.add_argument('file', help='CSV (with header row) or JSONL file of issuance specs')
+    issue_batch_parser.add_argument('--batch-size', type=int, default=1000,
+                                    help='Number of certificates sent per request (default: 1000)')
+    
+    # Concurrent issue command
+    issue_many_parser = subparsers.add_parser('issue-many',
+                                              help='Issue certificates from a CSV or JSONL file, one request each, concurrently')
+    issue_many_parser.add_argument('file', help='CSV (with header row) or JSONL file of issuance specs')
+    issue_many_parser.add_argument('--workers', type=int, default=8, help='Number of concurrent requests (default: 8)')
     
     # Revoke certificate command
     revoke_cert_parser = subparsers.add_parser('revoke-certificate', help='Revoke a certificate')
     revoke_cert_parser.add_argument('certificate_id', type=int, help='Certificate ID')
+    revoke_cert_parser.add_argument('--reason', help='CRL reason code (default: unspecified)')
+    
+    # Bulk revoke command
+    revoke_bulk_parser = subparsers.add_parser('revoke-bulk', help='Revoke all certificates matching the selectors')
+    revoke_bulk_parser.add_argument('--ids', help='Comma-separated list of certificate IDs')
+    revoke_bulk_parser.add_argument('--issuer', help='Issuer name')
+    revoke_bulk_parser.add_argument('--common-name', help='Common name pattern ("*" matches anything)')
+    revoke_bulk_parser.add_argument('--reason', help='CRL reason code (default: unspecified)')
+    
+    # Concurrent revoke command
+    revoke_many_parser = subparsers.add_parser('revoke-many', help='Revoke certificates listed in a file concurrently')
+    revoke_many_parser.add_argument('file', help='Text file with one certificate ID per line, or a CSV with an id column')
+    revoke_many_parser.add_argument('--reason', help='CRL reason code (default: unspecified)')
+    revoke_many_parser.add_argument('--workers', type=int, default=8, help='Number of concurrent requests (default: 8)')
+    
+    # CRL command
+    crl_parser = subparsers.add_parser('crl', help='Get the certificate revocation list')
+    crl_parser.add_argument('--base', type=int, help='Only show entries added since this CRL number (delta CRL)')
+    
+    # Status command
+    status_parser = subparsers.add_parser('status', help='Check the revocation status of certificates')
+    status_parser.add_argument('certificate_ids', type=int, nargs='+', help='Certificate IDs')
+    
+    # Certificate chain command
+    chain_parser = subparsers.add_parser('certificate-chain', help='Show the issuers of a certificate up to the root CA')
+    chain_parser.add_argument('certificate_id', type=int, help='Certificate ID')
+    chain_parser.add_argument('--archived', action='store_true', help='Look the certificate up in the archive')
+    
+    # Issuer commands
+    subparsers.add_parser('list-issuers', help='List the issuer hierarchy with certificate counts')
+    get_issuer_parser = subparsers.add_parser('get-issuer', help='Get issuer details')
+    get_issuer_parser.add_argument('issuer_id', type=int, help='Issuer ID')
+    create_issuer_parser = subparsers.add_parser('create-issuer', help='Register a CA')
+    create_issuer_parser.add_argument('name', help='Issuer name')
+    create_issuer_parser.add_argument('--parent-id', type=int, help='ID of the CA that signed it (default: a root CA)')
+    move_issuer_parser = subparsers.add_parser('move-issuer', help='Move an issuer under another CA')
+    move_issuer_parser.add_argument('issuer_id', type=int, help='Issuer ID')
+    move_issuer_parser.add_argument('--parent-id', type=int, help='ID of the new parent CA (default: make it a root CA)')
     
     # List servers command
     subparsers.add_parser('list-servers', help='List all Vault servers')
@@ -179,6 +745,10 @@ def main():
     unseal_server_parser = subparsers.add_parser('unseal-server', help='Unseal a Vault server')
     unseal_server_parser.add_argument('server_id', type=int, help='Server ID')
     
+    # Watch command
+    watch_parser = subparsers.add_parser('watch', help='Print certificate and server events as they happen')
+    watch_parser.add_argument('--topics', help='Comma-separated topics: certificate, server (default: both)')
+    
     # Health check command
     subparsers.add_parser('health', help='Check the health of the API service')
     
@@ -188,14 +758,49 @@ def main():
     args = parser.parse_args()
     
     # Initialize the client
-    client = VaultPKIClient(args.url, args.api_key)
+    client = VaultPKIClient(args.url, args.api_key, timeout=args.timeout, max_retries=args.retries)
     
     # Execute the appropriate command
     if args.command == 'list-certificates':
-        print_json(client.get_certificates())
+        print_json({'certificates': list(client.iter_certificates(
+            limit=args.page_size,
+            sort=args.sort,
+            status=args.status,
+            issuer=args.issuer,
+            common_name=args.common_name,
+            expires_before=args.expires_before,
+            expires_after=args.expires_after,
+            archived='true' if args.archived else None
+        ))})
+    
+    elif args.command == 'export':
+        written = client.export_certificates(
+            args.output,
+            export_format=args.format,
+            status=args.status,
+            issuer=args.issuer,
+            common_name=args.common_name,
+            expires_before=args.expires_before,
+            expires_after=args.expires_after,
+            archived='true' if args.archived else None
+        )
+        print(f"Wrote {written} bytes to {args.output}")
+    
+    elif args.command == 'search-certificates':
+        print_json({'certificates': list(client.search_certificates(
+            args.name,
+            match=args.match,
+            status=args.status
+        ))})
     
     elif args.command == 'get-certificate':
-        print_json(client.get_certificate(args.certificate_id))
+        print_json(client.get_certificate(args.certificate_id, archived=args.archived))
+    
+    elif args.command == 'download-certificate':
+        written = client.download_certificate(args.certificate_id, args.output,
+                                              download_format=args.format, chain=args.chain,
+                                              archived=args.archived)
+        print(f"Wrote {written} bytes to {args.output}")
     
     elif args.command == 'issue-certificate':
         print_json(client.issue_certificate(
@@ -206,11 +811,77 @@ def main():
             ip_sans=args.ip_sans,
             key_type=args.key_type,
             key_bits=args.key_bits,
-            name=args.name
+            name=args.name,
+            idempotency_key=args.idempotency_key
         ))
     
+    elif args.command == 'issue-batch':
+        specs = read_issue_specs(args.file)
+        issued = 0
+        failures = []
+        for start in range(0, len(specs), args.batch_size):
+            result = client.issue_certificates_batch(specs[start:start + args.batch_size])
+            issued += result['issued']
+            for item in result['results']:
+                if not item['success']:
+                    failures.append({'line': start + item['index'] + 1, 'error': item['error']})
+        print_json({'issued': issued, 'failed': len(failures), 'failures': failures})
+    
+    elif args.command == 'issue-many':
+        report = client.run_concurrently(
+            lambda spec: client.issue_certificate(**spec),
+            read_issue_specs(args.file),
+            workers=args.workers
+        )
+        for failure in report['failures']:
+            failure['line'] = failure.pop('index') + 1
+        print_json(report)
+    
     elif args.command == 'revoke-certificate':
-        print_json(client.revoke_certificate(args.certificate_id))
+        print_json(client.revoke_certificate(args.certificate_id, reason=args.reason))
+    
+    elif args.command == 'revoke-bulk':
+        print_json(client.revoke_certificates_bulk(
+            ids=[int(cert_id) for cert_id in args.ids.split(',')] if args.ids else None,
+            issuer=args.issuer,
+            common_name=args.common_name,
+            reason=args.reason
+        ))
+    
+    elif args.command == 'revoke-many':
+        report = client.run_concurrently(
+            lambda cert_id: client.revoke_certificate(cert_id, reason=args.reason),
+            read_certificate_ids(args.file),
+            workers=args.workers
+        )
+        for failure in report['failures']:
+            failure['certificate_id'] = failure.pop('item')
+            del failure['index']
+        print_json(report)
+    
+    elif args.command == 'crl':
+        print_json(client.get_crl(base=args.base))
+    
+    elif args.command == 'status':
+        ids = args.certificate_ids
+        print_json(client.get_status(ids[0] if len(ids) == 1 else ids))
+    
+    elif args.command == 'certificate-chain':
+        print_json(client.get_certificate_chain(args.certificate_id, archived=args.archived))
+    
+    elif args.command == 'list-issuers':
+        for issuer in client.get_issuers()['issuers']:
+            print(f"{'  ' * issuer['depth']}{issuer['name']} (id {issuer['id']}): "
+                  f"{issuer['certificates']} certificates, {issuer['total_certificates']} including sub-CAs")
+    
+    elif args.command == 'get-issuer':
+        print_json(client.get_issuer(args.issuer_id))
+    
+    elif args.command == 'create-issuer':
+        print_json(client.create_issuer(args.name, parent_id=args.parent_id))
+    
+    elif args.command == 'move-issuer':
+        print_json(client.move_issuer(args.issuer_id, args.parent_id))
     
     elif args.command == 'list-servers':
         print_json(client.get_servers())
@@ -221,6 +892,13 @@ def main():
     elif args.command == 'unseal-server':
         print_json(client.unseal_server(args.server_id))
     
+    elif args.command == 'watch':
+        try:
+            for event in client.iter_events(topics=args.topics):
+                print(json.dumps(event), flush=True)
+        except KeyboardInterrupt:
+            pass
+    
     elif args.command == 'health':
         print_json(client.check_health())
     
@@ -0,0 +1,178 @@
+"""
+Live event feed for the console pages.
+
+Writes publish small events after they commit: certificates issued, revoked
+or changing status, and Vault servers unsealed or changing health. Each
+worker has an ``EventBus`` that keeps the most recent events in a ring
+buffer and wakes the Server-Sent Events streams waiting on it, so any number
+of open pages costs one read of the backend per poll interval rather than
+one set of queries per page refresh.
+
+Events reach the other workers through a backend with three operations:
+``append(event_type, payload)`` returning the event's sequence number,
+``read(after)`` returning ``(sequence, event_type, payload)`` rows in
+sequence order, and ``position()`` returning the latest sequence number.
+``MemoryBackend`` shares events between the buses of one process, which is
+enough for a single worker and lets a multi-worker setup be faked locally;
+``TableBackend`` stores them in a database table that every worker and
+background job can write and poll.
+
+Payloads are encoded to JSON once, when published, and sent to every
+stream as-is. Sequence numbers double as SSE event ids: a client that
+reconnects with ``Last-Event-ID`` is sent what it missed from the buffer,
+or ``None`` is returned when those events are no longer buffered and the
+client has to reload instead.
+"""
+
+import logging
+import threading
+from collections import deque
+
+from sqlalchemy import delete, func, insert, select
+
+from periodic import start_periodic
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Events held in process memory, shared by every bus given the same instance."""
+
+    def __init__(self, retain=10000):
+        self._events = deque(maxlen=retain)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def append(self, event_type, payload):
+        with self._lock:
+            self._sequence += 1
+            self._events.append((self._sequence, event_type, payload))
+            return self._sequence
+
+    def read(self, after):
+        with self._lock:
+            return [event for event in self._events if event[0] > after]
+
+    def position(self):
+        return self._sequence
+
+
+class TableBackend:
+    """Events stored in a database table shared by all workers.
+
+    Appends use their own connection and transaction, so publishing after a
+    write has committed does not touch the caller's session.
+    """
+
+    # Appends between deletions of events older than ``retain``
+    PRUNE_EVERY = 1000
+
+    def __init__(self, db, model, retain=10000):
+        """
+        Args:
+            db: Flask-SQLAlchemy extension whose engine is used
+            model: Event model with ``id``, ``event_type`` and ``payload`` columns
+            retain (int): Number of most recent events kept in the table
+        """
+        self.db = db
+        self.model = model
+        self.retain = retain
+
+    def append(self, event_type, payload):
+        model = self.model
+        with self.db.engine.begin() as connection:
+            sequence = connection.scalar(
+                insert(model).values(event_type=event_type, payload=payload).returning(model.id))
+            if sequence % self.PRUNE_EVERY == 0:
+                connection.execute(delete(model).where(model.id <= sequence - self.retain))
+        return sequence
+
+    def read(self, after):
+        model = self.model
+        with self.db.engine.connect() as connection:
+            return [tuple(row) for row in connection.execute(
+                select(model.id, model.event_type, model.payload)
+                .where(model.id > after)
+                .order_by(model.id)
+            )]
+
+    def position(self):
+        with self.db.engine.connect() as connection:
+            return connection.scalar(select(func.max(self.model.id))) or 0
+
+
+class EventBus:
+    """Per-worker buffer of recent events with blocking reads for streams."""
+
+    def __init__(self, backend, history=1000, poll_interval=1.0):
+        """
+        Args:
+            backend: Event backend, see the module docstring
+            history (int): Events kept for clients that reconnect
+            poll_interval (float): Seconds between reads of the backend
+        """
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self._events = deque(maxlen=history)
+        self._changed = threading.Condition()
+        self._pump_lock = threading.Lock()
+        self._loaded = threading.Event()
+        # Sequence of the newest event seen, and of the newest event no
+        # longer (or never) in the buffer
+        self.sequence = 0
+        self._floor = 0
+
+    def publish(self, event_type, data):
+        """Publish an event; failures are logged rather than raised to the writer."""
+        try:
+            self.backend.append(event_type, dumps(data).decode())
+        except Exception:
+            logger.exception("Publishing %s event failed", event_type)
+            return
+        if self._loaded.is_set():
+            # Deliver to this worker's streams without waiting for the relay
+            self.pump()
+
+    def pump(self):
+        """Move events appended since the last read into the buffer and wake waiting streams."""
+        with self._pump_lock:
+            if not self._loaded.is_set():
+                # Start at the current position; older events are not replayed
+                self.sequence = self._floor = self.backend.position()
+                self._loaded.set()
+                return
+            rows = self.backend.read(self.sequence)
+            if not rows:
+                return
+            with self._changed:
+                for row in rows:
+                    if len(self._events) == self._events.maxlen:
+                        self._floor = self._events[0][0]
+                    self._events.append(row)
+                self.sequence = rows[-1][0]
+                self._changed.notify_all()
+
+    def buffered(self, last_id):
+        """Whether every event after ``last_id`` is still in the buffer."""
+        return last_id >= self._floor
+
+    def since(self, last_id):
+        """Return the buffered events after ``last_id``, or None if some were dropped."""
+        with self._changed:
+            if not self.buffered(last_id):
+                return None
+            return [event for event in self._events if event[0] > last_id]
+
+    def wait(self, last_id, timeout):
+        """Block until there are events after ``last_id`` or ``timeout`` passes, then return ``since(last_id)``."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.sequence > last_id, timeout)
+        return self.since(last_id)
+
+    def wait_loaded(self, timeout=None):
+        return self._loaded.wait(timeout)
+
+    def start_relay(self, pump):
+        """Run ``pump()`` now and then every ``poll_interval`` seconds in a daemon thread."""
+        start_periodic('event-relay', self.poll_interval, pump, key=self)
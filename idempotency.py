@@ -0,0 +1,124 @@
+"""
+Idempotency keys and request coalescing.
+
+``Coalescer`` makes concurrent calls with the same key share one execution:
+the first caller (the leader) runs the operation while the others wait for
+its result. Results of operations that should be replayable are then kept
+for ``ttl`` seconds in an LRU bounded to ``max_entries``, so retries with
+the same key get the stored result without running the operation again.
+
+Every key carries a fingerprint of the request it was first used with; a
+key reused for a different request is rejected rather than answered with
+an unrelated result.
+
+This is per process. The issuance endpoints add a database claim behind it
+so duplicates served by different workers are caught as well.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class KeyReuseError(Exception):
+    """The key was first used with a different request."""
+
+
+class RequestInProgress(Exception):
+    """The leader did not finish within the wait timeout."""
+
+
+class _Flight:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    """Shares in-flight executions and remembers completed results by key."""
+
+    def __init__(self, max_entries=1000, ttl=86400.0, wait_timeout=30.0, clock=time.monotonic):
+        """
+        Args:
+            max_entries (int): Completed results kept; the least recently used go first
+            ttl (float): Seconds a completed result is kept
+            wait_timeout (float): Seconds a follower waits for the leader
+            clock (callable): Monotonic time in seconds
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.clock = clock
+        self._completed = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, fingerprint):
+        """Return the stored result for ``key``, or None. Called with the lock held."""
+        entry = self._completed.get(key)
+        if entry is None:
+            return None
+        stored_fingerprint, result, expires = entry
+        if expires <= self.clock():
+            del self._completed[key]
+            return None
+        if stored_fingerprint != fingerprint:
+            raise KeyReuseError(key)
+        self._completed.move_to_end(key)
+        return result
+
+    def execute(self, key, fingerprint, operation, keep=lambda result: True, stored=lambda result: result):
+        """Run ``operation()`` once for all concurrent callers with ``key``.
+
+        Args:
+            key (str): Idempotency key
+            fingerprint (str): Digest of the request the key is used for
+            operation (callable): Produces the result
+            keep (callable): Whether a result is stored for later retries
+            stored (callable): Turns a result into what is stored, e.g.
+                without secrets that must only reach the caller that ran it
+
+        Returns:
+            tuple: ``(result, outcome)``, where ``outcome`` is "executed" if
+            this call ran the operation, "coalesced" if it waited for a
+            concurrent call and "replayed" if the result was stored
+
+        Raises:
+            KeyReuseError: If the key is in use for a different request
+            RequestInProgress: If the leader is still running after ``wait_timeout``
+        """
+        with self._lock:
+            result = self._lookup(key, fingerprint)
+            if result is not None:
+                return result, 'replayed'
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight(fingerprint)
+            elif flight.fingerprint != fingerprint:
+                raise KeyReuseError(key)
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                raise RequestInProgress(key)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, 'coalesced'
+
+        try:
+            flight.result = operation()
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight.error is None and keep(flight.result):
+                    self._completed[key] = (fingerprint, stored(flight.result), self.clock() + self.ttl)
+                    self._completed.move_to_end(key)
+                    while len(self._completed) > self.max_entries:
+                        self._completed.popitem(last=False)
+            flight.done.set()
+        return flight.result, 'executed'
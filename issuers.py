@@ -0,0 +1,137 @@
+"""
+Issuer hierarchy cache.
+
+Certificates reference the CA that signed them through ``issuer_id``, and
+each issuer row points at the CA that signed it through ``parent_id`` (NULL
+for a root). There are a handful of CAs against millions of certificates,
+so each worker keeps the whole hierarchy in memory as an ``IssuerTree``:
+resolving a chain to the root is a walk over dicts instead of one query per
+level, and per-issuer counts are rolled up the tree without touching the
+certificate table.
+
+The tree is loaded on first use and kept until the issuers' data version
+changes, which every write to the issuer table bumps; checking the version
+is a primary key lookup. Chains are computed once per tree.
+"""
+
+import threading
+from collections import namedtuple
+
+from sqlalchemy import select
+
+IssuerNode = namedtuple('IssuerNode', ('id', 'name', 'parent_id'))
+
+
+class IssuerTree:
+    """Immutable snapshot of the issuer hierarchy."""
+
+    def __init__(self, rows, version=None):
+        """
+        Args:
+            rows (iterable): ``(id, name, parent_id)`` of every issuer
+            version (int, optional): Data version the rows were read at
+        """
+        self.version = version
+        self._nodes = {row[0]: IssuerNode(*row) for row in rows}
+        self._ids = {node.name: node.id for node in self._nodes.values()}
+        self._children = {issuer_id: [] for issuer_id in self._nodes}
+        self._roots = []
+        for node in sorted(self._nodes.values(), key=lambda node: node.name):
+            if node.parent_id in self._nodes:
+                self._children[node.parent_id].append(node.id)
+            else:
+                self._roots.append(node.id)
+        self._chains = {}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, issuer_id):
+        return issuer_id in self._nodes
+
+    def __iter__(self):
+        return iter(self._nodes.values())
+
+    def get(self, issuer_id):
+        return self._nodes.get(issuer_id)
+
+    def id_for(self, name):
+        return self._ids.get(name)
+
+    def chain(self, issuer_id):
+        """Return the nodes from ``issuer_id`` up to its root, or an empty tuple if it is unknown."""
+        chain = self._chains.get(issuer_id)
+        if chain is not None:
+            return chain
+        nodes = []
+        seen = set()
+        current = issuer_id
+        # A parent_id cycle cannot be written through the API; stop at one anyway
+        while current in self._nodes and current not in seen:
+            seen.add(current)
+            nodes.append(self._nodes[current])
+            current = self._nodes[current].parent_id
+        chain = self._chains[issuer_id] = tuple(nodes)
+        return chain
+
+    def is_ancestor(self, ancestor_id, issuer_id):
+        """Whether ``ancestor_id`` is ``issuer_id`` or one of the CAs above it."""
+        return any(node.id == ancestor_id for node in self.chain(issuer_id))
+
+    def walk(self):
+        """Yield ``(node, depth)`` depth first, roots and siblings in name order."""
+        stack = [(issuer_id, 0) for issuer_id in reversed(self._roots)]
+        while stack:
+            issuer_id, depth = stack.pop()
+            yield self._nodes[issuer_id], depth
+            stack.extend((child, depth + 1) for child in reversed(self._children[issuer_id]))
+
+    def rollup(self, counts):
+        """Add each issuer's count to every CA above it.
+
+        Args:
+            counts (dict): Certificates signed directly by each issuer id
+
+        Returns:
+            dict: Certificates signed by each issuer or any CA below it
+        """
+        totals = dict.fromkeys(self._nodes, 0)
+        for issuer_id, count in counts.items():
+            for node in self.chain(issuer_id):
+                totals[node.id] += count
+        return totals
+
+
+class IssuerCache:
+    """Per-worker ``IssuerTree``, reloaded when the issuers' data version changes."""
+
+    def __init__(self, db, model, version):
+        """
+        Args:
+            db: Flask-SQLAlchemy extension whose session is used
+            model: Issuer model with ``id``, ``name`` and ``parent_id``
+            version (callable): Returns the current data version of the issuer table
+        """
+        self.db = db
+        self.model = model
+        self.version = version
+        self._tree = None
+        self._lock = threading.Lock()
+
+    @property
+    def cached(self):
+        """The last tree loaded, without checking whether it is current; None before the first load."""
+        return self._tree
+
+    def tree(self):
+        """Return the current tree, reloading it if an issuer changed since it was loaded."""
+        version = self.version()
+        tree = self._tree
+        if tree is not None and tree.version == version:
+            return tree
+        with self._lock:
+            if self._tree is None or self._tree.version != version:
+                model = self.model
+                rows = self.db.session.execute(select(model.id, model.name, model.parent_id)).all()
+                self._tree = IssuerTree(rows, version)
+            return self._tree
@@ -0,0 +1,295 @@
+"""
+Pre-generated private key pool for certificate issuance.
+
+RSA key generation dominates the CPU cost of issuing a certificate and makes
+latency spiky under bursts. The pool keeps ready keys per (key_type,
+key_bits), refilled in the background by a process pool whenever a queue
+drops below its low watermark, up to its high watermark. ``acquire`` pops a
+ready key and falls back to generating one synchronously when the queue is
+empty.
+
+If the process pool breaks (a child killed by the OOM killer, say), jobs
+that cannot be submitted are dropped, the pool is replaced on the next
+refill and ``acquire`` keeps working by generating keys synchronously.
+
+Keys are generated with the ``cryptography`` package when it is installed
+and with the ``openssl`` command line tool otherwise.
+"""
+
+import logging
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+except ImportError:
+    rsa = None
+
+logger = logging.getLogger(__name__)
+
+# Key sizes accepted per key type, as for Vault's PKI secrets engine
+SUPPORTED_KEYS = {
+    'rsa': (2048, 3072, 4096, 8192),
+    'ec': (224, 256, 384, 521),
+    'ed25519': (0,),
+}
+EC_CURVES = {224: 'P-224', 256: 'P-256', 384: 'P-384', 521: 'P-521'}
+
+# Window over which the refill rate is reported
+RATE_WINDOW = 60.0
+
+
+def normalize_key_spec(key_type, key_bits):
+    """Validate a key type and size and return them in canonical form.
+
+    Raises:
+        ValueError: if the combination is not supported
+    """
+    key_type = str(key_type).lower()
+    if key_type not in SUPPORTED_KEYS:
+        raise ValueError(f"Unsupported key_type: {key_type}. Use one of: {', '.join(SUPPORTED_KEYS)}")
+    if key_type == 'ed25519':
+        return key_type, 0
+    try:
+        key_bits = int(key_bits)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid key_bits: {key_bits}')
+    if key_bits not in SUPPORTED_KEYS[key_type]:
+        sizes = ', '.join(str(bits) for bits in SUPPORTED_KEYS[key_type])
+        raise ValueError(f'Unsupported key_bits for {key_type}: {key_bits}. Use one of: {sizes}')
+    return key_type, key_bits
+
+
+def generate_private_key(key_type, key_bits):
+    """Generate a private key and return it as a PKCS#8 PEM string."""
+    if rsa is not None:
+        if key_type == 'rsa':
+            key = rsa.generate_private_key(public_exponent=65537, key_size=key_bits)
+        elif key_type == 'ec':
+            curve = {224: ec.SECP224R1, 256: ec.SECP256R1, 384: ec.SECP384R1, 521: ec.SECP521R1}[key_bits]
+            key = ec.generate_private_key(curve())
+        else:
+            key = ed25519.Ed25519PrivateKey.generate()
+        return key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ).decode()
+
+    if key_type == 'rsa':
+        command = ['openssl', 'genpkey', '-algorithm', 'RSA', '-pkeyopt', f'rsa_keygen_bits:{key_bits}']
+    elif key_type == 'ec':
+        command = ['openssl', 'genpkey', '-algorithm', 'EC', '-pkeyopt', f'ec_paramgen_curve:{EC_CURVES[key_bits]}']
+    else:
+        command = ['openssl', 'genpkey', '-algorithm', 'ED25519']
+    return subprocess.run(command, check=True, capture_output=True, text=True).stdout
+
+
+class _KeyQueue:
+    """Ready keys and counters for one (key_type, key_bits)."""
+
+    def __init__(self):
+        self.keys = deque()
+        self.in_flight = 0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.completed_at = deque()
+
+
+class KeyPool:
+    """Background-refilled pool of private keys."""
+
+    def __init__(self, low_watermark=4, high_watermark=16, workers=1, generate=generate_private_key):
+        """
+        Args:
+            low_watermark (int): Refill is triggered when fewer keys than this are ready
+            high_watermark (int): Refill tops the queue up to this many keys
+            workers (int): Size of the key generation process pool
+            generate (callable): ``generate(key_type, key_bits)`` returning a PEM
+                string; must be picklable for the process pool
+        """
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.workers = workers
+        self.generate = generate
+        self._queues = {}
+        # Reentrant: a done callback runs inline if its future has already finished
+        self._lock = threading.RLock()
+        self._executor = None
+        self._executor_pid = None
+        # Process pools replaced after breaking, and the last error seen
+        self.restarts = 0
+        self.last_error = None
+
+    def _queue(self, spec):
+        queue = self._queues.get(spec)
+        if queue is None:
+            queue = self._queues.setdefault(spec, _KeyQueue())
+        return queue
+
+    def _get_executor(self):
+        # Executors do not survive fork, so each gunicorn worker gets its own.
+        # Spawned children only import this module, not the web application.
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _refill(self, spec):
+        """Submit enough jobs to bring ``spec`` up to the high watermark. Caller holds the lock."""
+        queue = self._queue(spec)
+        missing = self.high_watermark - len(queue.keys) - queue.in_flight
+        if missing <= 0:
+            return
+        executor = self._get_executor()
+        for _ in range(missing):
+            queue.in_flight += 1
+            try:
+                future = executor.submit(self.generate, *spec)
+            except (BrokenProcessPool, RuntimeError) as err:
+                # Broken or shut down: the key is never coming, so don't count it
+                queue.in_flight -= 1
+                self._discard_executor(executor, err)
+                return
+            future.add_done_callback(lambda done, spec=spec: self._on_generated(spec, done, executor))
+
+    def _discard_executor(self, executor, err):
+        """Drop a broken process pool so the next refill starts a new one. Caller holds the lock."""
+        if self._executor is not executor:
+            return
+        logger.warning("Key generation process pool failed, replacing it: %s", err)
+        self.last_error = f'{type(err).__name__}: {err}'
+        self.restarts += 1
+        self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _on_generated(self, spec, future, executor):
+        with self._lock:
+            queue = self._queue(spec)
+            queue.in_flight -= 1
+            if future.cancelled():
+                # Pending jobs are cancelled on shutdown
+                return
+            try:
+                queue.keys.append(future.result())
+            except BrokenProcessPool as err:
+                self._discard_executor(executor, err)
+                return
+            except Exception:
+                logger.exception("Background key generation failed for %s", spec)
+                return
+            queue.generated += 1
+            queue.completed_at.append(time.monotonic())
+
+    def warm(self, key_type, key_bits):
+        """Start filling the queue for a key spec ahead of the first request."""
+        spec = normalize_key_spec(key_type, key_bits)
+        with self._lock:
+            self._refill(spec)
+
+    def acquire(self, key_type, key_bits):
+        """Return ``(private_key_pem, from_pool)`` for a key spec.
+
+        A pooled key is returned immediately when available; otherwise one is
+        generated synchronously. Either way a background refill is started
+        when the queue is below its low watermark.
+        """
+        spec = normalize_key_spec(key_type, key_bits)
+        with self._lock:
+            queue = self._queue(spec)
+            key = queue.keys.popleft() if queue.keys else None
+            if key is None:
+                queue.misses += 1
+            else:
+                queue.hits += 1
+            if len(queue.keys) < self.low_watermark:
+                self._refill(spec)
+        if key is None:
+            return self.generate(*spec), False
+        return key, True
+
+    def acquire_many(self, key_type, key_bits, count):
+        """Return a list of ``count`` private keys for a key spec.
+
+        Pooled keys are used first and the rest are generated on the process
+        pool in parallel, falling back to generating them here if the
+        process pool fails. The queue is refilled afterwards.
+        """
+        spec = normalize_key_spec(key_type, key_bits)
+        futures = []
+        with self._lock:
+            queue = self._queue(spec)
+            keys = [queue.keys.popleft() for _ in range(min(count, len(queue.keys)))]
+            queue.hits += len(keys)
+            queue.misses += count - len(keys)
+            if len(keys) < count:
+                executor = self._get_executor()
+                try:
+                    for _ in range(count - len(keys)):
+                        futures.append(executor.submit(self.generate, *spec))
+                except (BrokenProcessPool, RuntimeError) as err:
+                    self._discard_executor(executor, err)
+        for future in futures:
+            try:
+                keys.append(future.result())
+            except BrokenProcessPool as err:
+                with self._lock:
+                    self._discard_executor(executor, err)
+            except Exception:
+                logger.exception("Key generation failed for %s", spec)
+        while len(keys) < count:
+            keys.append(self.generate(*spec))
+        with self._lock:
+            if len(queue.keys) < self.low_watermark:
+                self._refill(spec)
+        return keys
+
+    def metrics(self):
+        """Pool depth, refill rate and hit/miss counts per key spec."""
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for (key_type, key_bits), queue in sorted(self._queues.items()):
+                while queue.completed_at and now - queue.completed_at[0] > RATE_WINDOW:
+                    queue.completed_at.popleft()
+                result[f'{key_type}-{key_bits}' if key_bits else key_type] = {
+                    'key_type': key_type,
+                    'key_bits': key_bits,
+                    'depth': len(queue.keys),
+                    'in_flight': queue.in_flight,
+                    'hits': queue.hits,
+                    'misses': queue.misses,
+                    'generated': queue.generated,
+                    'refill_rate_per_second': len(queue.completed_at) / RATE_WINDOW,
+                }
+            if self._executor is None or self._executor_pid != os.getpid():
+                state = 'idle'
+            else:
+                state = 'broken' if getattr(self._executor, '_broken', False) else 'running'
+        return {
+            'executor': {
+                'state': state,
+                'restarts': self.restarts,
+                'last_error': self.last_error,
+            },
+            'low_watermark': self.low_watermark,
+            'high_watermark': self.high_watermark,
+            'workers': self.workers,
+            'pools': result,
+        }
+
+    def shutdown(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
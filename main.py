@@ -1,41 +1,229 @@
+import asyncio
+import base64
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import json
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+import ssl
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timedelta
+import click
+from flask import Blueprint, Flask, Response, abort, current_app, g, has_request_context, render_template, request, redirect, session, url_for, flash, jsonify, make_response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from cert_store import DEFAULT_ENCODING, ENCODINGS, SimulatedIssuer, chain_digest, compress, decompress, der_to_pem, iter_decompressed, split_der
+from events import EventBus, MemoryBackend, TableBackend
+from idempotency import Coalescer, KeyReuseError, RequestInProgress
+from issuers import IssuerCache
+from keypool import KeyPool, normalize_key_spec
+from metrics import QUERY_COUNT_BUCKETS, SIZE_BUCKETS, MetricsRegistry, QueryAccounting, pool_gauges
+from name_index import name_criterion, name_rows, parse_sans
+from periodic import start_periodic
+from renewal import LoadProfile, Pacer, Progress, RenewalPlanner, pipeline
+from replicas import ReplicaPool, RoutingSession, caught_up, on_primary
+from revocation_set import RevocationSet
+from sqlalchemy import and_, case, delete, inspect, insert, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
 from sqlalchemy.orm import DeclarativeBase
+from serialization import CERTIFICATE_FIELDS, SERVER_FIELDS, dumps, json_response, row_to_dict, rows_to_dicts
+from status_engine import StatusEngine
+from vault_poller import ConnectionPool, HealthPoller
 
 # Create a base class for SQLAlchemy models
 class Base(DeclarativeBase):
     pass
 
-# Initialize SQLAlchemy with the base class
-db = SQLAlchemy(model_class=Base)
+# Initialize SQLAlchemy with the base class; the session sends the reads of
+# replica-read endpoints to a replica (see replicas.py)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
+# Routes, request hooks and CLI commands; registered on the app by create_app().
+# CLI commands are top level, e.g. `flask --app main init-db`.
+console = Blueprint('console', __name__, cli_group=None)
 
-# Configure SQLAlchemy to use PostgreSQL
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+# Define models
+class Issuer(db.Model):
+    """CA that signs certificates; ``parent_id`` is the CA that signed it, NULL for a root.
 
-# Initialize the app with SQLAlchemy
-db.init_app(app)
+    Read through ``issuer_cache`` (see issuers.py); every write bumps the
+    "issuers" data version.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False, unique=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('issuer.id'))
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
 
-# Define models
 class Certificate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     common_name = db.Column(db.String(255), nullable=False)
+    # Issuer name, kept next to issuer_id for the filters, the running counts
+    # and the API; rows from before `migrate-issuers` have no issuer_id yet
     issuer = db.Column(db.String(255), nullable=False)
+    issuer_id = db.Column(db.Integer, db.ForeignKey('issuer.id'), index=True)
     valid_from = db.Column(db.DateTime, nullable=False)
     valid_until = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    # Composite indexes backing keyset pagination and the list filters: every
+    # page is an index range scan starting at the cursor position.
+    __table_args__ = (
+        db.Index('ix_certificate_valid_until_id', 'valid_until', 'id'),
+        db.Index('ix_certificate_status_valid_until_id', 'status', 'valid_until', 'id'),
+        db.Index('ix_certificate_issuer_valid_until_id', 'issuer', 'valid_until', 'id'),
+        db.Index('ix_certificate_common_name_id', 'common_name', 'id'),
+    )
     
+class CertificateName(db.Model):
+    """Common name and SANs of a certificate, keyed by reversed DNS labels.
+
+    See name_index.py for the key format and the queries it supports.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    certificate_id = db.Column(db.Integer, db.ForeignKey('certificate.id', ondelete='CASCADE'),
+                               nullable=False, index=True)
+    # "cn", "dns" or "ip"
+    kind = db.Column(db.String(10), nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    # Bytewise ordering keeps the suffix range scans exact on PostgreSQL
+    reversed_name = db.Column(
+        db.String(255).with_variant(db.String(255, collation='C'), 'postgresql'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_certificate_name_reversed_name_certificate_id', 'reversed_name', 'certificate_id'),
+    )
+
+class CertificateChain(db.Model):
+    """Issuer chain as compressed concatenated DER, stored once per distinct chain."""
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), nullable=False, unique=True)
+    encoding = db.Column(db.String(10), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+class SimulatedCA(db.Model):
+    """The CA of the simulated issuer, created once and shared by every worker.
+    A stand-in for Vault's CA; its key is stored unencrypted."""
+    name = db.Column(db.String(255), primary_key=True)
+    private_key = db.Column(db.Text, nullable=False)
+    certificate = db.Column(db.LargeBinary, nullable=False)
+
+class CertificateBody(db.Model):
+    """Compressed DER of a certificate, kept out of the certificate table so
+    list queries never read it. See cert_store.py."""
+    certificate_id = db.Column(db.Integer, db.ForeignKey('certificate.id', ondelete='CASCADE'), primary_key=True)
+    encoding = db.Column(db.String(10), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    chain_id = db.Column(db.Integer, db.ForeignKey('certificate_chain.id'))
+
+class ArchivedCertificate(db.Model):
+    """Expired and revoked certificates moved out of the certificate table by
+    the ``archive-certificates`` command. Ids are kept, so archived
+    certificates keep their serial numbers."""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(255), nullable=False)
+    common_name = db.Column(db.String(255), nullable=False)
+    issuer = db.Column(db.String(255), nullable=False)
+    issuer_id = db.Column(db.Integer, db.ForeignKey('issuer.id'))
+    valid_from = db.Column(db.DateTime, nullable=False)
+    valid_until = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime)
+    # Comma-separated SANs; the name index only covers the certificate table
+    alt_names = db.Column(db.Text)
+    ip_sans = db.Column(db.Text)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_archived_certificate_valid_until_id', 'valid_until', 'id'),
+        db.Index('ix_archived_certificate_issuer_valid_until_id', 'issuer', 'valid_until', 'id'),
+        db.Index('ix_archived_certificate_common_name_id', 'common_name', 'id'),
+    )
+
+class ArchivedCertificateBody(db.Model):
+    """Compressed DER of an archived certificate, moved from certificate_body."""
+    certificate_id = db.Column(db.Integer, db.ForeignKey('archived_certificate.id', ondelete='CASCADE'),
+                               primary_key=True)
+    encoding = db.Column(db.String(10), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    chain_id = db.Column(db.Integer, db.ForeignKey('certificate_chain.id'))
+
+class RevocationEntry(db.Model):
+    """Append-only revocation log; the id doubles as the CRL sequence number."""
+    id = db.Column(db.Integer, primary_key=True)
+    # Not a foreign key: the log is kept even if the certificate row goes away
+    certificate_id = db.Column(db.Integer, nullable=False, index=True)
+    reason = db.Column(db.String(50), nullable=False, default="unspecified")
+    revoked_at = db.Column(db.DateTime, nullable=False)
+
+class CertificateStat(db.Model):
+    """Running certificate counts per status and per issuer for the dashboard.
+
+    Counts are adjusted in the same transaction as issuance and revocation,
+    and recomputed from the certificate table periodically to correct drift.
+    """
+    dimension = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class DataVersion(db.Model):
+    """Version counter per data scope, bumped by every write to that scope.
+
+    Read endpoints derive their ETags from it and use it to validate cached
+    responses, so a write in any worker invalidates the caches of all workers.
+    """
+    scope = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ConsoleEvent(db.Model):
+    """Live console events shared between processes with EVENT_BACKEND=table. See events.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    # JSON encoded once by the publisher
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+class IdempotencyRecord(db.Model):
+    """Response of an issuance request sent with an Idempotency-Key.
+
+    The row is inserted before the request runs, so it doubles as a claim
+    that keeps other workers from running a duplicate; ``status_code`` is
+    NULL until the response is stored.
+    """
+    # Request path and key
+    key = db.Column(db.String(512), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class RenewalTask(db.Model):
+    """Scheduled renewal of a certificate (see renewal.py).
+
+    Written by `plan-renewals` and worked off by `renew-certificates`, which
+    moves it from "pending" to "renewed", or to "failed" after
+    RENEWAL_MAX_ATTEMPTS errors. ``renewed_id`` is the certificate that
+    replaced this one.
+    """
+    certificate_id = db.Column(db.Integer, primary_key=True)
+    scheduled_at = db.Column(db.DateTime, nullable=False)
+    # Latest renewal time that leaves RENEWAL_MARGIN_DAYS before expiry
+    deadline = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    renewed_id = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_renewal_task_status_scheduled_at_certificate_id', 'status', 'scheduled_at', 'certificate_id'),
+    )
+
 class VaultServer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -45,14 +233,34 @@ class VaultServer(db.Model):
     version = db.Column(db.String(50))
     last_checked = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
 
-# Create database tables
-with app.app_context():
+def init_database():
+    """Create missing tables, indexes and the simulated CA.
+
+    ``create_all`` leaves existing tables alone, so indexes added to a model
+    later are created here. Existing columns are not altered, and indexes on
+    columns a table does not have yet are left to their migration command.
+    """
     db.create_all()
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if all(column.name in columns for column in index.columns):
+                index.create(db.engine, checkfirst=True)
+    _load_simulated_ca()
+
+@console.cli.command('init-db')
+@click.option('--seed', is_flag=True, help='Add sample data if the database is empty.')
+def init_db_command(seed):
+    """Create the database schema."""
+    init_database()
+    if seed:
+        seed_sample_data()
+    refresh_certificate_stats()
+    click.echo("Database initialized")
 
 # Seed function to add sample data if database is empty
 def seed_sample_data():
-    from datetime import datetime, timedelta
-    
     # Only seed if there's no data
     if not Certificate.query.first() and not VaultServer.query.first():
         # Add sample vault servers
@@ -82,12 +290,15 @@ def seed_sample_data():
         db.session.add_all(servers)
         
         # Add sample certificates
+        issuer_ids = _create_issuers((SELF_SIGNED_ISSUER, "Vault Root CA", "Vault Intermediate CA"),
+                                     parents={"Vault Intermediate CA": "Vault Root CA"})
         now = datetime.now()
         certificates = [
             Certificate(
                 name="root-ca",
                 common_name="Vault Root CA",
-                issuer="Self",
+                issuer=SELF_SIGNED_ISSUER,
+                issuer_id=issuer_ids[SELF_SIGNED_ISSUER],
                 valid_from=now - timedelta(days=30),
                 valid_until=now + timedelta(days=3650),
                 status="valid"
@@ -96,6 +307,7 @@ def seed_sample_data():
                 name="intermediate-ca",
                 common_name="Vault Intermediate CA",
                 issuer="Vault Root CA",
+                issuer_id=issuer_ids["Vault Root CA"],
                 valid_from=now - timedelta(days=15),
                 valid_until=now + timedelta(days=1825),
                 status="valid"
@@ -104,6 +316,7 @@ def seed_sample_data():
                 name="api-example-com",
                 common_name="api.example.com",
                 issuer="Vault Intermediate CA",
+                issuer_id=issuer_ids["Vault Intermediate CA"],
                 valid_from=now - timedelta(days=5),
                 valid_until=now + timedelta(days=365),
                 status="valid"
@@ -112,123 +325,2043 @@ def seed_sample_data():
                 name="expiring-cert",
                 common_name="expiring.example.com",
                 issuer="Vault Intermediate CA",
+                issuer_id=issuer_ids["Vault Intermediate CA"],
                 valid_from=now - timedelta(days=350),
                 valid_until=now + timedelta(days=15),
                 status="expiring"
             )
         ]
         db.session.add_all(certificates)
+        db.session.flush()
+        db.session.execute(insert(CertificateName), [
+            row for cert in certificates for row in name_rows(cert.id, cert.common_name)
+        ])
         db.session.commit()
         print("Database seeded with sample data")
 
+# Certificate statuses written by the application; all but "revoked" can be revoked
+CERTIFICATE_STATUSES = ('valid', 'expiring', 'expired', 'revoked')
+REVOCABLE_STATUSES = ('valid', 'expiring', 'expired')
+
+# Dashboard summary settings
+EXPIRY_BUCKET_DAYS = (7, 30, 90)
+SOONEST_EXPIRING_LIMIT = 10
+SUMMARY_CACHE_TTL = timedelta(seconds=60)
+# Seconds between recomputations of the running counts by `refresh-stats`
+# or, with STATS_REFRESH_ENABLED=1, by a thread in each worker
+STATS_REFRESH_INTERVAL = float(os.environ.get("STATS_REFRESH_INTERVAL", "900"))
+
+_summary_lock = threading.Lock()
+_summary_cache = {'value': None, 'expires': None}
+
+def _bump_stats(deltas):
+    """Apply ``{(dimension, key): delta}`` to the running counts. The caller commits."""
+    for (dimension, key), delta in deltas.items():
+        if not delta:
+            continue
+        stmt = (
+            update(CertificateStat)
+            .where(CertificateStat.dimension == dimension, CertificateStat.key == key)
+            .values(count=CertificateStat.count + delta)
+        )
+        if db.session.execute(stmt).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.add(CertificateStat(dimension=dimension, key=key, count=delta))
+        except IntegrityError:
+            # A concurrent transaction created the row first
+            db.session.execute(stmt)
+    _summary_cache['value'] = None
+
+def refresh_certificate_stats():
+    """Recompute the running counts from the certificate table and return how many changed.
+
+    The existing count rows are locked before the certificates are counted,
+    so an issuance or revocation in another transaction either commits
+    before the counts are taken or applies its change on top of the new
+    counts, and concurrent refreshes run one after the other. Counts are
+    updated in place; rows whose key no longer has certificates are set to 0.
+    """
+    # UPDATE rather than SELECT ... FOR UPDATE so SQLite takes its write lock too
+    previous = {
+        (row.dimension, row.key): row.count for row in db.session.execute(
+            update(CertificateStat).values(count=CertificateStat.count)
+            .returning(CertificateStat.dimension, CertificateStat.key, CertificateStat.count)
+        )
+    }
+    counts = {('status', key): count for key, count in db.session.execute(
+        select(Certificate.status, db.func.count()).group_by(Certificate.status)
+    )}
+    # Grouped by issuer_id and named from the issuer cache; rows not yet
+    # linked by `migrate-issuers` are grouped by name
+    by_issuer_id = db.session.execute(
+        select(Certificate.issuer_id, db.func.count())
+        .where(Certificate.issuer_id.isnot(None))
+        .group_by(Certificate.issuer_id)
+    ).all()
+    by_issuer = Counter(dict(db.session.execute(
+        select(Certificate.issuer, db.func.count())
+        .where(Certificate.issuer_id.is_(None))
+        .group_by(Certificate.issuer)
+    ).all()))
+    tree = issuer_cache.tree()
+    for issuer_id, count in by_issuer_id:
+        by_issuer[tree.get(issuer_id).name] += count
+    counts.update((('issuer', key), count) for key, count in by_issuer.items())
+
+    changed = [{'dimension': dimension, 'key': key, 'count': counts.get((dimension, key), 0)}
+               for (dimension, key), count in previous.items() if counts.get((dimension, key), 0) != count]
+    if changed:
+        db.session.execute(update(CertificateStat), changed)
+    for (dimension, key), count in counts.items():
+        if (dimension, key) in previous:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.add(CertificateStat(dimension=dimension, key=key, count=count))
+        except IntegrityError:
+            # Created meanwhile by an issuance, which counted itself; any
+            # difference is corrected by the next refresh
+            continue
+        changed.append((dimension, key))
+    db.session.commit()
+    _summary_cache['value'] = None
+    return len(changed)
+
+@console.cli.command('refresh-stats')
+@click.option('--once', is_flag=True, help='Refresh once and exit.')
+@click.option('--interval', default=STATS_REFRESH_INTERVAL, show_default=True, help='Seconds between refreshes.')
+def run_stats_refresh(once, interval):
+    """Recompute the dashboard's running certificate counts to correct drift."""
+    while True:
+        started = time.monotonic()
+        changed = refresh_certificate_stats()
+        click.echo(f"Refreshed certificate counts in {time.monotonic() - started:.2f}s: {changed} corrected")
+        if once:
+            break
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+def _start_stats_refresh_thread(app):
+    def refresh():
+        with app.app_context():
+            try:
+                refresh_certificate_stats()
+            except Exception:
+                db.session.rollback()
+                raise
+    start_periodic('stats-refresh', STATS_REFRESH_INTERVAL, refresh, delay=True)
+
+def certificate_summary(now=None):
+    """Aggregate certificate counts for the dashboard.
+
+    Status and issuer counts come from the running counts; expiry buckets and
+    the soonest expiring list are range queries on the ``valid_until`` index.
+    The result is cached per worker for a short time. ``event_id`` is the
+    last console event published before the queries ran; the dashboard
+    applies the events after it, so a cached summary is only reused while
+    those events are still buffered.
+    """
+    now = now or datetime.now()
+    with _summary_lock:
+        cached = _summary_cache['value']
+        if cached is not None and _summary_cache['expires'] > now and event_bus.buffered(cached['event_id']):
+            return cached
+        event_id = event_bus.sequence
+
+        by_status = {}
+        by_issuer = {}
+        for dimension, key, count in db.session.execute(
+                select(CertificateStat.dimension, CertificateStat.key, CertificateStat.count)):
+            if count:
+                (by_status if dimension == 'status' else by_issuer)[key] = count
+        
+        unrevoked = Certificate.status != "revoked"
+        expiring_within = {}
+        for days in EXPIRY_BUCKET_DAYS:
+            expiring_within[days] = db.session.scalar(
+                select(db.func.count()).select_from(Certificate).where(
+                    Certificate.valid_until >= now,
+                    Certificate.valid_until < now + timedelta(days=days),
+                    unrevoked
+                )
+            )
+        soonest_expiring = db.session.execute(
+            select(*_certificate_columns())
+            .where(Certificate.valid_until >= now, unrevoked)
+            .order_by(Certificate.valid_until, Certificate.id)
+            .limit(SOONEST_EXPIRING_LIMIT)
+        ).all()
+        
+        summary = {
+            'total': sum(by_status.values()),
+            'by_status': by_status,
+            'by_issuer': dict(sorted(by_issuer.items(), key=lambda item: -item[1])),
+            'expiring_within': expiring_within,
+            'soonest_expiring': soonest_expiring,
+            'event_id': event_id
+        }
+        _summary_cache['value'] = summary
+        _summary_cache['expires'] = now + SUMMARY_CACHE_TTL
+        return summary
+
+# Response cache settings for the read endpoints
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_MAX_BODY = 1024 * 1024
+
+def _bump_version(scope):
+    """Invalidate cached responses for ``scope``. The caller commits."""
+    if has_request_context():
+        g.setdefault('written_scopes', set()).add(scope)
+    stmt = update(DataVersion).where(DataVersion.scope == scope).values(version=DataVersion.version + 1)
+    if db.session.execute(stmt).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(DataVersion(scope=scope, version=1))
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        db.session.execute(stmt)
+
+def _data_version(scope):
+    return db.session.scalar(select(DataVersion.version).where(DataVersion.scope == scope)) or 0
+
+class ResponseCache:
+    """Per-worker LRU of serialized response bodies tagged with a data version."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+response_cache = ResponseCache()
+
+def cached_response(scope):
+    """Serve a GET endpoint from ``response_cache`` with conditional request support.
+
+    The strong ETag is derived from the scope's data version and the request
+    path, so a matching ``If-None-Match`` is answered with 304 without running
+    the view, and repeat requests reuse the cached body until the next write
+    to the scope. Only the version lookup touches the database.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version = _data_version(scope)
+            key = request.full_path
+            etag = hashlib.sha1(f'{scope}:{version}:{key}'.encode()).hexdigest()
+            if etag in request.if_none_match:
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            
+            cached = response_cache.get(key, version)
+            if cached is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                cached = (response.get_data(), response.mimetype)
+                if len(cached[0]) <= RESPONSE_CACHE_MAX_BODY:
+                    response_cache.put(key, version, cached)
+            response = Response(cached[0], mimetype=cached[1])
+            response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+# Issuer hierarchy, cached per worker and reloaded after any change to the
+# issuer table (see issuers.py)
+issuer_cache = IssuerCache(db, Issuer, lambda: _data_version('issuers'))
+
+# Issuer recorded for self-signed certificates
+SELF_SIGNED_ISSUER = "Self"
+
+def _create_issuers(names, parents=None):
+    """Return ``{name: id}`` for ``names``, creating the issuers that do not exist. The caller commits.
+
+    Args:
+        names (iterable): Issuer names
+        parents (dict, optional): Name of the signing CA of issuers created
+            here, created as well if needed; existing issuers keep their parent
+    """
+    parents = parents or {}
+    wanted = set(names) | set(parents.values())
+    ids = dict(db.session.execute(select(Issuer.name, Issuer.id).where(Issuer.name.in_(wanted))).all())
+    created = []
+    for name in sorted(wanted - ids.keys()):
+        try:
+            with db.session.begin_nested():
+                issuer = Issuer(name=name)
+                db.session.add(issuer)
+            ids[name] = issuer.id
+            created.append(name)
+        except IntegrityError:
+            # A concurrent transaction created it first
+            ids[name] = db.session.scalar(select(Issuer.id).where(Issuer.name == name))
+    for name in created:
+        if name in parents:
+            db.session.execute(update(Issuer).where(Issuer.id == ids[name]).values(parent_id=ids[parents[name]]))
+    if created:
+        _bump_version('issuers')
+    return ids
+
+def _issuer_id(name):
+    """Id of the issuer called ``name``, created as a root CA if it is new.
+
+    Issuer ids never change, so a cached tree that knows the name is good
+    enough. Commits when the issuer is created, so call it before any other
+    writes of the request.
+    """
+    issuer_id = (issuer_cache.cached or issuer_cache.tree()).id_for(name)
+    if issuer_id is None:
+        issuer_id = _create_issuers([name])[name]
+        db.session.commit()
+    return issuer_id
+
+def _link_issuer_parents():
+    """Give root issuers whose own CA certificate is in the inventory the parent that signed it.
+
+    The CA certificate of an issuer is the latest certificate with the
+    issuer's name as its common name; self-signed ones leave the issuer a
+    root. Links that would form a cycle are skipped. The caller commits.
+
+    Returns:
+        int: Number of issuers linked
+    """
+    tree = issuer_cache.tree()
+    parents = {node.id: node.parent_id for node in tree}
+    linked = 0
+    for node in tree:
+        if node.parent_id is not None:
+            continue
+        signer = db.session.scalar(
+            select(Certificate.issuer)
+            .where(Certificate.common_name == node.name)
+            .order_by(Certificate.valid_until.desc())
+            .limit(1)
+        )
+        parent_id = tree.id_for(signer)
+        if signer in (node.name, SELF_SIGNED_ISSUER) or parent_id is None:
+            continue
+        ancestor = parent_id
+        while ancestor is not None and ancestor != node.id:
+            ancestor = parents.get(ancestor)
+        if ancestor == node.id:
+            continue
+        parents[node.id] = parent_id
+        db.session.execute(update(Issuer).where(Issuer.id == node.id).values(parent_id=parent_id))
+        linked += 1
+    if linked:
+        _bump_version('issuers')
+    return linked
+
+def _issuer_counts(tree):
+    """Certificates signed directly by each issuer id, from the running counts."""
+    counts = {}
+    for name, count in db.session.execute(
+            select(CertificateStat.key, CertificateStat.count).where(CertificateStat.dimension == 'issuer')):
+        issuer_id = tree.id_for(name)
+        if issuer_id is not None and count:
+            counts[issuer_id] = count
+    return counts
+
+# Live console events, streamed to the pages from /api/v1/events. The memory
+# backend only reaches streams served by the publishing process; use
+# EVENT_BACKEND=table with several workers or with the background jobs
+# running as separate processes.
+EVENT_BACKEND = os.environ.get("EVENT_BACKEND", "memory")
+EVENT_HISTORY = int(os.environ.get("EVENT_HISTORY", "1000"))
+EVENT_POLL_INTERVAL = float(os.environ.get("EVENT_POLL_INTERVAL", "1"))
+EVENT_STREAM_MAX_AGE = float(os.environ.get("EVENT_STREAM_MAX_AGE", "300"))
+# Streams one worker serves at once. Each holds a thread of a threaded
+# worker, so keep it well below gunicorn's --threads; 0 lifts the limit for
+# async worker classes (gevent, eventlet), where a stream holds a greenlet.
+EVENT_MAX_STREAMS = int(os.environ.get("EVENT_MAX_STREAMS", "8"))
+# Seconds a client turned away for lack of stream slots waits before retrying
+EVENT_RETRY_AFTER = 10
+EVENT_KEEPALIVE_INTERVAL = 15
+EVENT_LOAD_TIMEOUT = 30
+# Rows carried by one event; larger changes are summarized by their counts
+EVENT_MAX_ROWS = 100
+
+def _event_backend(name):
+    if name == 'memory':
+        return MemoryBackend(retain=EVENT_HISTORY)
+    if name == 'table':
+        return TableBackend(db, ConsoleEvent, retain=EVENT_HISTORY * 10)
+    raise ValueError(f"Invalid EVENT_BACKEND: {name}. Use memory or table")
+
+event_bus = EventBus(_event_backend(EVENT_BACKEND), history=EVENT_HISTORY, poll_interval=EVENT_POLL_INTERVAL)
+
+def _event_counts(deltas):
+    """Nest ``{(dimension, key): delta}`` as ``{dimension: {key: delta}}``."""
+    counts = {}
+    for (dimension, key), delta in deltas.items():
+        if delta:
+            counts.setdefault(dimension, {})[key] = delta
+    return counts
+
+def _publish_certificates(event_type, deltas, certificates=(), ids=(), **fields):
+    """Publish a certificate event with its count changes and up to EVENT_MAX_ROWS rows or ids."""
+    data = dict(fields, counts=_event_counts(deltas), count=max(len(certificates), len(ids)))
+    if certificates:
+        data['certificates'] = list(certificates[:EVENT_MAX_ROWS])
+    if ids:
+        data['ids'] = list(ids[:EVENT_MAX_ROWS])
+    event_bus.publish(event_type, data)
+
+# Background status engine: moves certificates to "expiring" and "expired"
+# as their thresholds pass. Run it as a single separate process with
+# `flask --app main status-engine`, or in-process with STATUS_ENGINE_ENABLED=1.
+def _record_status_changes(deltas):
+    _bump_stats(deltas)
+    _bump_version('certificates')
+
+def _publish_status_changes(deltas, status, ids):
+    _publish_certificates('certificate.status', deltas, ids=ids, status=status)
+
+status_engine = StatusEngine(db, Certificate, on_change=_record_status_changes,
+                             on_commit=_publish_status_changes)
+
+@console.cli.command('status-engine')
+def run_status_engine():
+    """Run the certificate status engine until interrupted."""
+    status_engine.run_forever()
+
+def _start_status_engine_thread(app):
+    def run():
+        with app.app_context():
+            status_engine.run_forever()
+    threading.Thread(target=run, name='status-engine', daemon=True).start()
+
+# Vault health polling settings
+VAULT_POLL_INTERVAL = float(os.environ.get("VAULT_POLL_INTERVAL", "10"))
+VAULT_POLL_TIMEOUT = float(os.environ.get("VAULT_POLL_TIMEOUT", "2"))
+
+def _vault_ssl_context():
+    """TLS settings for polling, following the Vault CLI environment variables."""
+    context = ssl.create_default_context(cafile=os.environ.get("VAULT_CACERT"))
+    if os.environ.get("VAULT_SKIP_VERIFY", "").lower() in ("1", "true"):
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+def poll_vault_servers(poller, loop):
+    """Poll every registered server once and store the results in one batched UPDATE."""
+    rows = db.session.execute(
+        select(VaultServer.id, VaultServer.address, VaultServer.status, VaultServer.sealed, VaultServer.version)
+    ).all()
+    results = loop.run_until_complete(poller.poll_all([(row.id, row.address) for row in rows]))
+    if results:
+        now = datetime.now()
+        previous = {row.id: row._asdict() for row in rows}
+        # Unhealthy results leave seal state and version unchanged
+        changed = [dict(result) for result in results
+                   if any(previous[result['id']][key] != value for key, value in result.items())]
+        for result in results:
+            result['last_checked'] = now
+        db.session.execute(update(VaultServer), results)
+        _bump_version('servers')
+        db.session.commit()
+        if changed:
+            event_bus.publish('server.updated', {'servers': changed})
+    return results
+
+@console.cli.command('poll-servers')
+@click.option('--once', is_flag=True, help='Poll a single cycle and exit.')
+@click.option('--interval', default=VAULT_POLL_INTERVAL, show_default=True, help='Seconds between cycles.')
+@click.option('--concurrency', default=100, show_default=True, help='Maximum servers polled at once.')
+@click.option('--scheme', default=os.environ.get("VAULT_POLL_SCHEME", "https"), show_default=True,
+              help='Scheme for server addresses without one.')
+def run_vault_poller(once, interval, concurrency, scheme):
+    """Poll the health and seal status of every registered Vault server."""
+    loop = asyncio.new_event_loop()
+    pool = ConnectionPool(ssl_context=_vault_ssl_context())
+    poller = HealthPoller(pool, timeout=VAULT_POLL_TIMEOUT, max_concurrency=concurrency, default_scheme=scheme)
+    try:
+        while True:
+            started = time.monotonic()
+            results = poll_vault_servers(poller, loop)
+            statuses = Counter(result['status'] for result in results)
+            click.echo(f"Polled {len(results)} servers in {time.monotonic() - started:.2f}s: "
+                       f"{dict(statuses)} (connections opened: {pool.opened}, reused: {pool.reused}, "
+                       f"retried: {pool.retried})")
+            if once:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        pool.close()
+        loop.close()
+
+@console.cli.command('index-names')
+@click.option('--batch-size', default=5000, show_default=True, help='Certificates indexed per transaction.')
+def index_certificate_names(batch_size):
+    """Index the common names of certificates that have no name index entries.
+
+    Run once after upgrading a database created before the name index existed;
+    SANs of those certificates were never stored and cannot be recovered.
+    """
+    indexed = select(CertificateName.certificate_id).where(CertificateName.certificate_id == Certificate.id)
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(Certificate.id, Certificate.common_name)
+            .where(Certificate.id > last_id, ~indexed.exists())
+            .order_by(Certificate.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(insert(CertificateName), [
+            row for cert_id, common_name in rows for row in name_rows(cert_id, common_name)
+        ])
+        _bump_version('certificates')
+        db.session.commit()
+        last_id = rows[-1].id
+        total += len(rows)
+    click.echo(f"Indexed {total} certificates")
+
+def _add_issuer_columns():
+    """Create the issuer table and add issuer_id to certificate tables created without it."""
+    init_database()
+    columns = inspect(db.engine).get_columns
+    for model in (Certificate, ArchivedCertificate):
+        table = model.__tablename__
+        if 'issuer_id' not in {column['name'] for column in columns(table)}:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN issuer_id INTEGER REFERENCES issuer (id)"))
+    db.session.commit()
+    for index in Certificate.__table__.indexes:
+        if 'issuer_id' in index.columns:
+            index.create(db.engine, checkfirst=True)
+
+@console.cli.command('migrate-issuers')
+@click.option('--batch-size', default=5000, show_default=True, help='Certificates linked per transaction.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches.')
+def migrate_issuers(batch_size, pause):
+    """Link certificates to the issuer table by their issuer names.
+
+    Run once after upgrading a database created before the issuer table
+    existed, before starting the new version. Adds the issuer_id columns,
+    creates an issuer for every issuer name in use, links CAs whose own
+    certificate is in the inventory to the CA that signed it, and then fills
+    in issuer_id in batches of short transactions. Safe to interrupt and run
+    again: linked rows are skipped.
+    """
+    _add_issuer_columns()
+    models = (Certificate, ArchivedCertificate)
+    names = set()
+    for model in models:
+        names.update(db.session.scalars(select(model.issuer).distinct()))
+    ids = _create_issuers(names)
+    db.session.commit()
+    linked = _link_issuer_parents()
+    db.session.commit()
+    click.echo(f"{len(issuer_cache.tree())} issuers, {linked} linked to a parent CA")
+    for model in models:
+        last_id = 0
+        total = 0
+        while True:
+            batch = db.session.scalars(
+                select(model.id)
+                .where(model.id > last_id, model.issuer_id.is_(None))
+                .order_by(model.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            db.session.execute(
+                update(model)
+                .where(model.id.in_(batch))
+                .values(issuer_id=case(ids, value=model.issuer))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            last_id = batch[-1]
+            total += len(batch)
+            if pause:
+                time.sleep(pause)
+        click.echo(f"Linked {total} rows of {model.__tablename__}")
+
+# Archival: certificates expired or revoked more than ARCHIVE_RETENTION_DAYS
+# ago are moved to archived_certificate by `flask --app main archive-certificates`,
+# run periodically next to the other background jobs.
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", "90"))
+
+def _archive_batch(ids, now):
+    """Move certificates with their SANs and bodies to the archive. The caller commits.
+
+    Returns:
+        Counter: The ``(dimension, key): delta`` changes to the running counts
+    """
+    rows = db.session.execute(
+        select(*_certificate_columns(), Certificate.issuer_id).where(Certificate.id.in_(ids))
+    ).all()
+    sans = defaultdict(lambda: {'dns': [], 'ip': []})
+    for cert_id, kind, name in db.session.execute(
+            select(CertificateName.certificate_id, CertificateName.kind, CertificateName.name)
+            .where(CertificateName.certificate_id.in_(ids), CertificateName.kind != 'cn')
+            .order_by(CertificateName.id)):
+        sans[cert_id][kind].append(name)
+    
+    archived = []
+    deltas = Counter()
+    for row in rows:
+        deltas[('status', row.status)] -= 1
+        deltas[('issuer', row.issuer)] -= 1
+        values = row._asdict()
+        # The status engine may not have caught up with certificates past expiry
+        values['status'] = 'revoked' if row.status == 'revoked' else 'expired'
+        values['alt_names'] = ','.join(sans[row.id]['dns']) or None
+        values['ip_sans'] = ','.join(sans[row.id]['ip']) or None
+        values['archived_at'] = now
+        archived.append(values)
+    db.session.execute(insert(ArchivedCertificate), archived)
+    body_columns = ('certificate_id', 'encoding', 'data', 'chain_id')
+    db.session.execute(insert(ArchivedCertificateBody).from_select(
+        body_columns,
+        select(*(getattr(CertificateBody, column) for column in body_columns))
+        .where(CertificateBody.certificate_id.in_(ids))
+    ))
+    for model, column in ((CertificateBody, CertificateBody.certificate_id),
+                          (CertificateName, CertificateName.certificate_id),
+                          (RenewalTask, RenewalTask.certificate_id),
+                          (Certificate, Certificate.id)):
+        db.session.execute(delete(model).where(column.in_(ids)).execution_options(synchronize_session=False))
+    _bump_stats(deltas)
+    _bump_version('certificates')
+    return deltas
+
+def _table_size(model):
+    """Rows and bytes (table plus indexes, None where unsupported) of a model's table."""
+    table = model.__tablename__
+    rows = db.session.scalar(select(db.func.count()).select_from(model))
+    size = None
+    try:
+        with db.session.begin_nested():
+            if db.engine.dialect.name == 'postgresql':
+                size = db.session.scalar(text("SELECT pg_total_relation_size(:table)"), {'table': table})
+            elif db.engine.dialect.name == 'sqlite':
+                # Needs SQLite built with the dbstat virtual table
+                size = db.session.scalar(text(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE tbl_name = :table)"
+                ), {'table': table})
+    except SQLAlchemyError:
+        pass
+    return rows, size
+
+def _format_table_size(rows, size):
+    if size is None:
+        return f"{rows} rows"
+    return f"{rows} rows, {size / 1048576:.1f} MiB"
+
+@console.cli.command('archive-certificates')
+@click.option('--retention-days', default=ARCHIVE_RETENTION_DAYS, show_default=True,
+              help='Archive certificates expired or revoked more than this many days ago.')
+@click.option('--batch-size', default=1000, show_default=True, help='Certificates moved per transaction.')
+@click.option('--pause', default=0.1, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--dry-run', is_flag=True, help='Report what would be archived without moving anything.')
+def archive_certificates(retention_days, batch_size, pause, dry_run):
+    """Move expired and revoked certificates past the retention period to the archive.
+
+    Each batch is its own short transaction, so issuance and revocation are
+    never blocked for long. Prints the size of the certificate table before
+    and after; on PostgreSQL the space of deleted rows is reclaimed by
+    (auto)vacuum, so the byte count drops after the next vacuum.
+    """
+    now = datetime.now()
+    cutoff = now - timedelta(days=retention_days)
+    # The newest certificate is never archived: SQLite hands out max(id) + 1
+    # as the next id, which would reuse the ids of archived certificates
+    newest = db.session.scalar(select(db.func.max(Certificate.id))) or 0
+    revoked_before_cutoff = select(RevocationEntry.certificate_id).where(RevocationEntry.revoked_at < cutoff)
+    passes = (
+        ('expired', Certificate.valid_until < cutoff),
+        ('revoked', and_(Certificate.status == 'revoked', Certificate.valid_until >= cutoff,
+                         Certificate.id.in_(revoked_before_cutoff))),
+    )
+    before = _table_size(Certificate)
+    
+    totals = Counter()
+    for label, criterion in passes:
+        eligible = select(Certificate.id).where(criterion, Certificate.id < newest)
+        if dry_run:
+            totals[label] = db.session.scalar(select(db.func.count()).select_from(eligible.subquery()))
+            continue
+        while True:
+            ids = db.session.scalars(eligible.limit(batch_size)).all()
+            if not ids:
+                break
+            deltas = _archive_batch(ids, now)
+            db.session.commit()
+            _publish_certificates('certificate.archived', deltas, ids=ids)
+            totals[label] += len(ids)
+            time.sleep(pause)
+    
+    after = _table_size(Certificate)
+    archive = _table_size(ArchivedCertificate)
+    verb = 'Would archive' if dry_run else 'Archived'
+    click.echo(f"{verb} {sum(totals.values())} certificates "
+               f"({totals['expired']} expired, {totals['revoked']} revoked before {cutoff:%Y-%m-%d})")
+    click.echo(f"certificate: {_format_table_size(*before)} -> {_format_table_size(*after)}")
+    click.echo(f"archived_certificate: {_format_table_size(*archive)}")
+
+# Request metrics, served in the Prometheus text format at /metrics. Set
+# METRICS_DIR to a directory shared by all gunicorn workers (emptied on
+# startup) to aggregate across workers.
+metrics_registry = MetricsRegistry(
+    directory=os.environ.get("METRICS_DIR"),
+    flush_interval=float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+)
+request_count = metrics_registry.counter(
+    'http_requests', 'HTTP requests handled', ('method', 'route', 'status'))
+request_latency = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time to build the response', ('method', 'route'))
+request_queries = metrics_registry.histogram(
+    'http_request_sql_queries', 'SQL statements per request', ('route',), QUERY_COUNT_BUCKETS)
+request_query_time = metrics_registry.histogram(
+    'http_request_sql_duration_seconds', 'SQL execution time per request', ('route',))
+response_size = metrics_registry.histogram(
+    'http_response_size_bytes', 'Response body size; streamed responses are not counted', ('route',), SIZE_BUCKETS)
+query_accounting = QueryAccounting(metrics_registry)
+
+@console.before_app_request
+def _start_request_metrics():
+    metrics_registry.start_flusher()
+    g.request_started = time.perf_counter()
+    query_accounting.start()
+
+@console.after_app_request
+def _record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    queries, query_seconds = query_accounting.stop()
+    # The URL rule keeps label cardinality bounded
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_count.inc((request.method, route, str(response.status_code)))
+    request_latency.observe((request.method, route), elapsed)
+    request_queries.observe((route,), queries)
+    request_query_time.observe((route,), query_seconds)
+    if response.content_length is not None:
+        response_size.observe((route,), response.content_length)
+    return response
+
+# Read replicas: endpoints marked with @replica_reads run their queries on
+# one of DATABASE_REPLICA_URLS (comma-separated) that answers and trails the
+# primary by at most REPLICA_MAX_LAG seconds, and on the primary otherwise.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.environ.get("REPLICA_CHECK_INTERVAL", "1"))
+
+def _read_data_versions(engine):
+    with engine.connect() as connection:
+        return dict(connection.execute(select(DataVersion.scope, DataVersion.version)).all())
+
+replica_pool = ReplicaPool(_read_data_versions, max_lag=REPLICA_MAX_LAG, check_interval=REPLICA_CHECK_INTERVAL)
+replica_requests = metrics_registry.counter(
+    'replica_read_requests', 'Requests to replica-read endpoints by the database that served them', ('database',))
+metrics_registry.gauge('db_replica_lag_seconds', 'How far each read replica trailed the primary at the last check',
+                       ('replica',), lambda: {(replica.name,): replica.lag
+                                              for replica in replica_pool.replicas if replica.lag is not None})
+metrics_registry.gauge('db_replica_healthy', 'Whether each read replica is getting reads', ('replica',),
+                       lambda: {(replica.name,): int(replica.healthy) for replica in replica_pool.replicas})
+
+@console.before_app_request
+def _start_replica_monitor():
+    replica_pool.start_monitor()
+
+@console.after_app_request
+def _remember_written_versions(response):
+    """Keep the data versions a request wrote in the client's session, for read-your-writes."""
+    scopes = g.pop('written_scopes', None)
+    if scopes and replica_pool.replicas:
+        # On the request's own connection: checking out a second one while
+        # it is held can exhaust the pool under concurrent writes
+        with on_primary():
+            versions = dict(db.session.execute(select(DataVersion.scope, DataVersion.version)).all())
+        required = dict(session.get('min_versions') or {})
+        required.update((scope, versions.get(scope, 0)) for scope in scopes)
+        session['min_versions'] = required
+    return response
+
+def replica_reads(view):
+    """Run a read-only GET endpoint on a read replica when one is usable.
+
+    The replica must have caught up with the writes made by this client.
+    If it fails during the request, the view runs again on the primary.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not replica_pool.replicas:
+            return view(*args, **kwargs)
+        required = session.get('min_versions')
+        if required and all(caught_up(replica.versions, required) for replica in replica_pool.replicas):
+            # Every replica has these writes; no need to carry them around
+            session.pop('min_versions')
+            required = None
+        replica = replica_pool.choose(required)
+        if replica is not None:
+            g.read_replica = replica
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as err:
+                current_app.logger.warning("Replica %s failed, retrying on the primary: %s", replica.name, err)
+                replica_pool.mark_down(replica, err)
+                g.pop('read_replica', None)
+                db.session.rollback()
+            finally:
+                # Also counts views that end in abort(), e.g. a 404
+                if g.get('read_replica') is replica:
+                    replica_requests.inc((replica.name,))
+        replica_requests.inc(('primary',))
+        return view(*args, **kwargs)
+    return wrapper
+
+def _start_event_relay():
+    """Start this worker's event relay and wait for its first read of the backend."""
+    app = current_app._get_current_object()
+
+    def pump():
+        with app.app_context():
+            event_bus.pump()
+
+    event_bus.start_relay(pump)
+    return event_bus.wait_loaded(EVENT_LOAD_TIMEOUT)
+
+def _event_position():
+    """Id of the latest console event, taken before a page reads its data, or None without a feed."""
+    return event_bus.sequence if _start_event_relay() else None
+
 # Routes
-@app.route('/')
+@console.route('/')
+@replica_reads
 def index():
+    live = _event_position() is not None
+    summary = certificate_summary()
+    # Server updates are idempotent, so the page can apply events from the
+    # summary's position onwards to both tables
     return render_template('index.html', 
                           vault_servers=VaultServer.query.all(),
-                          certificates=Certificate.query.all())
+                          summary=summary,
+                          event_id=summary['event_id'] if live else None)
 
-@app.route('/certificates')
+@console.route('/certificates')
+@replica_reads
 def list_certificates():
+    event_id = _event_position()
     certificates = Certificate.query.all()
-    return render_template('certificates.html', certificates=certificates)
+    return render_template('certificates.html', certificates=certificates, event_id=event_id)
 
-@app.route('/servers')
+@console.route('/servers')
+@replica_reads
 def list_servers():
+    event_id = _event_position()
     servers = VaultServer.query.all()
-    return render_template('servers.html', servers=servers)
+    return render_template('servers.html', vault_servers=servers, event_id=event_id)
+
+# Pagination settings for the certificate list API
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+CERTIFICATE_SORT_KEYS = ('id', 'valid_until')
+
+# Issuance responses leave out created_at, which the database fills in
+ISSUED_CERTIFICATE_FIELDS = CERTIFICATE_FIELDS[:-1]
+
+def _certificate_columns(fields=CERTIFICATE_FIELDS, model=Certificate):
+    return [getattr(model, field) for field in fields]
+
+def _certificate_model(args):
+    """The archive is only read when a request asks for it with ``archived=true``."""
+    if args.get('archived', 'false').lower() in ('1', 'true'):
+        return ArchivedCertificate
+    return Certificate
+
+def _server_columns():
+    return [getattr(VaultServer, field) for field in SERVER_FIELDS]
+
+def _parse_datetime(value, field):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid datetime for {field}: {value}')
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _encode_cursor(sort, cert):
+    if sort == 'valid_until':
+        position = [cert.valid_until.isoformat(), cert.id]
+    else:
+        position = [cert.id]
+    raw = json.dumps({'sort': sort, 'after': position}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        position = data['after']
+        if data['sort'] != sort:
+            raise ValueError('Cursor was issued for a different sort order')
+        if sort == 'valid_until':
+            return datetime.fromisoformat(position[0]), int(position[1])
+        return (int(position[0]),)
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def _filter_certificates(query, args, model=Certificate):
+    """Apply the server-side filters shared by the certificate list endpoints."""
+    if args.get('status'):
+        query = query.filter(model.status == args['status'])
+    if args.get('issuer'):
+        query = query.filter(model.issuer == args['issuer'])
+    if args.get('common_name'):
+        # Prefix match so the common_name index can be used for a range scan
+        pattern = _escape_like(args['common_name']) + '%'
+        query = query.filter(model.common_name.like(pattern, escape='\\'))
+    if args.get('expires_before'):
+        query = query.filter(model.valid_until < _parse_datetime(args['expires_before'], 'expires_before'))
+    if args.get('expires_after'):
+        query = query.filter(model.valid_until >= _parse_datetime(args['expires_after'], 'expires_after'))
+    return query
+
+def _paginate_certificates(args, criteria=(), model=Certificate):
+    """Return one keyset page of certificate rows and the cursor for the next one.
+
+    Pages are ordered by ``(valid_until, id)`` or ``(id)`` and continue strictly
+    after the position encoded in the cursor, so fetching a page never requires
+    counting or skipping the rows before it. ``criteria`` are added to the
+    filters taken from ``args``; ``model`` selects the certificate table or
+    the archive.
+    """
+    sort = args.get('sort', 'id')
+    if sort not in CERTIFICATE_SORT_KEYS:
+        raise ValueError(f"Invalid sort key: {sort}. Use one of: {', '.join(CERTIFICATE_SORT_KEYS)}")
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    query = _filter_certificates(select(*_certificate_columns(model=model)).where(*criteria), args, model)
+    if sort == 'valid_until':
+        keys = (model.valid_until, model.id)
+    else:
+        keys = (model.id,)
+
+    if args.get('cursor'):
+        position = _decode_cursor(args['cursor'], sort)
+        if len(keys) == 1:
+            query = query.filter(keys[0] > position[0])
+        else:
+            query = query.filter(tuple_(*keys) > tuple_(*position))
+
+    # Fetch one extra row to find out whether another page exists
+    rows = db.session.execute(query.order_by(*keys).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(sort, rows[-1])
+    return rows, next_cursor
 
 # API routes
-@app.route('/api/v1/certificates', methods=['GET'])
+@console.route('/api/v1/certificates', methods=['GET'])
+@replica_reads
+@cached_response('certificates')
 def api_certificates():
-    certs = Certificate.query.all()
-    result = []
-    for cert in certs:
-        result.append({
-            'id': cert.id,
-            'name': cert.name,
-            'common_name': cert.common_name,
-            'issuer': cert.issuer,
-            'valid_from': cert.valid_from.isoformat(),
-            'valid_until': cert.valid_until.isoformat(),
-            'status': cert.status,
-            'created_at': cert.created_at.isoformat() if cert.created_at else None
-        })
-    return jsonify(certificates=result)
-
-@app.route('/api/v1/certificates/<int:certificate_id>', methods=['GET'])
+    try:
+        rows, next_cursor = _paginate_certificates(request.args, model=_certificate_model(request.args))
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    return json_response({
+        'certificates': rows_to_dicts(CERTIFICATE_FIELDS, rows),
+        'next_cursor': next_cursor
+    })
+
+@console.route('/api/v1/certificates/search', methods=['GET'])
+@replica_reads
+@cached_response('certificates')
+def search_certificates():
+    name = request.args.get('name')
+    if not name:
+        return jsonify({'error': 'Missing required parameter: name'}), 400
+    if _certificate_model(request.args) is ArchivedCertificate:
+        return jsonify({'error': 'Archived certificates are not name indexed; '
+                                 'list them with archived=true and a common_name prefix'}), 400
+    try:
+        criterion = name_criterion(CertificateName.reversed_name, name, request.args.get('match', 'covers'))
+        matching = select(CertificateName.certificate_id).where(criterion)
+        rows, next_cursor = _paginate_certificates(request.args, [Certificate.id.in_(matching)])
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    return json_response({
+        'certificates': rows_to_dicts(CERTIFICATE_FIELDS, rows),
+        'next_cursor': next_cursor
+    })
+
+# Rows fetched per round trip by the streaming export
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = CERTIFICATE_FIELDS
+
+def _export_rows(args):
+    """Yield lists of plain column tuples from a server-side cursor.
+
+    ``yield_per`` enables ``stream_results`` so the driver fetches rows in
+    batches instead of buffering the whole result set.
+    """
+    model = _certificate_model(args)
+    stmt = _filter_certificates(
+        select(*_certificate_columns(EXPORT_COLUMNS, model)),
+        args,
+        model
+    ).order_by(model.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    for partition in db.session.execute(stmt).partitions():
+        yield partition
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _export_ndjson(args):
+    for rows in _export_rows(args):
+        yield b''.join(dumps(row) + b'\n' for row in rows_to_dicts(EXPORT_COLUMNS, rows))
+
+def _export_csv(args):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in _export_rows(args):
+        writer.writerows(map(_export_value, row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@console.route('/api/v1/certificates/export', methods=['GET'])
+@replica_reads
+def export_certificates():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': f'Unsupported export format: {export_format}. Use ndjson or csv'}), 400
+    try:
+        # Validate the filters up front; errors inside the stream cannot change the status code
+        _filter_certificates(select(Certificate.id), request.args)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    args = request.args.to_dict()
+    if export_format == 'csv':
+        body, mimetype, extension = _export_csv(args), 'text/csv', 'csv'
+    else:
+        body, mimetype, extension = _export_ndjson(args), 'application/x-ndjson', 'ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=certificates.{extension}'}
+    )
+
+@console.route('/api/v1/certificates/<int:certificate_id>', methods=['GET'])
+@replica_reads
+@cached_response('certificates')
 def get_certificate(certificate_id):
-    cert = Certificate.query.get_or_404(certificate_id)
-    return jsonify({
-        'id': cert.id,
-        'name': cert.name,
-        'common_name': cert.common_name,
-        'issuer': cert.issuer,
-        'valid_from': cert.valid_from.isoformat(),
-        'valid_until': cert.valid_until.isoformat(),
-        'status': cert.status,
-        'created_at': cert.created_at.isoformat() if cert.created_at else None
+    if _certificate_model(request.args) is ArchivedCertificate:
+        return _get_archived_certificate(certificate_id)
+    row = db.session.execute(
+        select(*_certificate_columns()).where(Certificate.id == certificate_id)
+    ).first()
+    if row is None:
+        abort(404)
+    certificate = row_to_dict(CERTIFICATE_FIELDS, row)
+    names = db.session.execute(
+        select(CertificateName.kind, CertificateName.name)
+        .where(CertificateName.certificate_id == certificate_id, CertificateName.kind != 'cn')
+        .order_by(CertificateName.id)
+    ).all()
+    certificate['alt_names'] = [name for kind, name in names if kind == 'dns']
+    certificate['ip_sans'] = [name for kind, name in names if kind == 'ip']
+    return json_response(certificate)
+
+def _get_archived_certificate(certificate_id):
+    model = ArchivedCertificate
+    row = db.session.execute(
+        select(*_certificate_columns(model=model), model.alt_names, model.ip_sans, model.archived_at)
+        .where(model.id == certificate_id)
+    ).first()
+    if row is None:
+        abort(404)
+    certificate = row_to_dict(CERTIFICATE_FIELDS, row)
+    certificate['alt_names'] = row.alt_names.split(',') if row.alt_names else []
+    certificate['ip_sans'] = row.ip_sans.split(',') if row.ip_sans else []
+    certificate['archived_at'] = row.archived_at
+    return json_response(certificate)
+
+@console.route('/api/v1/certificates/<int:certificate_id>/chain', methods=['GET'])
+@replica_reads
+def certificate_chain(certificate_id):
+    """Issuers of a certificate up to the root, resolved from the issuer cache."""
+    model = _certificate_model(request.args)
+    row = db.session.execute(
+        select(model.issuer_id, model.issuer).where(model.id == certificate_id)
+    ).first()
+    if row is None:
+        abort(404)
+    tree = issuer_cache.tree()
+    issuer_id = row.issuer_id if row.issuer_id is not None else tree.id_for(row.issuer)
+    return json_response({
+        'certificate_id': certificate_id,
+        'issuer': row.issuer,
+        'chain': [node._asdict() for node in tree.chain(issuer_id)]
     })
 
-@app.route('/api/v1/certificates/issue', methods=['POST'])
-def issue_certificate():
-    data = request.json
+@console.route('/api/v1/certificates/<int:certificate_id>/download', methods=['GET'])
+def download_certificate(certificate_id):
+    download_format = request.args.get('format', 'pem')
+    if download_format not in ('pem', 'der'):
+        return jsonify({'error': f'Unsupported format: {download_format}. Use pem or der'}), 400
+    with_chain = request.args.get('chain', 'false').lower() in ('1', 'true')
+    if with_chain and download_format == 'der':
+        return jsonify({'error': 'The chain is only available in PEM format'}), 400
     
+    # The only query that reads certificate bodies
+    body_model = ArchivedCertificateBody if _certificate_model(request.args) is ArchivedCertificate else CertificateBody
+    row = db.session.execute(
+        select(body_model.encoding, body_model.data, CertificateChain.encoding, CertificateChain.data)
+        .outerjoin(CertificateChain, body_model.chain_id == CertificateChain.id)
+        .where(body_model.certificate_id == certificate_id)
+    ).first()
+    if row is None:
+        abort(404)
+    encoding, data, chain_encoding, chain_data = row
+    
+    if download_format == 'der':
+        body, mimetype, extension = iter_decompressed(data, encoding), 'application/pkix-cert', 'der'
+    else:
+        def pem_chunks():
+            yield der_to_pem(decompress(data, encoding)).encode()
+            if with_chain and chain_data is not None:
+                for der in split_der(decompress(chain_data, chain_encoding)):
+                    yield der_to_pem(der).encode()
+        body, mimetype, extension = pem_chunks(), 'application/x-pem-file', 'pem'
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=certificate-{certificate_id}.{extension}'}
+    )
+
+# Issuer recorded for certificates signed by the PKI secrets engine
+DEFAULT_ISSUER = "Vault Intermediate CA"
+
+# Limits for batch issuance
+MAX_BATCH_SIZE = 5000
+BATCH_CHUNK_SIZE = 500
+
+def _parse_ttl(ttl):
+    """Parse a TTL like "8760h" (hours) into a timedelta."""
+    try:
+        hours = int(str(ttl).rstrip('h'))
+    except ValueError:
+        raise ValueError(f'Invalid ttl: {ttl}')
+    if hours <= 0:
+        raise ValueError(f'Invalid ttl: {ttl}')
+    return timedelta(hours=hours)
+
+def _validate_issue_spec(data):
+    """Return an error message for an invalid issuance spec, or None."""
     if not data:
-        return jsonify({'error': 'No data provided'}), 400
+        return 'No data provided'
+    if not isinstance(data, dict):
+        return 'Issuance spec must be a JSON object'
     
     required_fields = ['common_name', 'ttl', 'role']
     for field in required_fields:
         if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
+            return f'Missing required field: {field}'
     
-    # In a real implementation, this would call the Vault API to issue a certificate
-    # For now, we'll simulate it by creating a record in our database
-    from datetime import datetime, timedelta
+    try:
+        _parse_ttl(data['ttl'])
+        normalize_key_spec(data.get('key_type', 'rsa'), data.get('key_bits', 2048))
+        parse_sans(data)
+    except ValueError as err:
+        return str(err)
+    return None
+
+def _default_certificate_name(common_name, now):
+    return f"{common_name.replace('.', '-')}-{now.strftime('%Y%m%d')}"
+
+def _certificate_values(data, now):
+    """Build the column values for a certificate issued from a validated spec."""
+    return {
+        'name': data.get('name') or _default_certificate_name(data['common_name'], now),
+        'common_name': data['common_name'],
+        'issuer': DEFAULT_ISSUER,
+        'issuer_id': _issuer_id(DEFAULT_ISSUER),
+        'valid_from': now,
+        'valid_until': now + _parse_ttl(data['ttl']),
+        'status': "valid"
+    }
+
+# Certificate bodies and issuer chains, stored compressed (see cert_store.py).
+# CERT_STORE_COMPRESSION selects zstd, zlib or none for new rows.
+CERT_STORE_ENCODING = os.environ.get("CERT_STORE_COMPRESSION", DEFAULT_ENCODING)
+if CERT_STORE_ENCODING not in ENCODINGS:
+    CERT_STORE_ENCODING = DEFAULT_ENCODING
+
+def _store_simulated_ca(key_pem, certificate_der):
+    """Save a newly generated CA unless one is saved already, and return the saved one."""
+    # Committed on its own connection, whatever the caller's transaction does
+    with db.engine.begin() as connection:
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(SimulatedCA), {
+                    'name': DEFAULT_ISSUER, 'private_key': key_pem, 'certificate': certificate_der})
+        except IntegrityError:
+            # Another worker saved its CA first
+            pass
+        return connection.execute(select(SimulatedCA.private_key, SimulatedCA.certificate)
+                                  .where(SimulatedCA.name == DEFAULT_ISSUER)).one()
+
+simulated_issuer = SimulatedIssuer(DEFAULT_ISSUER, store=_store_simulated_ca)
+
+def _load_simulated_ca():
+    """Load the simulated CA, creating it on first use. Called by the issuing paths only.
+
+    Saving a new CA takes its own transaction, which on SQLite would wait
+    for a request transaction that has already written, so this runs
+    before the caller writes anything.
+    """
+    if simulated_issuer.available:
+        simulated_issuer.load()
+
+# Ids of committed chains by digest; chains are few and never change
+_chain_ids = {}
+
+def _chain_id(der_chain):
+    """Return the id of the stored chain, inserting it on first use. The caller commits."""
+    digest = chain_digest(der_chain)
+    chain_id = _chain_ids.get(digest)
+    if chain_id is not None:
+        return chain_id
+    chain_id = db.session.scalar(select(CertificateChain.id).where(CertificateChain.digest == digest))
+    if chain_id is not None:
+        _chain_ids[digest] = chain_id
+        return chain_id
+    chain = CertificateChain(digest=digest, encoding=CERT_STORE_ENCODING,
+                             data=compress(b''.join(der_chain), CERT_STORE_ENCODING))
+    try:
+        with db.session.begin_nested():
+            db.session.add(chain)
+        return chain.id
+    except IntegrityError:
+        # A concurrent transaction stored the same chain first
+        return db.session.scalar(select(CertificateChain.id).where(CertificateChain.digest == digest))
+
+def _store_body(certificate_id, der, der_chain):
+    """Store a certificate body and link it to its chain. The caller commits."""
+    db.session.execute(insert(CertificateBody), {
+        'certificate_id': certificate_id,
+        'encoding': CERT_STORE_ENCODING,
+        'data': compress(der, CERT_STORE_ENCODING),
+        'chain_id': _chain_id(der_chain) if der_chain else None,
+    })
+
+# Pre-generated private keys, refilled in the background per (key_type, key_bits)
+key_pool = KeyPool(
+    low_watermark=int(os.environ.get("KEY_POOL_LOW_WATERMARK", "4")),
+    high_watermark=int(os.environ.get("KEY_POOL_HIGH_WATERMARK", "16")),
+    workers=int(os.environ.get("KEY_POOL_WORKERS", "1"))
+)
+metrics_registry.gauge('key_pool_depth', 'Pre-generated private keys ready per key spec', ('key_spec',),
+                       lambda: {(spec,): pool['depth'] for spec, pool in key_pool.metrics()['pools'].items()})
+metrics_registry.gauge('key_pool_in_flight', 'Private keys being generated in the background per key spec',
+                       ('key_spec',),
+                       lambda: {(spec,): pool['in_flight'] for spec, pool in key_pool.metrics()['pools'].items()})
+metrics_registry.callback_counter(
+    'key_pool_acquired', 'Private keys handed out per key spec, from the pool (hit) or generated on demand (miss)',
+    ('key_spec', 'result'),
+    lambda: {(spec, result): pool[field] for spec, pool in key_pool.metrics()['pools'].items()
+             for result, field in (('hit', 'hits'), ('miss', 'misses'))})
+metrics_registry.callback_counter('key_pool_executor_restarts', 'Key generation process pools replaced after failing',
+                                  (), lambda: {(): key_pool.restarts})
+# Comma-separated key specs to fill before the first issuance, e.g. "rsa:2048,ec:256"
+KEY_POOL_PREWARM = os.environ.get("KEY_POOL_PREWARM", "rsa:2048")
+_key_pool_warmed = False
+
+@console.before_app_request
+def _warm_key_pool():
+    global _key_pool_warmed
+    if _key_pool_warmed:
+        return
+    _key_pool_warmed = True
+    for spec in filter(None, KEY_POOL_PREWARM.split(',')):
+        key_type, _, key_bits = spec.partition(':')
+        try:
+            key_pool.warm(key_type, key_bits or 0)
+        except ValueError as err:
+            current_app.logger.warning("Ignoring KEY_POOL_PREWARM entry %r: %s", spec, err)
+
+@console.route('/api/v1/keypool', methods=['GET'])
+def key_pool_metrics():
+    return jsonify(key_pool.metrics())
+
+# Idempotent issuance: requests sent with an Idempotency-Key header run once
+# per key. Concurrent duplicates wait for the first request and retries
+# within IDEMPOTENCY_TTL seconds get its stored response, in any worker.
+# Stored responses have no private key; duplicates that waited in the same
+# worker get the live response, private key included. With
+# ISSUE_COALESCING=1, identical requests without a key that arrive while
+# one is in flight in the same worker share its result the same way, so
+# only enable it when every caller may see every other caller's keys.
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "3600"))
+IDEMPOTENCY_WAIT = float(os.environ.get("IDEMPOTENCY_WAIT", "30"))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "1000"))
+ISSUE_COALESCING = os.environ.get("ISSUE_COALESCING", "0") == "1"
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+IDEMPOTENCY_PRUNE_INTERVAL = timedelta(minutes=10)
+
+issue_coalescer = Coalescer(max_entries=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL, wait_timeout=IDEMPOTENCY_WAIT)
+idempotent_requests = metrics_registry.counter(
+    'idempotent_requests', 'Issuance requests by how they were answered', ('route', 'outcome'))
+_idempotency_pruned = {'at': None}
+
+def _claim_idempotency_key(key, fingerprint):
+    """Claim ``key`` for this request across workers.
+
+    Returns:
+        tuple: ``(status_code, body)`` stored by an earlier request, or None
+        if this request holds the claim and has to run
+
+    Raises:
+        KeyReuseError: If the key was used for a different request
+        RequestInProgress: If another worker holds the claim for longer than IDEMPOTENCY_WAIT
+    """
+    now = datetime.now()
+    if _idempotency_pruned['at'] is None or now - _idempotency_pruned['at'] > IDEMPOTENCY_PRUNE_INTERVAL:
+        _idempotency_pruned['at'] = now
+        db.session.execute(delete(IdempotencyRecord).where(
+            IdempotencyRecord.created_at < now - timedelta(seconds=IDEMPOTENCY_TTL)))
+        db.session.commit()
+    
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while True:
+        try:
+            db.session.add(IdempotencyRecord(key=key, fingerprint=fingerprint, created_at=now))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+        record = db.session.execute(
+            select(IdempotencyRecord.fingerprint, IdempotencyRecord.status_code,
+                   IdempotencyRecord.body, IdempotencyRecord.created_at)
+            .where(IdempotencyRecord.key == key)
+        ).first()
+        if record is None:
+            # Released by a failed request in the meantime
+            continue
+        age = (now - record.created_at).total_seconds()
+        if age > IDEMPOTENCY_TTL or (record.status_code is None and age > IDEMPOTENCY_WAIT):
+            # Expired, or abandoned by a worker that died mid-request
+            taken = db.session.execute(
+                update(IdempotencyRecord)
+                .where(IdempotencyRecord.key == key, IdempotencyRecord.created_at == record.created_at)
+                .values(fingerprint=fingerprint, status_code=None, body=None, created_at=now)
+            ).rowcount
+            db.session.commit()
+            if taken:
+                return None
+            continue
+        if record.fingerprint != fingerprint:
+            raise KeyReuseError(key)
+        if record.status_code is not None:
+            return record.status_code, record.body
+        if time.monotonic() >= deadline:
+            raise RequestInProgress(key)
+        # End the transaction so the next read sees the other worker's commit
+        db.session.rollback()
+        time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+        now = datetime.now()
+
+# Private keys are returned once, to the request that issued them, and never
+# stored: replays get the certificate with ``private_key`` set to null
+REPLAY_KEY_WARNING = ('Replayed responses do not include the private key. '
+                      'Revoke this certificate and issue a new one if that response was lost.')
+
+def _replay_body(body):
+    """Return a response body as stored for replays, without private keys."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict):
+        return body
+    # Single issuance has the key at the top level, batch issuance per result
+    issued = [data] + [result for result in data.get('results') or () if isinstance(result, dict)]
+    issued = [item for item in issued if item.get('private_key') is not None]
+    if not issued:
+        return body
+    for item in issued:
+        item['private_key'] = None
+    data['warning'] = REPLAY_KEY_WARNING
+    return dumps(data)
+
+def _finish_idempotency_key(key, status_code, body):
+    """Store the response for ``key`` without its private key, or release the claim after a server error."""
+    db.session.rollback()
+    if status_code is None or status_code >= 500:
+        stmt = delete(IdempotencyRecord).where(IdempotencyRecord.key == key, IdempotencyRecord.status_code.is_(None))
+    else:
+        stmt = (update(IdempotencyRecord).where(IdempotencyRecord.key == key)
+                .values(status_code=status_code, body=_replay_body(body)))
+    db.session.execute(stmt)
+    db.session.commit()
+
+def idempotent(view):
+    """Deduplicate an issuance endpoint by Idempotency-Key and in-flight coalescing.
+
+    The request fingerprint is a digest of the path and the canonical JSON
+    body, so a key reused with a different request is answered with 422.
+    Responses with a status below 500 are stored without their private
+    key. Replayed and shared responses carry ``Idempotent-Replayed: true``;
+    only replayed ones lose the private key, since a request that waited
+    for a concurrent one in this worker gets its live response.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None and not ISSUE_COALESCING:
+            return view(*args, **kwargs)
+        if key is not None and not (0 < len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH and key.isprintable()):
+            return jsonify({'error': f'Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} printable characters'}), 400
+        fingerprint = hashlib.sha256(
+            request.path.encode() + b'\n' + dumps(request.get_json(silent=True))).hexdigest()
+        scoped_key = f'{request.path}\n{key}' if key is not None else f'{request.path}\n#{fingerprint}'
+        
+        def run():
+            if key is not None:
+                stored = _claim_idempotency_key(scoped_key, fingerprint)
+                if stored is not None:
+                    return stored + ('application/json', True)
+            status_code = body = None
+            try:
+                response = make_response(view(*args, **kwargs))
+                status_code, body = response.status_code, response.get_data()
+            finally:
+                if key is not None:
+                    _finish_idempotency_key(scoped_key, status_code, body)
+            return status_code, body, response.mimetype, False
+        
+        route = request.url_rule.rule
+        try:
+            # Only keyed responses are kept for retries; coalescing without a
+            # key is limited to requests that overlap
+            result, outcome = issue_coalescer.execute(
+                scoped_key, fingerprint, run, keep=lambda result: key is not None and result[0] < 500,
+                stored=lambda result: (result[0], _replay_body(result[1])) + result[2:])
+        except KeyReuseError:
+            idempotent_requests.inc((route, 'conflict'))
+            return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+        except RequestInProgress:
+            idempotent_requests.inc((route, 'conflict'))
+            response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        status_code, body, mimetype, replayed = result
+        if replayed:
+            outcome = 'replayed'
+        idempotent_requests.inc((route, outcome))
+        if outcome == 'replayed':
+            body = _replay_body(body)
+        response = Response(body, status=status_code, mimetype=mimetype)
+        if outcome != 'executed':
+            response.headers['Idempotent-Replayed'] = 'true'
+            # The client gets the other request's writes as if it made them
+            g.setdefault('written_scopes', set()).add('certificates')
+        return response
+    return wrapper
+
+@console.route('/api/v1/certificates/issue', methods=['POST'])
+@idempotent
+def issue_certificate():
+    data = request.json
     
-    # Parse TTL (assumed format like "8760h" for 1 year)
-    ttl_str = data.get('ttl', '8760h')
-    ttl_value = int(ttl_str.rstrip('h'))
-    ttl_hours = ttl_value
+    error = _validate_issue_spec(data)
+    if error:
+        return jsonify({'error': error}), 400
+    _load_simulated_ca()
     
-    # Create a new certificate record
-    now = datetime.now()
-    new_cert = Certificate(
-        name=data.get('name', f"{data['common_name'].replace('.', '-')}-{now.strftime('%Y%m%d')}"),
-        common_name=data['common_name'],
-        issuer="Vault Intermediate CA",
-        valid_from=now,
-        valid_until=now + timedelta(hours=ttl_hours),
-        status="valid"
-    )
+    # In a real implementation, this would call the Vault API to issue a certificate
+    # For now, we'll simulate it by creating a record in our database
+    key_type, key_bits = normalize_key_spec(data.get('key_type', 'rsa'), data.get('key_bits', 2048))
+    private_key, _ = key_pool.acquire(key_type, key_bits)
+    new_cert = Certificate(**_certificate_values(data, datetime.now()))
+    alt_names, ip_sans = parse_sans(data)
     
     db.session.add(new_cert)
+    db.session.flush()
+    db.session.execute(insert(CertificateName), name_rows(new_cert.id, new_cert.common_name, alt_names, ip_sans))
+    body = None
+    if simulated_issuer.available:
+        # Signed once the id, which is the serial number, is known
+        body = simulated_issuer.sign(new_cert.id, new_cert.common_name, private_key, new_cert.valid_from,
+                                     new_cert.valid_until, alt_names, ip_sans)
+        _store_body(new_cert.id, *body)
+    _bump_stats({('status', new_cert.status): 1, ('issuer', new_cert.issuer): 1})
+    _bump_version('certificates')
     db.session.commit()
+    status_engine.schedule(new_cert.id, new_cert.valid_until)
+    revocation_set.note_issued(new_cert.id)
+    certificate = row_to_dict(
+        ISSUED_CERTIFICATE_FIELDS,
+        [getattr(new_cert, field) for field in ISSUED_CERTIFICATE_FIELDS]
+    )
+    _publish_certificates('certificate.issued', {('status', new_cert.status): 1, ('issuer', new_cert.issuer): 1},
+                          certificates=[certificate])
     
-    # In a real implementation, this would return the actual certificate data
-    return jsonify({
+    result = {
         'success': True,
         'certificate_id': new_cert.id,
-        'certificate': {
-            'id': new_cert.id,
-            'name': new_cert.name,
-            'common_name': new_cert.common_name,
-            'issuer': new_cert.issuer,
-            'valid_from': new_cert.valid_from.isoformat(),
-            'valid_until': new_cert.valid_until.isoformat(),
-            'status': new_cert.status
-        },
+        'certificate': certificate,
+        'private_key': private_key,
+        'private_key_type': key_type,
         'message': 'Certificate issued successfully. In a production environment, this would return the actual certificate data.'
-    }), 201
+    }
+    if body:
+        result['certificate_pem'] = der_to_pem(body[0])
+        result['ca_chain'] = [der_to_pem(der) for der in body[1]]
+    return json_response(result, status=201)
+
+def _acquire_keys(key_specs):
+    """Return a private key per ``(key_type, key_bits)`` in ``key_specs``, taking each spec's keys at once."""
+    positions = defaultdict(list)
+    for position, key_spec in enumerate(key_specs):
+        positions[key_spec].append(position)
+    private_keys = [None] * len(key_specs)
+    for key_spec, where in positions.items():
+        for position, private_key in zip(where, key_pool.acquire_many(*key_spec, len(where))):
+            private_keys[position] = private_key
+    return private_keys
+
+@console.route('/api/v1/certificates/issue/batch', methods=['POST'])
+@idempotent
+def issue_certificates_batch():
+    data = request.json
+    
+    specs = data.get('certificates') if isinstance(data, dict) else None
+    if not isinstance(specs, list) or not specs:
+        return jsonify({'error': 'Expected a non-empty "certificates" list'}), 400
+    if len(specs) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large: {len(specs)} certificates (maximum {MAX_BATCH_SIZE})'}), 400
+    _load_simulated_ca()
+    
+    # Validate everything before touching the database
+    results = []
+    pending = []
+    now = datetime.now()
+    for index, spec in enumerate(specs):
+        error = _validate_issue_spec(spec)
+        if error:
+            results.append({'index': index, 'success': False, 'error': error})
+        else:
+            results.append(None)
+            key_spec = normalize_key_spec(spec.get('key_type', 'rsa'), spec.get('key_bits', 2048))
+            pending.append((index, _certificate_values(spec, now), parse_sans(spec), key_spec))
+    
+    # Insert each chunk as one multi-row INSERT ... RETURNING in its own
+    # transaction, so a failing chunk does not discard the others
+    issued_deltas = Counter()
+    issued_certificates = []
+    for start in range(0, len(pending), BATCH_CHUNK_SIZE):
+        chunk = pending[start:start + BATCH_CHUNK_SIZE]
+        # Keys are taken before the transaction, in one go per key spec
+        private_keys = _acquire_keys([key_spec for _, _, _, key_spec in chunk])
+        stmt = insert(Certificate).returning(Certificate.id, sort_by_parameter_order=True)
+        try:
+            ids = db.session.scalars(stmt, [values for _, values, _, _ in chunk]).all()
+            db.session.execute(insert(CertificateName), [
+                row
+                for (_, values, sans, _), cert_id in zip(chunk, ids)
+                for row in name_rows(cert_id, values['common_name'], *sans)
+            ])
+            bodies = [None] * len(chunk)
+            if simulated_issuer.available:
+                bodies = [
+                    simulated_issuer.sign(cert_id, values['common_name'], private_key,
+                                          values['valid_from'], values['valid_until'], *sans)
+                    for (_, values, sans, _), cert_id, private_key in zip(chunk, ids, private_keys)
+                ]
+                for cert_id, body in zip(ids, bodies):
+                    _store_body(cert_id, *body)
+            deltas = Counter()
+            for _, values, _, _ in chunk:
+                deltas[('status', values['status'])] += 1
+                deltas[('issuer', values['issuer'])] += 1
+            _bump_stats(deltas)
+            _bump_version('certificates')
+            db.session.commit()
+            for (_, values, _, _), cert_id in zip(chunk, ids):
+                status_engine.schedule(cert_id, values['valid_until'])
+            revocation_set.note_issued(max(ids, default=0))
+            issued_deltas.update(deltas)
+        except SQLAlchemyError as err:
+            db.session.rollback()
+            current_app.logger.error("Batch issuance chunk failed: %s", err)
+            for index, _, _, _ in chunk:
+                results[index] = {'index': index, 'success': False, 'error': 'Database error while issuing certificate'}
+            continue
+        certificates = rows_to_dicts(ISSUED_CERTIFICATE_FIELDS, [
+            [cert_id] + [values[field] for field in ISSUED_CERTIFICATE_FIELDS[1:]]
+            for (_, values, _, _), cert_id in zip(chunk, ids)
+        ])
+        for (index, _, _, key_spec), certificate, private_key, body in zip(chunk, certificates, private_keys, bodies):
+            result = {
+                'index': index,
+                'success': True,
+                'certificate_id': certificate['id'],
+                'certificate': certificate,
+                'private_key': private_key,
+                'private_key_type': key_spec[0]
+            }
+            if body:
+                result['certificate_pem'] = der_to_pem(body[0])
+                result['ca_chain'] = [der_to_pem(der) for der in body[1]]
+            results[index] = result
+        issued_certificates.extend(certificates)
+    
+    if issued_certificates:
+        _publish_certificates('certificate.issued', issued_deltas, certificates=issued_certificates)
+    
+    issued = sum(1 for result in results if result['success'])
+    failed = len(results) - issued
+    # 207 Multi-Status tells callers to inspect the per-item results
+    return json_response({
+        'success': failed == 0,
+        'issued': issued,
+        'failed': failed,
+        'results': results
+    }, status=201 if failed == 0 else 207)
+
+# Fleet renewal (see renewal.py): `flask --app main plan-renewals` schedules
+# the renewal of certificates expiring within RENEWAL_HORIZON_DAYS, spread
+# with jitter over the RENEWAL_SPREAD_DAYS before each one's deadline
+# (RENEWAL_MARGIN_DAYS before expiry) at no more than RENEWAL_RATE per
+# second; `flask --app main renew-certificates` renews them as they come due.
+RENEWAL_HORIZON_DAYS = float(os.environ.get("RENEWAL_HORIZON_DAYS", "30"))
+RENEWAL_SPREAD_DAYS = float(os.environ.get("RENEWAL_SPREAD_DAYS", "14"))
+RENEWAL_MARGIN_DAYS = float(os.environ.get("RENEWAL_MARGIN_DAYS", "3"))
+RENEWAL_RATE = float(os.environ.get("RENEWAL_RATE", "2"))
+RENEWAL_MAX_ATTEMPTS = int(os.environ.get("RENEWAL_MAX_ATTEMPTS", "5"))
+# Seconds before the first retry of a failed renewal, doubled for each further attempt
+RENEWAL_RETRY_DELAY = 60
+RENEWAL_PROGRESS_INTERVAL = 5
+
+def _renewal_candidates(now, horizon, kept_statuses, batch_size=5000):
+    """Yield ``(id, valid_until)`` of live certificates expiring within ``horizon``, in ``valid_until`` order.
+
+    Certificates with a renewal task in one of ``kept_statuses`` are left out.
+    Pages are range scans of the ``(valid_until, id)`` index.
+    """
+    has_task = (select(RenewalTask.certificate_id)
+                .where(RenewalTask.certificate_id == Certificate.id, RenewalTask.status.in_(kept_statuses))
+                .exists())
+    stmt = (
+        select(Certificate.id, Certificate.valid_until)
+        .where(Certificate.valid_until > now, Certificate.valid_until <= now + horizon,
+               Certificate.status.in_(('valid', 'expiring')), ~has_task)
+        .order_by(Certificate.valid_until, Certificate.id)
+        .limit(batch_size)
+    )
+    position = None
+    while True:
+        page = stmt if position is None else stmt.where(tuple_(Certificate.valid_until, Certificate.id) > position)
+        rows = db.session.execute(page).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        position = (rows[-1].valid_until, rows[-1].id)
+
+@console.cli.command('plan-renewals')
+@click.option('--horizon-days', default=RENEWAL_HORIZON_DAYS, show_default=True,
+              help='Plan certificates expiring within this many days.')
+@click.option('--spread-days', default=RENEWAL_SPREAD_DAYS, show_default=True,
+              help='Spread each renewal over this many days before its deadline.')
+@click.option('--margin-days', default=RENEWAL_MARGIN_DAYS, show_default=True,
+              help='Renew certificates at least this many days before they expire.')
+@click.option('--rate', default=RENEWAL_RATE, show_default=True, help='Maximum renewals per second.')
+@click.option('--seed', default=0, show_default=True, help='Jitter seed; the same seed gives the same schedule.')
+@click.option('--retry-failed', is_flag=True, help='Plan certificates whose renewal failed again.')
+@click.option('--dry-run', is_flag=True, help='Print the projected load curve without changing the schedule.')
+@click.option('--bucket-minutes', type=int, help='Minutes per line of the load curve (default: fits about 48 lines).')
+def plan_renewals(horizon_days, spread_days, margin_days, rate, seed, retry_failed, dry_run, bucket_minutes):
+    """Schedule the renewal of certificates nearing expiry, jittered and under a rate limit.
+
+    Replaces the pending schedule. Renewed certificates, and certificates
+    whose renewal failed unless --retry-failed is given, are not planned
+    again. Run it daily, e.g. from cron, to pick up certificates entering
+    the horizon.
+    """
+    if rate <= 0 or spread_days < 0:
+        raise click.BadParameter('--rate must be positive and --spread-days not negative')
+    now = datetime.now()
+    kept = ('renewed',) if retry_failed else ('renewed', 'failed')
+    planner = RenewalPlanner(now, timedelta(days=spread_days), timedelta(days=margin_days), rate, seed)
+    profile = LoadProfile()
+    renewals = planner.plan(_renewal_candidates(now, timedelta(days=horizon_days), kept))
+    
+    if dry_run:
+        for renewal in renewals:
+            profile.add(renewal.scheduled_at, renewal.deadline)
+    else:
+        replaced = db.session.execute(
+            delete(RenewalTask).where(RenewalTask.status.notin_(kept)).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        batch = []
+        for renewal in renewals:
+            profile.add(renewal.scheduled_at, renewal.deadline)
+            batch.append({'certificate_id': renewal.certificate_id, 'scheduled_at': renewal.scheduled_at,
+                          'deadline': renewal.deadline, 'status': 'pending', 'attempts': 0, 'updated_at': now})
+            if len(batch) == 5000:
+                db.session.execute(insert(RenewalTask), batch)
+                db.session.commit()
+                batch = []
+        if batch:
+            db.session.execute(insert(RenewalTask), batch)
+        db.session.commit()
+    
+    scheduled_peak, deadline_peak = profile.peaks()
+    verb = 'Would schedule' if dry_run else 'Scheduled'
+    click.echo(f"{verb} {planner.planned} renewals at up to {rate:g}/s, {planner.late} after their deadline "
+               f"({planner.overdue} already past it)")
+    if planner.planned:
+        click.echo(f"Busiest minute: {scheduled_peak} renewals (renewing at the deadline: {deadline_peak})")
+    if dry_run:
+        bucket = timedelta(minutes=bucket_minutes) if bucket_minutes else None
+        for line in profile.lines(bucket):
+            click.echo(line)
+    else:
+        click.echo(f"Replaced {replaced} previously pending renewals")
+
+def _due_renewals(now, batch_size):
+    """Yield ``(row, alt_names, ip_sans)`` of pending renewals due at ``now``, in schedule order."""
+    stmt = (
+        select(RenewalTask.certificate_id, RenewalTask.scheduled_at, RenewalTask.attempts,
+               Certificate.common_name, Certificate.issuer, Certificate.issuer_id,
+               Certificate.valid_from, Certificate.valid_until)
+        .join(Certificate, Certificate.id == RenewalTask.certificate_id)
+        .where(RenewalTask.status == 'pending', RenewalTask.scheduled_at <= now, Certificate.status != 'revoked')
+        .order_by(RenewalTask.scheduled_at, RenewalTask.certificate_id)
+        .limit(batch_size)
+    )
+    position = None
+    while True:
+        page = stmt if position is None else stmt.where(
+            tuple_(RenewalTask.scheduled_at, RenewalTask.certificate_id) > position)
+        rows = db.session.execute(page).all()
+        sans = defaultdict(lambda: {'dns': [], 'ip': []})
+        for cert_id, kind, name in db.session.execute(
+                select(CertificateName.certificate_id, CertificateName.kind, CertificateName.name)
+                .where(CertificateName.certificate_id.in_([row.certificate_id for row in rows]),
+                       CertificateName.kind != 'cn')
+                .order_by(CertificateName.id)):
+            sans[cert_id][kind].append(name)
+        for row in rows:
+            yield row, sans[row.certificate_id]['dns'], sans[row.certificate_id]['ip']
+        if len(rows) < batch_size:
+            return
+        position = (rows[-1].scheduled_at, rows[-1].certificate_id)
+
+def _renew(due, key_type, key_bits):
+    """Prepare the replacement of a certificate; runs on a pipeline worker without touching the database.
+
+    The new certificate keeps the issuer, names and lifetime of the old one.
+    In a real deployment this would call Vault's issue endpoint and hand
+    the key to the service; here it is simulated like in issue_certificate.
+    """
+    row, alt_names, ip_sans = due
+    now = datetime.now()
+    values = {
+        'name': _default_certificate_name(row.common_name, now),
+        'common_name': row.common_name,
+        'issuer': row.issuer,
+        'issuer_id': row.issuer_id,
+        'valid_from': now,
+        'valid_until': now + (row.valid_until - row.valid_from),
+        'status': 'valid',
+    }
+    private_key, _ = key_pool.acquire(key_type, key_bits)
+    return values, private_key
+
+def _record_renewals(renewed, now):
+    """Insert renewed certificates and mark their renewals done. The caller commits.
+
+    Args:
+        renewed (list): ``((row, alt_names, ip_sans), (values, private_key))`` per renewal
+
+    Returns:
+        tuple: The count deltas, the issued certificates as dicts and
+        their ``(id, valid_until)`` for the status engine
+    """
+    claimed = set(db.session.scalars(
+        update(RenewalTask)
+        .where(RenewalTask.certificate_id.in_([due[0].certificate_id for due, _ in renewed]),
+               RenewalTask.status == 'pending')
+        .values(status='renewed', error=None, updated_at=now)
+        .returning(RenewalTask.certificate_id)
+        .execution_options(synchronize_session=False)
+    ))
+    # Whatever another runner got to first is not issued twice
+    renewed = [(due, result) for due, result in renewed if due[0].certificate_id in claimed]
+    if not renewed:
+        return Counter(), [], []
+    stmt = insert(Certificate).returning(Certificate.id, sort_by_parameter_order=True)
+    ids = db.session.scalars(stmt, [values for _, (values, _) in renewed]).all()
+    db.session.execute(insert(CertificateName), [
+        row
+        for ((_, alt_names, ip_sans), (values, _)), cert_id in zip(renewed, ids)
+        for row in name_rows(cert_id, values['common_name'], alt_names, ip_sans)
+    ])
+    if simulated_issuer.available:
+        # Signed here rather than on the workers, once the ids (serial numbers) are known
+        for ((_, alt_names, ip_sans), (values, private_key)), cert_id in zip(renewed, ids):
+            _store_body(cert_id, *simulated_issuer.sign(cert_id, values['common_name'], private_key,
+                                                        values['valid_from'], values['valid_until'],
+                                                        alt_names, ip_sans))
+    db.session.execute(update(RenewalTask), [
+        {'certificate_id': due[0].certificate_id, 'renewed_id': cert_id}
+        for (due, _), cert_id in zip(renewed, ids)
+    ])
+    deltas = Counter()
+    for _, (values, _) in renewed:
+        deltas[('status', values['status'])] += 1
+        deltas[('issuer', values['issuer'])] += 1
+    _bump_stats(deltas)
+    _bump_version('certificates')
+    certificates = rows_to_dicts(ISSUED_CERTIFICATE_FIELDS, [
+        [cert_id] + [values[field] for field in ISSUED_CERTIFICATE_FIELDS[1:]]
+        for (_, (values, _)), cert_id in zip(renewed, ids)
+    ])
+    expiries = [(cert_id, values['valid_until']) for (_, (values, _)), cert_id in zip(renewed, ids)]
+    return deltas, certificates, expiries
+
+def _record_renewal_failures(failed, now):
+    """Retry failed renewals with exponential backoff, giving up after RENEWAL_MAX_ATTEMPTS. The caller commits."""
+    for (row, _, _), err in failed:
+        attempts = row.attempts + 1
+        values = {'attempts': attempts, 'error': str(err)[:1000], 'updated_at': now}
+        if attempts >= RENEWAL_MAX_ATTEMPTS:
+            values['status'] = 'failed'
+        else:
+            values['scheduled_at'] = now + timedelta(seconds=RENEWAL_RETRY_DELAY * 2 ** (attempts - 1))
+        db.session.execute(
+            update(RenewalTask)
+            .where(RenewalTask.certificate_id == row.certificate_id, RenewalTask.status == 'pending')
+            .values(**values)
+        )
+
+def _flush_renewals(renewed, failed, progress):
+    """Commit a batch of renewal results and publish the issued certificates."""
+    now = datetime.now()
+    try:
+        deltas, certificates, expiries = _record_renewals(renewed, now)
+        _record_renewal_failures(failed, now)
+        db.session.commit()
+    except SQLAlchemyError as err:
+        db.session.rollback()
+        current_app.logger.error("Recording renewals failed: %s", err)
+        failed = failed + [(due, err) for due, _ in renewed]
+        _record_renewal_failures(failed, now)
+        db.session.commit()
+        deltas, certificates, expiries = Counter(), [], []
+    progress.renewed += len(certificates)
+    progress.failed += len(failed)
+    for certificate_id, valid_until in expiries:
+        status_engine.schedule(certificate_id, valid_until)
+    if certificates:
+        _publish_certificates('certificate.issued', deltas, certificates=certificates)
+
+@console.cli.command('renew-certificates')
+@click.option('--workers', default=4, show_default=True, help='Renewals issued concurrently.')
+@click.option('--rate', default=RENEWAL_RATE, show_default=True,
+              help='Maximum renewals per second, also when working off a backlog.')
+@click.option('--batch-size', default=100, show_default=True, help='Renewals recorded per transaction.')
+@click.option('--key-spec', default='rsa:2048', show_default=True, help='key_type:key_bits of the new keys.')
+@click.option('--limit', type=int, help='Stop after this many renewals.')
+@click.option('--once', is_flag=True, help='Renew what is due now and exit.')
+def renew_certificates(workers, rate, batch_size, key_spec, limit, once):
+    """Renew certificates as their scheduled renewal time comes.
+
+    Keys are generated on a pool of worker threads, with at most twice as
+    many renewals in flight as workers; the results are recorded, and the
+    certificates signed with their new ids as serial numbers, in batches of
+    short transactions. Progress is kept in the renewal_task table, so the
+    command can be stopped and started again at any time, and only runs as
+    a single process.
+    """
+    key_type, _, key_bits = key_spec.partition(':')
+    try:
+        key_type, key_bits = normalize_key_spec(key_type, key_bits or 0)
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+    _load_simulated_ca()
+    pacer = Pacer(rate)
+    total = 0
+    while True:
+        now = datetime.now()
+        due = db.session.scalar(
+            select(db.func.count()).select_from(RenewalTask)
+            .where(RenewalTask.status == 'pending', RenewalTask.scheduled_at <= now)
+        )
+        if limit is not None:
+            due = min(due, limit - total)
+        if due:
+            progress = Progress(due)
+            reported = time.monotonic()
+            renewed, failed = [], []
+            items = itertools.islice(_due_renewals(now, batch_size), due)
+            for item, result, error in pipeline(items, lambda item: _renew(item, key_type, key_bits),
+                                                workers, pace=pacer.wait):
+                if error is None:
+                    renewed.append((item, result))
+                else:
+                    failed.append((item, error))
+                if len(renewed) + len(failed) >= batch_size:
+                    _flush_renewals(renewed, failed, progress)
+                    renewed, failed = [], []
+                if time.monotonic() - reported >= RENEWAL_PROGRESS_INTERVAL:
+                    click.echo(progress.line())
+                    reported = time.monotonic()
+            if renewed or failed:
+                _flush_renewals(renewed, failed, progress)
+            click.echo(progress.line())
+            total += progress.renewed + progress.failed
+        if once or (limit is not None and total >= limit):
+            break
+        next_at = db.session.scalar(select(db.func.min(RenewalTask.scheduled_at)).where(RenewalTask.status == 'pending'))
+        db.session.rollback()
+        wait = 60 if next_at is None else (next_at - datetime.now()).total_seconds()
+        time.sleep(min(max(wait, 1), 60))
+
+@console.cli.command('renewal-status')
+@click.option('--bucket-minutes', type=int, help='Minutes per line of the load curve (default: fits about 48 lines).')
+def renewal_status(bucket_minutes):
+    """Print renewal progress and the load curve of the pending schedule."""
+    now = datetime.now()
+    counts = dict(db.session.execute(
+        select(RenewalTask.status, db.func.count()).group_by(RenewalTask.status)
+    ).all())
+    click.echo(', '.join(f"{status}: {counts.get(status, 0)}" for status in ('pending', 'renewed', 'failed')))
+    profile = LoadProfile()
+    overdue = late = 0
+    for scheduled_at, deadline in db.session.execute(
+            select(RenewalTask.scheduled_at, RenewalTask.deadline).where(RenewalTask.status == 'pending')):
+        profile.add(scheduled_at, deadline)
+        overdue += scheduled_at <= now
+        late += scheduled_at > deadline
+    if profile.total:
+        scheduled_peak, _ = profile.peaks()
+        click.echo(f"{overdue} due now, {late} scheduled after their deadline, busiest minute: {scheduled_peak}")
+        for line in profile.lines(timedelta(minutes=bucket_minutes) if bucket_minutes else None):
+            click.echo(line)
+    for certificate_id, attempts, error in db.session.execute(
+            select(RenewalTask.certificate_id, RenewalTask.attempts, RenewalTask.error)
+            .where(RenewalTask.status == 'failed').order_by(RenewalTask.updated_at.desc()).limit(10)):
+        click.echo(f"failed: certificate {certificate_id} after {attempts} attempts: {error}")
+
+# RFC 5280 CRL reason codes accepted by the revocation endpoints
+REVOCATION_REASONS = (
+    'unspecified', 'keyCompromise', 'cACompromise', 'affiliationChanged',
+    'superseded', 'cessationOfOperation', 'certificateHold', 'privilegeWithdrawn',
+)
+
+# Limits for bulk revocation
+MAX_BULK_REVOKE_IDS = 10000
+
+# How long a published CRL is valid for, and how long before its
+# next_update it is reissued when no revocation has changed it meanwhile
+CRL_VALIDITY = timedelta(hours=72)
+CRL_REISSUE_BEFORE = timedelta(hours=float(os.environ.get("CRL_REISSUE_BEFORE_HOURS", "12")))
 
-@app.route('/api/v1/certificates/<int:certificate_id>/revoke', methods=['POST'])
+def _validate_reason(data):
+    reason = (data or {}).get('reason', 'unspecified')
+    if reason not in REVOCATION_REASONS:
+        raise ValueError(f"Invalid reason: {reason}. Use one of: {', '.join(REVOCATION_REASONS)}")
+    return reason
+
+def _revoke_where(criteria, reason, now):
+    """Revoke every certificate matching ``criteria`` with set-based UPDATEs.
+
+    One ``UPDATE ... RETURNING`` runs per revocable status, so the running
+    status counts can be adjusted exactly, and the returned ids are appended
+    to the revocation log in the same transaction. Already revoked
+    certificates are left alone, so each certificate is logged exactly once.
+    The caller commits and then passes the ids to ``_revoked``.
+    """
+    revoked_ids = []
+    deltas = Counter()
+    for status in REVOCABLE_STATUSES:
+        stmt = (
+            update(Certificate)
+            .where(*criteria, Certificate.status == status)
+            .values(status="revoked")
+            .returning(Certificate.id)
+            .execution_options(synchronize_session=False)
+        )
+        ids = db.session.scalars(stmt).all()
+        revoked_ids.extend(ids)
+        deltas[('status', status)] -= len(ids)
+        deltas[('status', 'revoked')] += len(ids)
+    revoked_ids.sort()
+    if revoked_ids:
+        _bump_stats(deltas)
+        _bump_version('certificates')
+        db.session.execute(insert(RevocationEntry), [
+            {'certificate_id': cert_id, 'reason': reason, 'revoked_at': now}
+            for cert_id in revoked_ids
+        ])
+    return revoked_ids, deltas
+
+def _revoked(revoked_ids, deltas, reason, now):
+    """Announce committed revocations to the status responder and the console."""
+    revocation_set.add((cert_id, now, reason) for cert_id in revoked_ids)
+    if revoked_ids:
+        _publish_certificates('certificate.revoked', deltas, ids=revoked_ids, reason=reason)
+
+@console.route('/api/v1/certificates/<int:certificate_id>/revoke', methods=['POST'])
 def revoke_certificate(certificate_id):
     cert = Certificate.query.get_or_404(certificate_id)
+    try:
+        reason = _validate_reason(request.get_json(silent=True))
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
     
     # In a real implementation, this would call the Vault API to revoke the certificate
     # For now, we'll simulate it by updating the record in our database
-    cert.status = "revoked"
+    now = datetime.now()
+    revoked_ids, deltas = _revoke_where([Certificate.id == cert.id], reason, now)
     db.session.commit()
+    _revoked(revoked_ids, deltas, reason, now)
     
     return jsonify({
         'success': True,
@@ -237,36 +2370,315 @@ def revoke_certificate(certificate_id):
         'message': 'Certificate revoked successfully'
     })
 
-@app.route('/api/v1/servers', methods=['GET'])
-def api_servers():
-    servers = VaultServer.query.all()
-    result = []
-    for server in servers:
-        result.append({
-            'id': server.id,
-            'name': server.name,
-            'address': server.address,
-            'status': server.status,
-            'sealed': server.sealed,
-            'version': server.version,
-            'last_checked': server.last_checked.isoformat() if server.last_checked else None
-        })
-    return jsonify(servers=result)
-
-@app.route('/api/v1/servers/<int:server_id>', methods=['GET'])
-def get_server(server_id):
-    server = VaultServer.query.get_or_404(server_id)
+@console.route('/api/v1/certificates/revoke/bulk', methods=['POST'])
+def revoke_certificates_bulk():
+    data = request.json
+    
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
+    try:
+        reason = _validate_reason(data)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    
+    # Selectors are combined with AND; at least one is required so an empty
+    # request cannot revoke the whole inventory
+    criteria = []
+    if 'ids' in data:
+        ids = data['ids']
+        # bool is a subclass of int, but true is not certificate 1
+        if not isinstance(ids, list) or not all(isinstance(cert_id, int) and not isinstance(cert_id, bool)
+                                                for cert_id in ids):
+            return jsonify({'error': 'ids must be a list of certificate IDs'}), 400
+        if len(ids) > MAX_BULK_REVOKE_IDS:
+            return jsonify({'error': f'Too many ids: {len(ids)} (maximum {MAX_BULK_REVOKE_IDS})'}), 400
+        criteria.append(Certificate.id.in_(ids))
+    if data.get('issuer'):
+        criteria.append(Certificate.issuer == data['issuer'])
+    if data.get('common_name'):
+        # Glob-style pattern: "*" matches any run of characters
+        pattern = _escape_like(data['common_name']).replace('*', '%')
+        criteria.append(Certificate.common_name.like(pattern, escape='\\'))
+    if not criteria:
+        return jsonify({'error': 'Provide at least one of: ids, issuer, common_name'}), 400
+    
+    now = datetime.now()
+    revoked_ids, deltas = _revoke_where(criteria, reason, now)
+    db.session.commit()
+    _revoked(revoked_ids, deltas, reason, now)
+    
     return jsonify({
-        'id': server.id,
-        'name': server.name,
-        'address': server.address,
-        'status': server.status,
-        'sealed': server.sealed,
-        'version': server.version,
-        'last_checked': server.last_checked.isoformat() if server.last_checked else None
+        'success': True,
+        'revoked': len(revoked_ids),
+        'certificate_ids': revoked_ids,
+        'reason': reason,
+        'message': f'{len(revoked_ids)} certificates revoked successfully'
     })
 
-@app.route('/api/v1/servers/<int:server_id>/unseal', methods=['POST'])
+class RevocationListCache:
+    """In-memory CRL built incrementally from the revocation log.
+
+    The full list is loaded once; each refresh only reads log entries newer
+    than the last sequence number seen, so publishing a CRL never rescans the
+    certificate table. The serialized CRL is reissued when the log grows and
+    when it comes within CRL_REISSUE_BEFORE of its next_update. Each worker
+    keeps its own copy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequences = []
+        self._entries = []
+        self._full_body = None
+        self._full_body_number = None
+        self._full_etag = None
+        self._reissue_at = None
+
+    @property
+    def crl_number(self):
+        return self._sequences[-1] if self._sequences else 0
+
+    def refresh(self):
+        rows = db.session.execute(
+            select(RevocationEntry.id, RevocationEntry.certificate_id,
+                   RevocationEntry.reason, RevocationEntry.revoked_at)
+            .where(RevocationEntry.id > self.crl_number)
+            .order_by(RevocationEntry.id)
+        ).all()
+        if not rows:
+            return
+        with self._lock:
+            for seq, cert_id, reason, revoked_at in rows:
+                # Another request may have appended the same entries meanwhile
+                if seq <= self.crl_number:
+                    continue
+                self._sequences.append(seq)
+                self._entries.append({
+                    'certificate_id': cert_id,
+                    'reason': reason,
+                    'revoked_at': revoked_at.isoformat()
+                })
+
+    def full(self, now):
+        """Return the full CRL as ``(json_body, etag)``, reusing it until it is reissued."""
+        self.refresh()
+        with self._lock:
+            if self._full_body_number != self.crl_number or now >= self._reissue_at:
+                self._full_body = json.dumps({
+                    'crl_number': self.crl_number,
+                    'this_update': now.isoformat(),
+                    'next_update': (now + CRL_VALIDITY).isoformat(),
+                    'revoked_certificates': self._entries
+                })
+                self._full_body_number = self.crl_number
+                self._full_etag = hashlib.sha1(f'crl:{self.crl_number}:{now.isoformat()}'.encode()).hexdigest()
+                self._reissue_at = now + CRL_VALIDITY - CRL_REISSUE_BEFORE
+            return self._full_body, self._full_etag
+
+    def delta(self, base_crl_number, now):
+        """Return the entries added since ``base_crl_number``."""
+        self.refresh()
+        with self._lock:
+            start = bisect_right(self._sequences, base_crl_number)
+            return {
+                'crl_number': self.crl_number,
+                'base_crl_number': base_crl_number,
+                'this_update': now.isoformat(),
+                'next_update': (now + CRL_VALIDITY).isoformat(),
+                'revoked_certificates': self._entries[start:]
+            }
+
+crl_cache = RevocationListCache()
+
+@console.route('/api/v1/crl', methods=['GET'])
+def get_crl():
+    body, etag = crl_cache.full(datetime.now())
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+@console.route('/api/v1/crl/delta', methods=['GET'])
+def get_delta_crl():
+    try:
+        base = int(request.args.get('base', 0))
+    except ValueError:
+        return jsonify({'error': 'base must be an integer CRL number'}), 400
+    delta = crl_cache.delta(base, datetime.now())
+    if base > delta['crl_number']:
+        return jsonify({'error': f'Unknown base CRL number: {base}'}), 400
+    return jsonify(delta)
+
+# Certificate status responder: answers from an in-memory revocation set that
+# each worker loads from the revocation log and refreshes in the background
+STATUS_REFRESH_INTERVAL = float(os.environ.get("STATUS_REFRESH_INTERVAL", "1"))
+STATUS_LOAD_TIMEOUT = 30
+MAX_STATUS_BATCH = 1000
+
+revocation_set = RevocationSet(REVOCATION_REASONS, refresh_interval=STATUS_REFRESH_INTERVAL)
+
+def _read_revocation_log(after_sequence):
+    return db.session.execute(
+        select(RevocationEntry.id, RevocationEntry.certificate_id,
+               RevocationEntry.reason, RevocationEntry.revoked_at)
+        .where(RevocationEntry.id > after_sequence)
+        .order_by(RevocationEntry.id)
+    ).all()
+
+def _read_max_serial():
+    return db.session.scalar(select(db.func.max(Certificate.id)))
+
+def _start_revocation_set():
+    """Start this worker's refresher and wait for the initial load."""
+    app = current_app._get_current_object()
+
+    def refresh():
+        with app.app_context():
+            revocation_set.refresh(_read_revocation_log, _read_max_serial)
+
+    revocation_set.start_refresher(refresh)
+    return revocation_set.wait_loaded(STATUS_LOAD_TIMEOUT)
+
+def _certificate_status(serial):
+    status, revoked_at, reason = revocation_set.status(serial)
+    entry = {'serial': serial, 'status': status}
+    if status == 'revoked':
+        entry['revoked_at'] = revoked_at
+        entry['revocation_reason'] = reason
+    return entry
+
+def _status_response(body):
+    this_update = revocation_set.updated_at
+    body['this_update'] = this_update
+    body['next_update'] = this_update + timedelta(seconds=STATUS_REFRESH_INTERVAL)
+    response = json_response(body)
+    response.cache_control.public = True
+    response.cache_control.max_age = int(STATUS_REFRESH_INTERVAL)
+    return response
+
+@console.route('/api/v1/status/<int:serial>', methods=['GET'])
+def certificate_status(serial):
+    if not _start_revocation_set():
+        return jsonify({'error': 'Revocation data is not loaded yet'}), 503
+    return _status_response(_certificate_status(serial))
+
+@console.route('/api/v1/status', methods=['POST'])
+def certificate_status_batch():
+    data = request.get_json(silent=True)
+    serials = data.get('serials') if isinstance(data, dict) else None
+    if not isinstance(serials, list) or not all(isinstance(serial, int) and not isinstance(serial, bool)
+                                                for serial in serials):
+        return jsonify({'error': 'Expected a "serials" list of certificate IDs'}), 400
+    if len(serials) > MAX_STATUS_BATCH:
+        return jsonify({'error': f'Too many serials: {len(serials)} (maximum {MAX_STATUS_BATCH})'}), 400
+    if not _start_revocation_set():
+        return jsonify({'error': 'Revocation data is not loaded yet'}), 503
+    return _status_response({'responses': [_certificate_status(serial) for serial in serials]})
+
+def _issuer_dict(node, counts, totals):
+    return {
+        'id': node.id,
+        'name': node.name,
+        'parent_id': node.parent_id,
+        'certificates': counts.get(node.id, 0),
+        'total_certificates': totals[node.id]
+    }
+
+def _parse_parent_id(data, tree):
+    """Return the ``parent_id`` of a request body, raising ValueError if it is not an issuer id or null."""
+    parent_id = data.get('parent_id')
+    if parent_id is not None and (isinstance(parent_id, bool) or parent_id not in tree):
+        raise ValueError(f'Unknown parent_id: {parent_id}')
+    return parent_id
+
+@console.route('/api/v1/issuers', methods=['GET'])
+def api_issuers():
+    tree = issuer_cache.tree()
+    counts = _issuer_counts(tree)
+    totals = tree.rollup(counts)
+    issuers = []
+    for node, depth in tree.walk():
+        issuer = _issuer_dict(node, counts, totals)
+        issuer['depth'] = depth
+        issuers.append(issuer)
+    return json_response({'issuers': issuers})
+
+@console.route('/api/v1/issuers/<int:issuer_id>', methods=['GET'])
+def get_issuer(issuer_id):
+    tree = issuer_cache.tree()
+    node = tree.get(issuer_id)
+    if node is None:
+        abort(404)
+    counts = _issuer_counts(tree)
+    totals = tree.rollup(counts)
+    issuer = _issuer_dict(node, counts, totals)
+    issuer['chain'] = [ancestor._asdict() for ancestor in tree.chain(issuer_id)]
+    issuer['children'] = [_issuer_dict(child, counts, totals) for child in tree if child.parent_id == issuer_id]
+    return json_response(issuer)
+
+@console.route('/api/v1/issuers', methods=['POST'])
+def create_issuer():
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    if not isinstance(name, str) or not name.strip() or len(name) > 255:
+        return jsonify({'error': 'name must be a non-empty string of at most 255 characters'}), 400
+    tree = issuer_cache.tree()
+    try:
+        parent_id = _parse_parent_id(data, tree)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    try:
+        with db.session.begin_nested():
+            issuer = Issuer(name=name, parent_id=parent_id)
+            db.session.add(issuer)
+    except IntegrityError:
+        return jsonify({'error': f'Issuer already exists: {name}'}), 409
+    _bump_version('issuers')
+    db.session.commit()
+    return json_response({'id': issuer.id, 'name': issuer.name, 'parent_id': issuer.parent_id}, status=201)
+
+@console.route('/api/v1/issuers/<int:issuer_id>', methods=['PATCH'])
+def update_issuer(issuer_id):
+    """Move an issuer under another CA, or make it a root with ``"parent_id": null``."""
+    data = request.get_json(silent=True) or {}
+    tree = issuer_cache.tree()
+    if issuer_id not in tree:
+        abort(404)
+    if 'parent_id' not in data:
+        return jsonify({'error': 'Missing required field: parent_id'}), 400
+    try:
+        parent_id = _parse_parent_id(data, tree)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    if parent_id is not None and tree.is_ancestor(issuer_id, parent_id):
+        return jsonify({'error': 'An issuer cannot be moved under itself or its own descendants'}), 400
+    db.session.execute(update(Issuer).where(Issuer.id == issuer_id).values(parent_id=parent_id))
+    _bump_version('issuers')
+    db.session.commit()
+    node = tree.get(issuer_id)
+    return json_response({'id': node.id, 'name': node.name, 'parent_id': parent_id})
+
+@console.route('/api/v1/servers', methods=['GET'])
+@replica_reads
+@cached_response('servers')
+def api_servers():
+    rows = db.session.execute(select(*_server_columns()).order_by(VaultServer.id)).all()
+    return json_response({'servers': rows_to_dicts(SERVER_FIELDS, rows)})
+
+@console.route('/api/v1/servers/<int:server_id>', methods=['GET'])
+@replica_reads
+@cached_response('servers')
+def get_server(server_id):
+    row = db.session.execute(
+        select(*_server_columns()).where(VaultServer.id == server_id)
+    ).first()
+    if row is None:
+        abort(404)
+    return json_response(row_to_dict(SERVER_FIELDS, row))
+
+@console.route('/api/v1/servers/<int:server_id>/unseal', methods=['POST'])
 def unseal_server(server_id):
     server = VaultServer.query.get_or_404(server_id)
     
@@ -279,7 +2691,9 @@ def unseal_server(server_id):
         }), 400
     
     server.sealed = False
+    _bump_version('servers')
     db.session.commit()
+    event_bus.publish('server.updated', {'servers': [{'id': server.id, 'sealed': False}]})
     
     return jsonify({
         'success': True,
@@ -288,27 +2702,176 @@ def unseal_server(server_id):
         'message': 'Server unsealed successfully'
     })
 
-@app.route('/health')
+EVENT_TOPICS = ('certificate', 'server')
+
+_stream_slots = threading.BoundedSemaphore(EVENT_MAX_STREAMS) if EVENT_MAX_STREAMS > 0 else None
+
+def _release_once(semaphore):
+    """Return a callback releasing ``semaphore`` on its first call only; a response may be closed twice."""
+    released = threading.Event()
+    def release():
+        if not released.is_set():
+            released.set()
+            semaphore.release()
+    return release
+
+def _stream_events(last_id, topics):
+    deadline = time.monotonic() + EVENT_STREAM_MAX_AGE
+    # Browsers reconnect after the retry delay, sending Last-Event-ID
+    yield 'retry: 2000\n\n'
+    while time.monotonic() < deadline:
+        events = event_bus.wait(last_id, EVENT_KEEPALIVE_INTERVAL)
+        if events is None:
+            # Missed events are no longer buffered; the page has to reload
+            yield 'event: reset\ndata: {}\n\n'
+            return
+        if not events:
+            yield ': keepalive\n\n'
+            continue
+        last_id = events[-1][0]
+        chunk = ''.join(f'id: {sequence}\nevent: {event_type}\ndata: {payload}\n\n'
+                        for sequence, event_type, payload in events
+                        if event_type.partition('.')[0] in topics)
+        if chunk:
+            yield chunk
+
+@console.route('/api/v1/events', methods=['GET'])
+def event_stream():
+    """Server-Sent Events feed of certificate and server changes.
+
+    Each stream holds a worker thread until it ends after
+    EVENT_STREAM_MAX_AGE seconds and the client reconnects, so run gunicorn
+    with threads. Beyond EVENT_MAX_STREAMS streams per worker, clients get
+    503 with Retry-After rather than taking the threads that serve the API.
+    """
+    topics = set(filter(None, request.args.get('topics', ','.join(EVENT_TOPICS)).split(',')))
+    if not topics <= set(EVENT_TOPICS):
+        return jsonify({'error': f"Invalid topics. Use any of: {', '.join(EVENT_TOPICS)}"}), 400
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    if not _start_event_relay():
+        return jsonify({'error': 'Event feed is not available yet'}), 503
+    if last_id is None:
+        last_id = event_bus.sequence
+    elif last_id > event_bus.sequence:
+        # Published by another worker since the last relay read, or from
+        # before a restart of the memory backend
+        event_bus.pump()
+        if last_id > event_bus.sequence:
+            last_id = -1
+    
+    if _stream_slots is not None and not _stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many open event streams, retry later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(EVENT_RETRY_AFTER)
+        return response
+    
+    response = Response(_stream_events(last_id, topics), mimetype='text/event-stream')
+    if _stream_slots is not None:
+        # Runs when the stream ends or the client goes away
+        response.call_on_close(_release_once(_stream_slots))
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep proxies such as nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@console.route('/health')
 def health():
-    return jsonify({"status": "healthy"})
+    body = {"status": "healthy"}
+    if replica_pool.replicas:
+        body["replicas"] = replica_pool.status()
+    return jsonify(body)
+
+@console.route('/metrics')
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
 
 # Template for documentation
-@app.route('/api/documentation')
+@console.route('/api/documentation')
 def api_docs():
     return render_template('api_docs.html')
 
 # Error handling
-@app.errorhandler(404)
+@console.app_errorhandler(404)
 def page_not_found(e):
     return render_template('error.html', error=e), 404
 
-@app.errorhandler(500)
+@console.app_errorhandler(500)
 def server_error(e):
     return render_template('error.html', error=e), 500
 
-# Call the seed function when the application starts
-with app.app_context():
-    seed_sample_data()
+# Engines of every app built in this process, disposed of in forked children
+_fork_disposed_engines = []
+_process_wired = False
+
+def _dispose_engines():
+    for engine in _fork_disposed_engines:
+        engine.dispose(close=False)
+
+def create_app(config=None):
+    """Build the application.
+
+    Nothing here touches the database: engines connect on first use, and the
+    schema and sample data are created by the ``init-db`` command. An app
+    built in a gunicorn master with ``--preload`` can therefore be forked
+    into workers without sharing connections.
+
+    Query metrics, the replica pool, the fork hook and the background
+    threads are set up once per process, for the first app built; calling
+    it again, e.g. with another config, does not repeat them.
+
+    Args:
+        config (dict, optional): Overrides applied after the environment settings
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
+    
+    # Configure SQLAlchemy to use PostgreSQL
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    app.config["SQLALCHEMY_BINDS"] = {f"replica_{n}": url for n, url in enumerate(DATABASE_REPLICA_URLS)}
+    if config:
+        app.config.update(config)
+    
+    db.init_app(app)
+    app.register_blueprint(console)
+    
+    with app.app_context():
+        engine = db.engine
+        replicas = {key: replica for key, replica in db.engines.items() if key is not None}
+    _fork_disposed_engines.extend((engine, *replicas.values()))
+    
+    global _process_wired
+    if _process_wired:
+        return app
+    _process_wired = True
+    # Metrics, the replica pool and the background threads are per process,
+    # so they follow the first app; apps built later only get the fork hook
+    query_accounting.instrument(engine)
+    pool_gauges(metrics_registry, engine)
+    for replica in replicas.values():
+        query_accounting.instrument(replica)
+    replica_pool.configure(engine, replicas)
+    # Pooled connections inherited across a fork must not be reused by the child
+    os.register_at_fork(after_in_child=_dispose_engines)
+    
+    if os.environ.get("STATUS_ENGINE_ENABLED") == "1":
+        _start_status_engine_thread(app)
+    if os.environ.get("STATS_REFRESH_ENABLED") == "1":
+        _start_stats_refresh_thread(app)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
+    with app.app_context():
+        init_database()
+        seed_sample_data()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
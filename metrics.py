@@ -0,0 +1,358 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms live in plain dicts keyed by label values, so
+recording an observation is a dict lookup, a ``bisect`` and a few integer
+additions under one lock. Gauges are callbacks evaluated when a snapshot is
+taken, so they cost nothing on the request path.
+
+SQL accounting hooks into SQLAlchemy engine events: every statement is timed
+between ``before_cursor_execute`` and ``after_cursor_execute``, or
+``handle_error`` when it fails, and the totals for the current request are
+kept in a thread-local accumulator.
+Connection checkout wait is measured around ``Engine.raw_connection``.
+
+With several worker processes (e.g. gunicorn), set ``METRICS_DIR`` to a
+directory shared by the workers and emptied on startup. Each worker writes
+its snapshot there in the background, and ``/metrics`` served by any worker
+merges all of them: counters and histograms are summed, gauges are reported
+per live worker with a ``worker`` label.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from periodic import start_periodic
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {'type': 'counter', 'help': self.documentation, 'labelnames': self.labelnames,
+                    'samples': [[list(labels), value] for labels, value in self._values.items()]}
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (non-cumulative, last is +Inf), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'type': 'histogram', 'help': self.documentation, 'labelnames': self.labelnames,
+                    'buckets': self.buckets,
+                    'samples': [[list(labels), [list(counts), total, count]]
+                                for labels, (counts, total, count) in self._values.items()]}
+
+
+class Gauge:
+    """Gauge whose samples come from ``collect()`` returning ``{labels: value}``."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def snapshot(self):
+        try:
+            values = self.collect()
+        except Exception:
+            logger.exception("Collecting gauge %s failed", self.name)
+            values = {}
+        return {'type': self.kind, 'help': self.documentation, 'labelnames': self.labelnames,
+                'samples': [[list(labels), value] for labels, value in values.items()]}
+
+
+class CallbackCounter(Gauge):
+    """Counter whose totals are kept elsewhere and read by ``collect()`` when a snapshot is taken."""
+
+    kind = 'counter'
+
+
+class MetricsRegistry:
+    def __init__(self, directory=None, flush_interval=5.0):
+        """
+        Args:
+            directory (str): Shared directory for multi-process aggregation;
+                metrics stay in-process when None
+            flush_interval (float): Seconds between snapshot writes to ``directory``
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames, collect):
+        return self._register(Gauge(name, documentation, labelnames, collect))
+
+    def callback_counter(self, name, documentation, labelnames, collect):
+        return self._register(CallbackCounter(name, documentation, labelnames, collect))
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f'worker-{pid}.json')
+
+    def flush(self):
+        """Write this process's snapshot to the shared directory atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        with open(path + '.tmp', 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(path + '.tmp', path)
+
+    def start_flusher(self):
+        """Start the background snapshot writer once per process."""
+        if self.directory:
+            start_periodic('metrics-flusher', self.flush_interval, self.flush, key=self)
+
+    def collect(self):
+        """Return the merged snapshots of all workers, or of this process alone."""
+        if not self.directory:
+            return self.snapshot()
+        own_pid = os.getpid()
+        snapshots = [(own_pid, self.snapshot())]
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not (name.startswith('worker-') and name.endswith('.json')):
+                continue
+            pid = int(name[len('worker-'):-len('.json')])
+            if pid == own_pid:
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as snapshot_file:
+                    snapshots.append((pid, json.load(snapshot_file)))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(snapshots)
+
+    def render(self):
+        """Render the merged metrics in the Prometheus text format."""
+        return render_text(self.collect())
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots):
+    """Merge ``[(pid, snapshot)]``, keeping the counts of exited workers but not their gauges."""
+    merged = {}
+    for pid, snapshot in snapshots:
+        alive = _pid_alive(pid)
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = dict(metric, samples={})
+                if metric['type'] == 'gauge':
+                    target['labelnames'] = list(metric['labelnames']) + ['worker']
+            samples = target['samples']
+            if metric['type'] == 'gauge':
+                if alive:
+                    for labels, value in metric['samples']:
+                        samples[tuple(labels) + (str(pid),)] = value
+            elif metric['type'] == 'counter':
+                for labels, value in metric['samples']:
+                    samples[tuple(labels)] = samples.get(tuple(labels), 0) + value
+            else:
+                for labels, (counts, total, count) in metric['samples']:
+                    entry = samples.get(tuple(labels))
+                    if entry is None:
+                        samples[tuple(labels)] = [list(counts), total, count]
+                    else:
+                        entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                        entry[1] += total
+                        entry[2] += count
+    for metric in merged.values():
+        metric['samples'] = [[list(labels), value] for labels, value in metric['samples'].items()]
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_text(snapshot):
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        kind = metric['type']
+        names = metric['labelnames']
+        exposed = name + '_total' if kind == 'counter' else name
+        lines.append(f"# HELP {exposed} {metric['help']}")
+        lines.append(f"# TYPE {exposed} {kind}")
+        for labels, value in sorted(metric['samples'], key=lambda sample: sample[0]):
+            if kind != 'histogram':
+                lines.append(f'{exposed}{_labels(names, labels)} {_number(value)}')
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(list(metric['buckets']) + [float('inf')], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(names, labels, [('le', _number(bound))])} {cumulative}")
+            lines.append(f'{name}_sum{_labels(names, labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(names, labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryAccounting:
+    """Times SQL statements and connection checkouts on an engine.
+
+    Statement counts and durations go to the registry and, between
+    ``start()`` and ``stop()``, to a per-thread accumulator for the current
+    request.
+    """
+
+    def __init__(self, registry):
+        self._local = threading.local()
+        self.queries = registry.counter('sql_queries', 'SQL statements executed')
+        self.query_duration = registry.histogram(
+            'sql_query_duration_seconds', 'SQL statement execution time')
+        self.query_errors = registry.counter('sql_query_errors', 'SQL statements that failed')
+        self.checkout_wait = registry.histogram(
+            'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled database connection')
+
+    def start(self):
+        self._local.queries = 0
+        self._local.seconds = 0.0
+
+    def stop(self):
+        """Return ``(queries, seconds)`` since ``start()`` and stop accumulating."""
+        queries = getattr(self._local, 'queries', None)
+        if queries is None:
+            return 0, 0.0
+        seconds = self._local.seconds
+        self._local.queries = None
+        return queries, seconds
+
+    def instrument(self, engine):
+        from sqlalchemy import event
+
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        # after_cursor_execute does not fire for a failed statement
+        event.listen(engine, 'handle_error', self._handle_error)
+
+        raw_connection = engine.raw_connection
+
+        def timed_raw_connection(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return raw_connection(*args, **kwargs)
+            finally:
+                self.checkout_wait.observe((), time.perf_counter() - started)
+
+        engine.raw_connection = timed_raw_connection
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._record(time.perf_counter() - conn.info['query_started'].pop())
+
+    def _handle_error(self, exception_context):
+        conn = exception_context.connection
+        # Also called for failures outside statements, e.g. on connect or commit
+        if exception_context.statement is None or conn is None or not conn.info.get('query_started'):
+            return
+        self.query_errors.inc()
+        self._record(time.perf_counter() - conn.info['query_started'].pop())
+
+    def _record(self, elapsed):
+        self.queries.inc()
+        self.query_duration.observe((), elapsed)
+        if getattr(self._local, 'queries', None) is not None:
+            self._local.queries += 1
+            self._local.seconds += elapsed
+
+
+def pool_gauges(registry, engine):
+    """Register checked-out connection count and pool size gauges for ``engine``.
+
+    Only pools with a fixed size (``QueuePool``) report these.
+    """
+    def checked_out():
+        pool = engine.pool
+        return {(): pool.checkedout()} if hasattr(pool, 'checkedout') else {}
+
+    def saturation():
+        pool = engine.pool
+        if not hasattr(pool, 'checkedout') or not pool.size():
+            return {}
+        return {(): pool.checkedout() / pool.size()}
+
+    registry.gauge('db_pool_checked_out', 'Database connections currently checked out', (), checked_out)
+    registry.gauge('db_pool_size', 'Configured database connection pool size', (),
+                   lambda: {(): engine.pool.size()} if hasattr(engine.pool, 'size') else {})
+    registry.gauge('db_pool_saturation', 'Checked-out connections as a fraction of the pool size '
+                   '(above 1 when overflow connections are in use)', (), saturation)
@@ -0,0 +1,141 @@
+"""
+Reversed-label index of certificate names.
+
+Every certificate's common name, DNS SANs and IP SANs are stored as one row
+each in a child table. DNS names are kept with their labels reversed and a
+trailing dot ("api.payments.example.com" becomes
+"com.example.payments.api."), so all names at or below a domain share a
+prefix and a suffix query becomes a range scan on the index:
+
+- exact: ``reversed_name = 'com.example.payments.api.'``
+- suffix (everything under payments.example.com):
+  ``'com.example.payments.' <= reversed_name < 'com.example.payments/'``
+- covers (certificates valid for api.payments.example.com): an exact lookup
+  of the name and of the matching wildcard, ``'com.example.payments.*.'``
+- wildcard query (*.payments.example.com): the suffix range restricted to
+  names exactly one label deeper, so not payments.example.com itself
+
+The ranges rely on bytewise string ordering, which is SQLite's default; the
+column uses the "C" collation on PostgreSQL. IP addresses are stored as-is
+and only support exact lookups.
+"""
+
+import ipaddress
+
+from sqlalchemy import and_, not_, or_
+
+MATCH_MODES = ('covers', 'exact', 'suffix')
+MAX_NAME_LENGTH = 253
+
+
+def _split(value, field):
+    """Accept a comma-separated string or a list of strings."""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        items = value.split(',')
+    elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+        items = value
+    else:
+        raise ValueError(f'{field} must be a comma-separated string or a list of strings')
+    return [item.strip() for item in items if item.strip()]
+
+
+def normalize_dns_name(name, field='name'):
+    """Lowercase a DNS name and check its labels; ``*`` is allowed as the first label."""
+    name = name.strip().lower().rstrip('.')
+    labels = name.split('.')
+    if not name or len(name) > MAX_NAME_LENGTH or any(not label or ' ' in label for label in labels):
+        raise ValueError(f'Invalid {field} entry: {name!r}')
+    if (any('*' in label for label in labels[1:]) or labels[0] != '*' and '*' in labels[0]
+            or labels == ['*']):
+        raise ValueError(f'Invalid {field} entry: {name!r} (only a leading "*." wildcard is supported)')
+    return name
+
+
+def reverse_name(name):
+    """Return the index key of a normalized DNS name."""
+    return '.'.join(reversed(name.split('.'))) + '.'
+
+
+def parse_ip(value):
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+
+def parse_sans(data):
+    """Return the normalized ``(alt_names, ip_sans)`` of an issuance spec.
+
+    Raises:
+        ValueError: If an entry is not a valid DNS name or IP address
+    """
+    alt_names = [normalize_dns_name(name, 'alt_names') for name in _split(data.get('alt_names'), 'alt_names')]
+    ip_sans = []
+    for value in _split(data.get('ip_sans'), 'ip_sans'):
+        address = parse_ip(value)
+        if address is None:
+            raise ValueError(f'Invalid ip_sans entry: {value!r}')
+        ip_sans.append(address)
+    return list(dict.fromkeys(alt_names)), list(dict.fromkeys(ip_sans))
+
+
+def name_rows(certificate_id, common_name, alt_names=(), ip_sans=()):
+    """Build the index rows for one certificate.
+
+    The common name is indexed as a DNS name when it parses as one, and
+    under its lowercased value otherwise (e.g. "Vault Root CA").
+    """
+    rows = []
+    cn = common_name.strip().lower()
+    address = parse_ip(cn)
+    if address is not None:
+        rows.append({'kind': 'cn', 'name': address, 'reversed_name': address})
+    else:
+        try:
+            cn = normalize_dns_name(cn)
+        except ValueError:
+            pass
+        rows.append({'kind': 'cn', 'name': cn, 'reversed_name': reverse_name(cn)})
+    rows.extend({'kind': 'dns', 'name': name, 'reversed_name': reverse_name(name)} for name in alt_names)
+    rows.extend({'kind': 'ip', 'name': address, 'reversed_name': address} for address in ip_sans)
+    for row in rows:
+        row['certificate_id'] = certificate_id
+    return rows
+
+
+def _prefix_range(column, prefix):
+    # prefix ends with "." and "/" is the next character, so this is exactly
+    # the set of keys starting with prefix
+    return and_(column >= prefix, column < prefix[:-1] + '/')
+
+
+def name_criterion(column, name, match='covers'):
+    """Return the condition on the ``reversed_name`` column for a name query.
+
+    Raises:
+        ValueError: If ``name`` or ``match`` is invalid
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(f"Invalid match: {match}. Use one of: {', '.join(MATCH_MODES)}")
+    address = parse_ip(name.strip())
+    if address is not None:
+        return column == address
+
+    name = normalize_dns_name(name)
+    labels = name.split('.')
+    if match == 'exact':
+        return column == reverse_name(name)
+    if labels[0] == '*':
+        # Names one label below the parent, including the wildcard itself;
+        # the parent itself is not covered by the wildcard (RFC 6125)
+        parent = reverse_name('.'.join(labels[1:]))
+        deeper = parent.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%.%.'
+        return and_(_prefix_range(column, parent), column != parent, not_(column.like(deeper, escape='\\')))
+    if match == 'suffix':
+        return _prefix_range(column, reverse_name(name))
+    keys = [reverse_name(name)]
+    if len(labels) > 2:
+        keys.append(reverse_name('.'.join(['*'] + labels[1:])))
+    return or_(*(column == key for key in keys))
@@ -0,0 +1,58 @@
+"""
+Periodic background work in daemon threads.
+
+Threads do not survive fork, so a thread started in the gunicorn master
+(e.g. with --preload) does not run in the workers. ``start_periodic``
+remembers which process started each task and starts it again the first
+time it is asked from another process, so callers can ask on every request.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Process id that started each task, by key
+_started = {}
+_lock = threading.Lock()
+
+
+def start_periodic(name, interval, fn, delay=False, key=None):
+    """Call ``fn()`` every ``interval`` seconds in a daemon thread, once per process.
+
+    Exceptions raised by ``fn`` are logged and the loop carries on.
+
+    Args:
+        name (str): Thread name, also used in log messages
+        interval (float): Seconds between the end of one call and the start of the next
+        fn (callable): The work to run
+        delay (bool): Wait ``interval`` seconds before the first call instead
+            of calling right away
+        key (hashable, optional): Identifies the task; defaults to ``name``
+
+    Returns:
+        bool: Whether this call started the thread
+    """
+    key = name if key is None else key
+    pid = os.getpid()
+    if _started.get(key) == pid:
+        return False
+    with _lock:
+        if _started.get(key) == pid:
+            return False
+        _started[key] = pid
+
+    def run():
+        if delay:
+            time.sleep(interval)
+        while True:
+            try:
+                fn()
+            except Exception:
+                logger.exception("Periodic task %s failed", name)
+            time.sleep(interval)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return True
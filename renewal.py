@@ -0,0 +1,221 @@
+"""
+Fleet renewal planning.
+
+Services are onboarded in waves and ``issue_certificate`` stamps
+``valid_from`` with the issuance time, so thousands of certificates can
+expire within minutes of each other. Renewing each one a fixed time before
+it expires would renew them all in the same minutes, and since a renewed
+certificate is valid from the moment it is renewed, the next generation
+would expire in the same wave again.
+
+``RenewalPlanner`` gives every certificate a renewal time within ``spread``
+before its deadline (``valid_until`` minus a safety ``margin``), or within
+the time left if that is less. The offset is a jitter derived from the
+plan seed and the certificate id, so planning the same inventory again
+gives the same times to certificates not yet inside their spread. Times
+are then pushed back where needed so that renewals are at least
+``1 / rate`` seconds apart, taking certificates in order of their jittered
+times. Certificates that do not fit in before their deadline, including
+those already past it, are counted as late and renewed as soon as the rate
+allows.
+
+Certificates are read in ``valid_until`` order, and only those whose spread
+overlaps the current position are held in memory, so planning millions of
+certificates takes bounded memory.
+
+``pipeline`` runs renewals on a thread pool with a bounded number in
+flight, and ``Pacer`` keeps them under the rate when a backlog of due
+renewals has built up, e.g. while the renewal runner was stopped.
+"""
+
+import hashlib
+import heapq
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+PlannedRenewal = namedtuple('PlannedRenewal', ('certificate_id', 'scheduled_at', 'deadline'))
+
+# Load curve interval widths, smallest first
+CURVE_BUCKETS = tuple(timedelta(minutes=minutes) for minutes in (1, 5, 15, 60, 360, 1440))
+
+
+def jitter(seed, certificate_id):
+    """Deterministic fraction in [0, 1) for a certificate in the plan with ``seed``."""
+    digest = hashlib.blake2b(f'{seed}:{certificate_id}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+def floor_time(moment, size):
+    """Start of the ``size``-long interval containing ``moment``."""
+    return moment - (moment - datetime.min) % size
+
+
+class RenewalPlanner:
+    """Spreads certificate renewals before their deadlines under a rate limit."""
+
+    def __init__(self, start, spread, margin, rate, seed=0):
+        """
+        Args:
+            start (datetime): Earliest renewal time, normally now
+            spread (timedelta): How long before its deadline a renewal may be scheduled
+            margin (timedelta): How long before expiry a certificate must be renewed
+            rate (float): Maximum renewals per second
+            seed: Jitter seed; the same seed gives the same schedule
+        """
+        self.start = start
+        self.spread = spread
+        self.margin = margin
+        self.interval = timedelta(seconds=1 / rate)
+        self.seed = seed
+        self.planned = 0
+        self.late = 0
+        # Late certificates whose deadline had passed before ``start``
+        self.overdue = 0
+
+    def plan(self, rows):
+        """Yield a ``PlannedRenewal`` per certificate, in order of renewal time.
+
+        Args:
+            rows (iterable): ``(certificate_id, valid_until)`` sorted by ``valid_until``
+        """
+        # (jittered time, deadline, id) of certificates not yet scheduled
+        heap = []
+        next_free = self.start
+
+        def release(bound=None):
+            nonlocal next_free
+            while heap and (bound is None or heap[0][0] < bound):
+                wanted, deadline, certificate_id = heapq.heappop(heap)
+                scheduled_at = max(wanted, next_free)
+                next_free = scheduled_at + self.interval
+                self.planned += 1
+                if scheduled_at > deadline:
+                    self.late += 1
+                    self.overdue += deadline <= self.start
+                yield PlannedRenewal(certificate_id, scheduled_at, deadline)
+
+        for certificate_id, valid_until in rows:
+            deadline = valid_until - self.margin
+            # Every later certificate wants a time at or after this bound,
+            # so everything before it can be scheduled now
+            yield from release(max(self.start, deadline - self.spread))
+            # Certificates already inside their spread are spread over the time left
+            window = min(self.spread, max(deadline - self.start, timedelta(0)))
+            wanted = max(self.start, deadline - window * jitter(self.seed, certificate_id))
+            heapq.heappush(heap, (wanted, deadline, certificate_id))
+        yield from release()
+
+
+class LoadProfile:
+    """Renewals per minute of a schedule, next to renewing every certificate at its deadline."""
+
+    def __init__(self):
+        self.scheduled = Counter()
+        self.at_deadline = Counter()
+
+    def add(self, scheduled_at, deadline):
+        minute = timedelta(minutes=1)
+        self.scheduled[floor_time(scheduled_at, minute)] += 1
+        self.at_deadline[floor_time(deadline, minute)] += 1
+
+    @property
+    def total(self):
+        return sum(self.scheduled.values())
+
+    def peaks(self):
+        """Return the busiest minute's renewals as ``(scheduled, at deadline)``."""
+        return max(self.scheduled.values(), default=0), max(self.at_deadline.values(), default=0)
+
+    def lines(self, bucket=None, max_lines=48, width=40):
+        """Format the load curve, one line per interval of ``bucket`` (chosen to fit ``max_lines`` by default)."""
+        if not self.scheduled:
+            return []
+        first = min(min(self.scheduled), min(self.at_deadline))
+        last = max(max(self.scheduled), max(self.at_deadline))
+        if bucket is None:
+            bucket = next((size for size in CURVE_BUCKETS if (last - first) / size < max_lines), CURVE_BUCKETS[-1])
+        scheduled = Counter()
+        at_deadline = Counter()
+        for minute, count in self.scheduled.items():
+            scheduled[floor_time(minute, bucket)] += count
+        for minute, count in self.at_deadline.items():
+            at_deadline[floor_time(minute, bucket)] += count
+        tallest = max(max(scheduled.values()), max(at_deadline.values()))
+        lines = [f"{'interval':<16}  {'scheduled':>9}  {'at deadline':>11}  (# scheduled, . at deadline; "
+                 f"{bucket.total_seconds() / 60:g} min per line)"]
+        moment = floor_time(first, bucket)
+        while moment <= last:
+            count, baseline = scheduled[moment], at_deadline[moment]
+            bar = '#' * round(width * count / tallest)
+            bar += '.' * max(0, round(width * baseline / tallest) - len(bar))
+            lines.append(f"{moment:%Y-%m-%d %H:%M}  {count:>9}  {baseline:>11}  {bar}")
+            moment += bucket
+        return lines
+
+
+class Pacer:
+    """Spaces calls to ``wait()`` at least ``1 / rate`` seconds apart."""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self._next = None
+
+    def wait(self):
+        now = self.clock()
+        if self._next is not None and self._next > now:
+            self.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+class Progress:
+    """Counts of a renewal run and its throughput."""
+
+    def __init__(self, total, clock=time.monotonic):
+        self.total = total
+        self.clock = clock
+        self.started = clock()
+        self.renewed = 0
+        self.failed = 0
+
+    def line(self):
+        elapsed = self.clock() - self.started
+        done = self.renewed + self.failed
+        rate = done / elapsed if elapsed > 0 else 0.0
+        line = (f"renewed {self.renewed} of {self.total} due ({100 * done / max(self.total, 1):.1f}% done), "
+                f"{self.failed} failed, {rate:.1f}/s")
+        if rate and done < self.total:
+            line += f", about {(self.total - done) / rate:.0f}s left"
+        return line
+
+
+def pipeline(items, work, workers, max_in_flight=None, pace=None):
+    """Run ``work(item)`` on a thread pool and yield ``(item, result, error)`` in the order of ``items``.
+
+    At most ``max_in_flight`` items (default: twice the workers) are
+    submitted ahead of the one being yielded, so a slow consumer holds up
+    the workers instead of piling up results. ``pace()``, if given, is
+    called before each submission.
+    """
+    max_in_flight = max_in_flight or 2 * workers
+    in_flight = deque()
+
+    def finish(item, future):
+        try:
+            return item, future.result(), None
+        except Exception as err:
+            return item, None, err
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='renewal') as executor:
+        for item in items:
+            if pace:
+                pace()
+            in_flight.append((item, executor.submit(work, item)))
+            if len(in_flight) >= max_in_flight:
+                yield finish(*in_flight.popleft())
+        while in_flight:
+            yield finish(*in_flight.popleft())
@@ -0,0 +1,178 @@
+"""
+Read replica routing.
+
+Endpoints marked for replica reads run their SELECTs on a read replica
+while everything else, including any INSERT, UPDATE or DELETE and every
+flush issued by those endpoints, stays on the primary. ``RoutingSession``
+makes that choice per statement from the replica picked for the current
+request (``g.read_replica``); without one, it behaves like the default
+Flask-SQLAlchemy session.
+
+Replication is left to the database (PostgreSQL streaming replication,
+LiteFS, a copied SQLite file). How far a replica trails the primary is
+measured with the application's data version counters, which every write
+bumps: each worker's monitor thread reads the counters from the primary
+and from every replica every ``check_interval`` seconds and keeps the
+primary's recent readings. A replica's lag is the age of the oldest
+primary reading it has not caught up with, so a replica that keeps up
+with a steady write load reports a lag near zero. Replicas that fail to
+answer or lag by more than ``max_lag`` seconds get no reads until they
+recover, and reads fall back to the primary.
+
+Read-your-writes is kept the same way: after a write, the versions it
+produced are kept in the client's session, and that client's reads only
+go to replicas that were seen at or past them.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from periodic import start_periodic
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica chosen for the current request, if any."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) and has_app_context():
+            replica = g.get('read_replica')
+            if replica is not None:
+                return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def on_primary():
+    """Run the enclosed reads on the primary, e.g. when they feed a write."""
+    replica = g.pop('read_replica', None) if has_app_context() else None
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g.read_replica = replica
+
+
+def caught_up(versions, required):
+    """Whether ``versions`` is at or past ``required`` for every scope in it."""
+    return all(versions.get(scope, 0) >= version for scope, version in required.items())
+
+
+class Replica:
+    """A replica engine and what the last check found."""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        # Not used until the first check has seen it answer
+        self.healthy = False
+        self.versions = {}
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+
+    def status(self):
+        return {'name': self.name, 'healthy': self.healthy, 'lag': self.lag, 'error': self.error}
+
+
+class ReplicaPool:
+    """Replica engines with health and lag tracking, and per-request selection."""
+
+    def __init__(self, read_versions, max_lag=5.0, check_interval=1.0, clock=time.monotonic):
+        """
+        Args:
+            read_versions (callable): ``read_versions(engine)`` returning the
+                ``{scope: version}`` data versions stored in that database
+            max_lag (float): Seconds a replica may trail the primary and still get reads
+            check_interval (float): Seconds between health and lag checks
+            clock (callable): Monotonic time in seconds
+        """
+        self.read_versions = read_versions
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.clock = clock
+        self.primary = None
+        self.replicas = []
+        # (time, versions) of recent primary readings, oldest first
+        self._history = deque()
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def configure(self, primary, replicas):
+        """
+        Args:
+            primary: Engine of the primary
+            replicas (dict): Replica engines by name
+        """
+        self.primary = primary
+        self.replicas = [Replica(name, engine) for name, engine in sorted(replicas.items())]
+        self._history.clear()
+
+    def check(self):
+        """Read the data versions of the primary and every replica and update their health."""
+        now = self.clock()
+        self._history.append((now, self.read_versions(self.primary)))
+        # Readings older than max_lag are only needed to tell how far beyond
+        # it a replica is; one is enough
+        while len(self._history) > 2 and now - self._history[1][0] > self.max_lag + self.check_interval:
+            self._history.popleft()
+        for replica in self.replicas:
+            try:
+                versions = self.read_versions(replica.engine)
+            except Exception as err:
+                if replica.healthy:
+                    logger.warning("Replica %s is unavailable: %s", replica.name, err)
+                replica.healthy = False
+                replica.error = str(err)
+                replica.checked_at = now
+                continue
+            lag = 0.0
+            for taken_at, primary_versions in self._history:
+                if not caught_up(versions, primary_versions):
+                    lag = now - taken_at
+                    break
+            healthy = lag <= self.max_lag
+            if healthy != replica.healthy:
+                logger.warning("Replica %s %s (lag %.1fs)", replica.name,
+                               'is back in rotation' if healthy else 'is lagging', lag)
+            replica.versions = versions
+            replica.lag = lag
+            replica.healthy = healthy
+            replica.error = None
+            replica.checked_at = now
+
+    def choose(self, required=None):
+        """Return a healthy replica that has caught up with ``required`` versions, or None for the primary."""
+        candidates = [replica for replica in self.replicas
+                      if replica.healthy and caught_up(replica.versions, required or {})]
+        if not candidates:
+            return None
+        return candidates[next(self._next) % len(candidates)]
+
+    def mark_down(self, replica, err):
+        """Take a replica out of rotation until the next successful check."""
+        replica.healthy = False
+        replica.error = str(err)
+
+    def status(self):
+        return [replica.status() for replica in self.replicas]
+
+    def start_monitor(self):
+        """Run ``check()`` now, then every ``check_interval`` seconds in a daemon thread."""
+        if not self.replicas:
+            return
+        if start_periodic('replica-monitor', self.check_interval, self.check, delay=True, key=self):
+            # The first check is made by the caller, so its request can use a replica
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Checking the read replicas failed")
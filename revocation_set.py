@@ -0,0 +1,137 @@
+"""
+In-memory revocation set for the certificate status responder.
+
+Certificate ids are dense integers, so membership is a bitmap with one bit
+per id: a status check is a single byte lookup and never touches the
+database. Revocation details (time and reason) are only needed for revoked
+certificates; they are kept in compact arrays in revocation log order, with
+a sorted index over the ids that is rebuilt lazily once enough new entries
+have accumulated.
+
+The set is loaded from the revocation log on first use and then kept
+current in two ways: revocations made by this worker are added as soon as
+they are committed, and a background thread reads log entries newer than
+the last sequence number seen (written by other workers) every
+``refresh_interval`` seconds. The same refresh tracks the highest issued
+id, so unknown serials can be told apart from good ones.
+
+A Bloom filter in front of the bitmap was considered; for dense integer
+keys the bitmap is exact, smaller, and cheaper to probe.
+"""
+
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from periodic import start_periodic
+
+# Unsorted entries tolerated before the sorted id index is rebuilt
+SORT_THRESHOLD = 1024
+
+
+class RevocationSet:
+    """Revoked certificate ids with their revocation time and reason."""
+
+    def __init__(self, reasons, refresh_interval=1.0):
+        """
+        Args:
+            reasons (tuple): Revocation reason names; stored as indexes into this tuple
+            refresh_interval (float): Seconds between reads of the revocation log
+        """
+        self.reasons = tuple(reasons)
+        self._reason_codes = {reason: code for code, reason in enumerate(self.reasons)}
+        self.refresh_interval = refresh_interval
+        self._bitmap = bytearray()
+        # Revocation details in log order
+        self._log_ids = array('q')
+        self._log_times = array('d')
+        self._log_reasons = array('B')
+        # Ids of the log entries present at the last index rebuild, in
+        # ascending order, with their log positions
+        self._sorted_ids = array('q')
+        self._sorted_positions = array('q')
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self.sequence = 0
+        self.max_serial = 0
+        self.updated_at = None
+
+    def __len__(self):
+        return len(self._log_ids)
+
+    def __contains__(self, serial):
+        byte = serial >> 3
+        return 0 <= byte < len(self._bitmap) and bool(self._bitmap[byte] & (1 << (serial & 7)))
+
+    def add(self, entries):
+        """Add ``(serial, revoked_at, reason)`` entries, skipping serials already revoked."""
+        with self._lock:
+            for serial, revoked_at, reason in entries:
+                if serial in self:
+                    continue
+                byte = serial >> 3
+                if byte >= len(self._bitmap):
+                    self._bitmap.extend(bytes(max(byte + 1 - len(self._bitmap), len(self._bitmap) // 2)))
+                self._bitmap[byte] |= 1 << (serial & 7)
+                self._log_ids.append(serial)
+                self._log_times.append(revoked_at.timestamp())
+                self._log_reasons.append(self._reason_codes.get(reason, 0))
+                self.max_serial = max(self.max_serial, serial)
+            if len(self._log_ids) - len(self._sorted_ids) > SORT_THRESHOLD:
+                self._rebuild_index()
+
+    def note_issued(self, serial):
+        """Record that ``serial`` exists, ahead of the next refresh."""
+        if serial > self.max_serial:
+            self.max_serial = serial
+
+    def _rebuild_index(self):
+        order = sorted(range(len(self._log_ids)), key=self._log_ids.__getitem__)
+        self._sorted_ids = array('q', (self._log_ids[position] for position in order))
+        self._sorted_positions = array('q', order)
+
+    def details(self, serial):
+        """Return ``(revoked_at, reason)`` for a revoked serial, or None."""
+        if serial not in self:
+            return None
+        with self._lock:
+            index = bisect_left(self._sorted_ids, serial)
+            if index < len(self._sorted_ids) and self._sorted_ids[index] == serial:
+                position = self._sorted_positions[index]
+            else:
+                # Added since the index was last rebuilt
+                position = self._log_ids.index(serial, len(self._sorted_ids))
+            return (datetime.fromtimestamp(self._log_times[position]),
+                    self.reasons[self._log_reasons[position]])
+
+    def status(self, serial):
+        """Return ``('good' | 'revoked' | 'unknown', revoked_at, reason)``."""
+        if serial in self:
+            return ('revoked',) + self.details(serial)
+        if serial < 1 or serial > self.max_serial:
+            return 'unknown', None, None
+        return 'good', None, None
+
+    def refresh(self, read_log, read_max_serial):
+        """Apply log entries newer than the last one seen.
+
+        Args:
+            read_log (callable): ``read_log(after_sequence)`` returning
+                ``(sequence, serial, reason, revoked_at)`` rows in sequence order
+            read_max_serial (callable): Returns the highest issued certificate id
+        """
+        rows = read_log(self.sequence)
+        if rows:
+            self.add((serial, revoked_at, reason) for _, serial, reason, revoked_at in rows)
+            self.sequence = max(self.sequence, rows[-1][0])
+        self.note_issued(read_max_serial() or 0)
+        self.updated_at = datetime.now()
+        self._loaded.set()
+
+    def wait_loaded(self, timeout=None):
+        return self._loaded.wait(timeout)
+
+    def start_refresher(self, refresh):
+        """Run ``refresh()`` now and then every ``refresh_interval`` seconds in a daemon thread."""
+        start_periodic('revocation-set', self.refresh_interval, refresh, key=self)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Fake Vault cluster for exercising the health poller locally.
+
+Starts one plain-HTTP listener per simulated node on consecutive ports of
+127.0.0.1, each answering /v1/sys/health and /v1/sys/seal-status like a real
+Vault node (active, standby, sealed or uninitialized) over keep-alive
+connections. A share of nodes can be made slow or left unreachable.
+
+Example:
+    # Terminal 1: simulate 300 nodes and register them in the console database
+    DATABASE_URL=sqlite:///vault_pki.db python scripts/fake-vault-cluster.py --nodes 300 --register
+
+    # Terminal 2: poll them
+    DATABASE_URL=sqlite:///vault_pki.db flask --app main poll-servers --scheme http
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+VERSION = "1.14.0"
+
+
+class FakeVaultNode:
+    """State and HTTP handling for one simulated node."""
+
+    def __init__(self, name, role, delay=0.0):
+        self.name = name
+        self.role = role
+        self.delay = delay
+
+    def health(self):
+        sealed = self.role == 'sealed'
+        initialized = self.role != 'uninitialized'
+        body = {
+            'initialized': initialized,
+            'sealed': sealed,
+            'standby': self.role == 'standby',
+            'performance_standby': False,
+            'replication_dr_mode': 'disabled',
+            'replication_performance_mode': 'disabled',
+            'server_time_utc': 0,
+            'version': VERSION,
+            'cluster_name': 'vault-cluster-fake',
+        }
+        if not initialized:
+            return 501, body
+        if sealed:
+            return 503, body
+        if self.role == 'standby':
+            return 429, body
+        return 200, body
+
+    def seal_status(self):
+        return 200, {
+            'type': 'shamir',
+            'initialized': self.role != 'uninitialized',
+            'sealed': self.role == 'sealed',
+            't': 3,
+            'n': 5,
+            'progress': 0,
+            'version': VERSION,
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                path = request_line.split()[1].decode().split('?')[0]
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if path == '/v1/sys/health':
+                    status, body = self.health()
+                elif path == '/v1/sys/seal-status':
+                    status, body = self.seal_status()
+                else:
+                    status, body = 404, {'errors': []}
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (ConnectionError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+
+def build_nodes(count, sealed_ratio, down_ratio, slow_ratio, slow_delay, seed):
+    rng = random.Random(seed)
+    nodes = []
+    for index in range(count):
+        roll = rng.random()
+        if roll < down_ratio:
+            role = 'down'
+        elif roll < down_ratio + sealed_ratio:
+            role = 'sealed'
+        elif index % 3 == 0:
+            role = 'active'
+        else:
+            role = 'standby'
+        delay = slow_delay if rng.random() < slow_ratio else 0.0
+        nodes.append(FakeVaultNode(f'vault-fake-{index}', role, delay))
+    return nodes
+
+
+def register_nodes(nodes, base_port):
+    """Replace the VaultServer rows with the simulated nodes."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from main import app, db, VaultServer, init_database
+
+    with app.app_context():
+        init_database()
+        db.session.execute(db.delete(VaultServer))
+        db.session.add_all(
+            VaultServer(name=node.name, address=f'127.0.0.1:{base_port + index}',
+                        status='unknown', sealed=True)
+            for index, node in enumerate(nodes)
+        )
+        db.session.commit()
+    print(f"Registered {len(nodes)} servers")
+
+
+async def serve(nodes, base_port):
+    servers = []
+    for index, node in enumerate(nodes):
+        if node.role == 'down':
+            continue
+        servers.append(await asyncio.start_server(node.handle, '127.0.0.1', base_port + index))
+    roles = {}
+    for node in nodes:
+        roles[node.role] = roles.get(node.role, 0) + 1
+    print(f"Serving {len(servers)} fake Vault nodes on ports {base_port}-{base_port + len(nodes) - 1}: {roles}")
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Vault cluster for health poller testing')
+    parser.add_argument('--nodes', type=int, default=100, help='Number of simulated nodes (default: 100)')
+    parser.add_argument('--base-port', type=int, default=18200, help='Port of the first node (default: 18200)')
+    parser.add_argument('--sealed-ratio', type=float, default=0.05, help='Share of sealed nodes (default: 0.05)')
+    parser.add_argument('--down-ratio', type=float, default=0.02, help='Share of unreachable nodes (default: 0.02)')
+    parser.add_argument('--slow-ratio', type=float, default=0.02, help='Share of slow nodes (default: 0.02)')
+    parser.add_argument('--slow-delay', type=float, default=5.0, help='Response delay of slow nodes in seconds (default: 5)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for node roles (default: 1)')
+    parser.add_argument('--register', action='store_true',
+                        help='Replace the VaultServer rows in DATABASE_URL with the simulated nodes')
+    args = parser.parse_args()
+
+    nodes = build_nodes(args.nodes, args.sealed_ratio, args.down_ratio, args.slow_ratio, args.slow_delay, args.seed)
+    if args.register:
+        register_nodes(nodes, args.base_port)
+    try:
+        asyncio.run(serve(nodes, args.base_port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+JSON serialization fast path for the API.
+
+List endpoints select plain column tuples instead of hydrating ORM
+instances, turn them into dicts with one ``zip`` per row and encode the
+result in a single call. orjson is used when it is installed: it encodes
+datetimes natively, so no per-field ``isoformat()`` calls are needed. The
+stdlib fallback formats timestamps once per distinct value, which pays off
+because batch-issued certificates share their validity timestamps.
+
+Both backends produce the same output as Flask's ``jsonify`` (compact,
+sorted keys, naive ISO 8601 timestamps).
+"""
+
+import json
+from datetime import datetime
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson else 'json'
+
+CERTIFICATE_FIELDS = ('id', 'name', 'common_name', 'issuer', 'valid_from', 'valid_until', 'status', 'created_at')
+SERVER_FIELDS = ('id', 'name', 'address', 'status', 'sealed', 'version', 'last_checked')
+
+
+def rows_to_dicts(fields, rows):
+    """Turn column tuples into dicts keyed by ``fields``."""
+    if orjson:
+        return [dict(zip(fields, row)) for row in rows]
+
+    formatted = {}
+
+    def fmt(value):
+        if isinstance(value, datetime):
+            text = formatted.get(value)
+            if text is None:
+                text = formatted[value] = value.isoformat()
+            return text
+        return value
+
+    return [dict(zip(fields, map(fmt, row))) for row in rows]
+
+
+def row_to_dict(fields, row):
+    return rows_to_dicts(fields, [row])[0]
+
+
+def dumps(obj):
+    """Encode ``obj`` as compact JSON bytes with sorted keys."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), default=_default).encode()
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def json_response(obj, status=200):
+    """Build a JSON response without going through ``jsonify``."""
+    return Response(dumps(obj), status=status, mimetype='application/json')
@@ -0,0 +1,228 @@
+"""
+Expiry-aware certificate status engine.
+
+Certificates move from "valid" to "expiring" when they enter the expiry
+window and to "expired" once ``valid_until`` has passed. Instead of
+recomputing every row's status, the engine loads the transitions due within
+a short horizon from the ``(status, valid_until, id)`` index into a min-heap
+and applies them in small batched UPDATEs as their time comes. Anything that
+was missed (engine down, certificates issued with a short TTL) is picked up
+by a set-based catch-up pass each time the horizon is reloaded.
+
+``schedule`` is called by request threads while the engine runs in its
+own thread, so the heap is only touched under a lock. Certificates
+scheduled while the horizon is being reloaded are added to the new heap.
+
+The clock and sleep functions are injectable so the engine can be driven
+offline.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+logger = logging.getLogger(__name__)
+
+# Certificates expiring within this window are reported as "expiring"
+EXPIRING_WINDOW = timedelta(days=30)
+
+
+class StatusEngine:
+    """Applies time-based certificate status transitions."""
+
+    def __init__(self, db, model, expiring_window=EXPIRING_WINDOW,
+                 horizon=timedelta(hours=1), batch_size=500,
+                 clock=datetime.now, sleep=time.sleep, on_change=None, on_commit=None):
+        """
+        Args:
+            db: Flask-SQLAlchemy extension whose session is used
+            model: Certificate model with ``id``, ``status`` and ``valid_until``
+            expiring_window (timedelta): How long before expiry a certificate is "expiring"
+            horizon (timedelta): How far ahead transitions are loaded into the heap
+            batch_size (int): Maximum number of rows changed per UPDATE
+            clock (callable): Returns the current time as a naive datetime
+            sleep (callable): Sleeps for the given number of seconds
+            on_change (callable, optional): Called with a Counter of
+                ``('status', name): delta`` before each commit
+            on_commit (callable, optional): Called after each commit with the
+                same Counter, the new status and the ids moved to it
+        """
+        self.db = db
+        self.model = model
+        self.expiring_window = expiring_window
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.clock = clock
+        self.sleep = sleep
+        self.on_change = on_change
+        self.on_commit = on_commit
+        self._heap = []
+        self._loaded_until = None
+        self._lock = threading.Lock()
+        # (cert_id, valid_until) scheduled while a reload is reading the table
+        self._scheduled_during_load = None
+
+    @property
+    def pending(self):
+        """Number of transitions waiting in the heap."""
+        with self._lock:
+            return len(self._heap)
+
+    @property
+    def next_transition(self):
+        """Time of the next scheduled transition, or None."""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def _apply(self, ids, from_statuses, new_status):
+        """Move ``ids`` still in one of ``from_statuses`` to ``new_status``."""
+        model = self.model
+        changed = 0
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            deltas = Counter()
+            moved = []
+            for status in from_statuses:
+                # One UPDATE per source status keeps the count deltas exact;
+                # the status guard makes replays and concurrent engines harmless
+                moved_ids = self.db.session.scalars(
+                    update(model)
+                    .where(model.id.in_(batch), model.status == status)
+                    .values(status=new_status)
+                    .returning(model.id)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                deltas[('status', status)] -= len(moved_ids)
+                deltas[('status', new_status)] += len(moved_ids)
+                moved.extend(moved_ids)
+            changed += len(moved)
+            if self.on_change and moved:
+                self.on_change(deltas)
+            self.db.session.commit()
+            if self.on_commit and moved:
+                self.on_commit(deltas, new_status, moved)
+        return changed
+
+    def _ids_where(self, *criteria, limit=None):
+        stmt = select(self.model.id).where(*criteria).order_by(self.model.valid_until, self.model.id)
+        if limit:
+            stmt = stmt.limit(limit)
+        return self.db.session.scalars(stmt).all()
+
+    def catch_up(self, now=None):
+        """Apply every transition whose threshold is already in the past."""
+        now = now or self.clock()
+        model = self.model
+        changed = 0
+        passes = (
+            (('valid', 'expiring'), 'expired', model.valid_until <= now),
+            (('valid',), 'expiring', model.valid_until <= now + self.expiring_window),
+        )
+        for from_statuses, new_status, threshold in passes:
+            while True:
+                ids = self._ids_where(model.status.in_(from_statuses), threshold, limit=self.batch_size)
+                if not ids:
+                    break
+                changed += self._apply(ids, from_statuses, new_status)
+        return changed
+
+    def _push(self, heap, until, cert_id, valid_until, status='valid'):
+        if status == 'valid' and valid_until - self.expiring_window < until:
+            heapq.heappush(heap, (valid_until - self.expiring_window, cert_id, 'expiring'))
+        if valid_until < until:
+            heapq.heappush(heap, (valid_until, cert_id, 'expired'))
+
+    def load(self, now=None):
+        """Load the transitions due within the horizon into the heap."""
+        now = now or self.clock()
+        model = self.model
+        until = now + self.horizon
+        with self._lock:
+            self._scheduled_during_load = []
+        try:
+            rows = self.db.session.execute(
+                select(model.id, model.status, model.valid_until).where(
+                    model.status.in_(('valid', 'expiring')),
+                    model.valid_until < until + self.expiring_window
+                ).order_by(model.valid_until, model.id)
+            ).all()
+        except Exception:
+            with self._lock:
+                self._scheduled_during_load = None
+            raise
+        heap = []
+        for cert_id, status, valid_until in rows:
+            self._push(heap, until, cert_id, valid_until, status)
+        with self._lock:
+            # Committed after the query may have started, so possibly not in ``rows``;
+            # a transition loaded twice is applied once thanks to the status guard
+            for cert_id, valid_until in self._scheduled_during_load:
+                self._push(heap, until, cert_id, valid_until)
+            self._scheduled_during_load = None
+            self._heap = heap
+            self._loaded_until = until
+
+    def schedule(self, cert_id, valid_until):
+        """Add a newly issued certificate's transitions if they fall within the horizon.
+
+        Call it after the certificate is committed.
+        """
+        with self._lock:
+            if self._scheduled_during_load is not None:
+                self._scheduled_during_load.append((cert_id, valid_until))
+            elif self._loaded_until is not None:
+                self._push(self._heap, self._loaded_until, cert_id, valid_until)
+
+    def run_once(self):
+        """Apply all due transitions, reloading the horizon when it has run out.
+
+        Returns:
+            int: Number of certificates whose status changed
+        """
+        now = self.clock()
+        changed = 0
+        if self._loaded_until is None or now >= self._loaded_until:
+            changed += self.catch_up(now)
+            self.load(now)
+
+        due = {'expiring': [], 'expired': []}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, cert_id, new_status = heapq.heappop(self._heap)
+                due[new_status].append(cert_id)
+        if due['expiring']:
+            changed += self._apply(due['expiring'], ('valid',), 'expiring')
+        if due['expired']:
+            changed += self._apply(due['expired'], ('valid', 'expiring'), 'expired')
+        return changed
+
+    def seconds_until_next(self, max_wait=60.0):
+        """Seconds to sleep before the next transition or horizon reload."""
+        now = self.clock()
+        with self._lock:
+            wake = self._loaded_until or now
+            if self._heap:
+                wake = min(wake, self._heap[0][0])
+        return max(0.0, min(max_wait, (wake - now).total_seconds()))
+
+    def run_forever(self, max_wait=60.0, stop=None):
+        """Run until ``stop`` (a threading.Event) is set."""
+        while stop is None or not stop.is_set():
+            try:
+                changed = self.run_once()
+                if changed:
+                    logger.info("Status engine updated %d certificates", changed)
+                wait = self.seconds_until_next(max_wait)
+            except Exception:
+                logger.exception("Status engine pass failed")
+                self.db.session.rollback()
+                # Force a catch-up and reload on the next pass
+                with self._lock:
+                    self._loaded_until = None
+                wait = max_wait
+            self.sleep(wait)
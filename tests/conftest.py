@@ -0,0 +1,78 @@
+"""
+Shared setup for the test suite.
+
+``main`` reads its settings from the environment when imported and wires
+process-wide state (the replica pool, metrics) for the first app it builds,
+so the whole session runs against one primary and one read replica, both
+SQLite files in a temporary directory. The replica only gets reads while a
+test keeps it caught up; see ``test_replicas.py``.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DIRECTORY = tempfile.mkdtemp(prefix='pki-tests-')
+PRIMARY_URL = f"sqlite:///{os.path.join(DIRECTORY, 'primary.db')}"
+REPLICA_URL = f"sqlite:///{os.path.join(DIRECTORY, 'replica.db')}"
+MAX_LAG = 0.5
+
+os.environ.update({
+    'DATABASE_URL': PRIMARY_URL,
+    'DATABASE_REPLICA_URLS': REPLICA_URL,
+    'REPLICA_MAX_LAG': str(MAX_LAG),
+    # Replica checks are run by the tests
+    'REPLICA_CHECK_INTERVAL': '3600',
+    'KEY_POOL_PREWARM': '',
+})
+for path in (ROOT, os.path.join(ROOT, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class FakeClock:
+    """A clock that only moves when told to; ``sleep`` moves it forward."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock(datetime.now().replace(microsecond=0))
+
+
+@pytest.fixture(scope='session')
+def app():
+    import main
+
+    with main.app.app_context():
+        main.init_database()
+    yield main.app
+    main.key_pool.shutdown()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count(app):
+    """``count(model, *criteria)`` returns the number of matching rows."""
+    from main import db
+
+    def count(model, *criteria):
+        with app.app_context():
+            return db.session.scalar(db.select(db.func.count()).select_from(model).where(*criteria))
+    return count
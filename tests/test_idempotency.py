@@ -0,0 +1,90 @@
+"""Concurrent duplicate issuance with and without an Idempotency-Key."""
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+ISSUE_PATH = '/api/v1/certificates/issue'
+DUPLICATES = 40
+
+
+def burst(app, body, headers, count=DUPLICATES):
+    """Send ``count`` copies of one request at once; return ``(status, replayed, body)`` per response."""
+    local = threading.local()
+    start = threading.Event()
+
+    def send():
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start.wait()
+        response = client.post(ISSUE_PATH, json=body, headers=headers)
+        result = response.status_code, response.headers.get('Idempotent-Replayed') == 'true', response.get_json()
+        response.close()
+        return result
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        futures = [executor.submit(send) for _ in range(count)]
+        start.set()
+        return [future.result() for future in futures]
+
+
+@pytest.fixture
+def body():
+    return {'common_name': f'idem-{uuid.uuid4().hex[:8]}.example.com', 'role': 'server', 'ttl': '720h',
+            'key_type': 'ec', 'key_bits': 256}
+
+
+def test_keyed_burst_issues_once(app, client, count, body):
+    from main import Certificate, IdempotencyRecord, issue_coalescer
+
+    key = f'test-{uuid.uuid4()}'
+    before = count(Certificate)
+    responses = burst(app, body, {'Idempotency-Key': key})
+
+    assert [status for status, _, _ in responses] == [201] * DUPLICATES
+    assert len({data['certificate_id'] for _, _, data in responses}) == 1
+    assert count(Certificate) - before == 1
+    assert sum(replayed for _, replayed, _ in responses) == DUPLICATES - 1
+    assert any(data['private_key'] for _, _, data in responses)
+    # A response without the key always says why
+    assert all(data['private_key'] or data.get('warning') for _, _, data in responses)
+
+    retry = client.post(ISSUE_PATH, json=body, headers={'Idempotency-Key': key})
+    assert retry.status_code == 201 and retry.headers.get('Idempotent-Replayed') == 'true'
+    assert retry.get_json()['certificate_id'] == responses[0][2]['certificate_id']
+    assert retry.get_json()['private_key'] is None and retry.get_json()['warning']
+
+    with app.app_context():
+        from main import db
+        stored = db.session.scalars(db.select(IdempotencyRecord.body).where(IdempotencyRecord.body.is_not(None))).all()
+    stored += [entry[1][1] for entry in list(issue_coalescer._completed.values())]
+    assert not [data for data in stored if b'PRIVATE KEY' in data]
+
+
+def test_reused_key_for_another_request_is_rejected(client, body):
+    key = f'test-{uuid.uuid4()}'
+    assert client.post(ISSUE_PATH, json=body, headers={'Idempotency-Key': key}).status_code == 201
+    response = client.post(ISSUE_PATH, json=dict(body, ttl='24h'), headers={'Idempotency-Key': key})
+    assert response.status_code == 422
+
+
+def test_unkeyed_requests_are_not_coalesced_by_default(app, count, body):
+    from main import Certificate
+
+    before = count(Certificate)
+    responses = burst(app, body, {})
+    assert [status for status, _, _ in responses] == [201] * DUPLICATES
+    assert not any(replayed for _, replayed, _ in responses)
+    assert count(Certificate) - before == DUPLICATES
+
+
+def test_coalesced_requests_get_the_private_key(app, monkeypatch, body):
+    import main
+
+    monkeypatch.setattr(main, 'ISSUE_COALESCING', True)
+    responses = burst(app, body, {})
+    assert [status for status, _, _ in responses] == [201] * DUPLICATES
+    assert all(data['private_key'] for _, _, data in responses)
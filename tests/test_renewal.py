@@ -0,0 +1,131 @@
+"""Fleet renewal planning and the bulk renewal pipeline, through the CLI commands."""
+
+import re
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+CERTIFICATES = 2000
+WAVE = 500
+WAVE_MINUTES = 10
+RATE = 2
+BACKLOG = 90
+RUN_RATE = 200
+
+
+@pytest.fixture(scope='module')
+def wave(app):
+    """Seed an inventory plus a wave of certificates expiring within minutes of each other; return its first id."""
+    from main import (db, Certificate, CertificateName, _bump_version, _create_issuers, name_rows,
+                      refresh_certificate_stats)
+    from synthetic import seed_inventory
+
+    with app.app_context():
+        seed_inventory(CERTIFICATES, 0)
+        issuer = 'Vault Intermediate CA'
+        issuer_id = _create_issuers([issuer])[issuer]
+        first_id = db.session.scalar(db.select(db.func.max(Certificate.id))) + 1
+        expires = datetime.now() + timedelta(days=20)
+        rows, names = [], []
+        for offset in range(WAVE):
+            cert_id = first_id + offset
+            valid_until = expires + timedelta(seconds=offset * WAVE_MINUTES * 60 / WAVE)
+            common_name = f'wave-{cert_id}.svc.cluster.local'
+            rows.append({'id': cert_id, 'name': f'wave-{cert_id}', 'common_name': common_name, 'issuer': issuer,
+                         'issuer_id': issuer_id, 'valid_from': valid_until - timedelta(days=90),
+                         'valid_until': valid_until, 'status': 'valid'})
+            names.extend(name_rows(cert_id, common_name, [f'alt-{cert_id}.svc.cluster.local']))
+        db.session.execute(db.insert(Certificate), rows)
+        db.session.execute(db.insert(CertificateName), names)
+        _bump_version('certificates')
+        refresh_certificate_stats()
+    return first_id
+
+
+@pytest.fixture
+def invoke(app):
+    runner = app.test_cli_runner()
+
+    def invoke(*command):
+        result = runner.invoke(args=list(command))
+        if result.exception:
+            raise result.exception
+        return result.output
+    return invoke
+
+
+def test_plan_and_renew(app, wave, invoke, count):
+    from main import db, Certificate, CertificateBody, CertificateName, RenewalTask, simulated_issuer
+    from cert_store import decompress
+
+    # A dry run writes nothing, is repeatable and keeps the busiest minute within the rate
+    output = invoke('plan-renewals', '--dry-run', '--rate', str(RATE))
+    planned = int(re.search(r'Would schedule (\d+)', output).group(1))
+    scheduled_peak, deadline_peak = map(int, re.search(r'Busiest minute: (\d+) .*: (\d+)', output).groups())
+    late, overdue = map(int, re.search(r'(\d+) after their deadline \((\d+) already', output).groups())
+    assert count(RenewalTask) == 0
+    assert invoke('plan-renewals', '--dry-run', '--rate', str(RATE)).splitlines()[:2] == output.splitlines()[:2]
+    assert scheduled_peak <= RATE * 60 + 1
+    assert deadline_peak >= WAVE / WAVE_MINUTES
+    assert late == overdue
+
+    # The stored plan keeps renewals 1 / rate apart and before their deadlines
+    invoke('plan-renewals', '--rate', str(RATE))
+    assert count(RenewalTask, RenewalTask.status == 'pending') == planned
+    with app.app_context():
+        times = db.session.scalars(db.select(RenewalTask.scheduled_at).order_by(RenewalTask.scheduled_at)).all()
+    assert min((b - a).total_seconds() for a, b in zip(times, times[1:])) >= 1 / RATE - 1e-6
+    assert count(RenewalTask, RenewalTask.scheduled_at > RenewalTask.deadline) == overdue
+
+    # A backlog of due renewals is worked off at no more than the rate, and can be stopped and resumed
+    with app.app_context():
+        backlog = db.session.scalars(db.select(RenewalTask.certificate_id)
+                                     .order_by(RenewalTask.scheduled_at).limit(BACKLOG)).all()
+        db.session.execute(db.update(RenewalTask).where(RenewalTask.certificate_id.in_(backlog))
+                           .values(scheduled_at=datetime.now() - timedelta(hours=1)))
+        db.session.commit()
+    before = count(Certificate)
+    renew = ('renew-certificates', '--once', '--rate', str(RUN_RATE), '--workers', '4', '--key-spec', 'ec:256')
+    started = time.perf_counter()
+    invoke(*renew, '--limit', str(BACKLOG // 3))
+    assert count(RenewalTask, RenewalTask.status == 'renewed') == BACKLOG // 3
+    invoke(*renew)
+    elapsed = time.perf_counter() - started
+    assert count(RenewalTask, RenewalTask.status == 'renewed') == BACKLOG
+    assert elapsed >= (BACKLOG - 2) / RUN_RATE
+
+    # One replacement per certificate, with the same names and lifetime
+    assert count(Certificate) - before == BACKLOG
+    with app.app_context():
+        old, new = db.aliased(Certificate), db.aliased(Certificate)
+        mismatched = db.session.scalar(
+            db.select(db.func.count()).select_from(RenewalTask)
+            .join(old, old.id == RenewalTask.certificate_id).join(new, new.id == RenewalTask.renewed_id)
+            .where(db.or_(old.common_name != new.common_name,
+                          db.func.julianday(old.valid_until) - db.func.julianday(old.valid_from)
+                          - (db.func.julianday(new.valid_until) - db.func.julianday(new.valid_from))
+                          > 1 / 86400))
+        )
+        alt_names = db.session.scalar(
+            db.select(db.func.count()).select_from(CertificateName)
+            .join(RenewalTask, RenewalTask.renewed_id == CertificateName.certificate_id)
+            .where(CertificateName.kind == 'dns')
+        )
+    assert mismatched == 0
+    assert alt_names == count(RenewalTask, RenewalTask.status == 'renewed', RenewalTask.certificate_id >= wave)
+    if simulated_issuer.available:
+        from cryptography import x509
+        with app.app_context():
+            bodies = db.session.execute(
+                db.select(CertificateBody.certificate_id, CertificateBody.encoding, CertificateBody.data)
+                .join(RenewalTask, RenewalTask.renewed_id == CertificateBody.certificate_id)
+            ).all()
+        assert len(bodies) == BACKLOG
+        # Signed with their id as the serial number
+        assert all(x509.load_der_x509_certificate(decompress(data, encoding)).serial_number == cert_id
+                   for cert_id, encoding, data in bodies)
+
+    # Planning again leaves renewed certificates alone
+    output = invoke('plan-renewals', '--rate', str(RATE))
+    assert int(re.search(r'Scheduled (\d+)', output).group(1)) == planned - BACKLOG
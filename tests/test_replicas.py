@@ -0,0 +1,103 @@
+"""Read replica routing, lag failover and read-your-writes, with simulated replication."""
+
+import os
+import sqlite3
+import time
+
+import pytest
+
+from conftest import MAX_LAG, PRIMARY_URL, REPLICA_URL
+
+
+def sqlite_path(url):
+    return url[len('sqlite:///'):]
+
+
+@pytest.fixture
+def replica(app):
+    from main import replica_pool
+
+    replica = replica_pool.replicas[0]
+    yield replica
+    # Other tests read from the primary
+    replica_pool.mark_down(replica, 'test finished')
+
+
+def replicate(replica):
+    """Bring the replica up to date by copying the primary over it, then run a health check."""
+    from main import replica_pool
+
+    replica.engine.dispose()
+    source = sqlite3.connect(sqlite_path(PRIMARY_URL))
+    target = sqlite3.connect(sqlite_path(REPLICA_URL))
+    source.backup(target)
+    source.close()
+    target.close()
+    replica_pool.check()
+
+
+def served_by(client, path):
+    """Send a GET and return ``(status, database that served it)``."""
+    from main import replica_requests
+
+    before = {tuple(labels): value for labels, value in replica_requests.snapshot()['samples']}
+    response = client.get(path)
+    response.close()
+    after = {tuple(labels): value for labels, value in replica_requests.snapshot()['samples']}
+    changed = [labels[0] for labels, value in after.items() if value != before.get(labels, 0)]
+    return response.status_code, changed[0] if changed else None
+
+
+def test_caught_up_replica_serves_reads(app, replica):
+    client = app.test_client()
+    replicate(replica)
+    assert replica.healthy and replica.lag == 0
+    replica_mtime = os.stat(sqlite_path(REPLICA_URL)).st_mtime_ns
+    for path in ('/api/v1/certificates?limit=50', '/api/v1/servers', '/', '/certificates', '/servers'):
+        assert served_by(client, path) == (200, replica.name), path
+    # Pages showing the dashboard counts must not write to the replica
+    assert os.stat(sqlite_path(REPLICA_URL)).st_mtime_ns == replica_mtime
+
+
+def test_read_your_writes_and_lag_failover(app, replica):
+    from main import replica_pool
+
+    anonymous, writer = app.test_client(), app.test_client()
+    replicate(replica)
+    response = writer.post('/api/v1/certificates/issue', json={
+        'common_name': 'replica-check.example.com', 'ttl': '24h', 'role': 'server', 'key_type': 'ec', 'key_bits': 256})
+    assert response.status_code == 201
+    path = f"/api/v1/certificates/{response.get_json()['certificate_id']}"
+
+    assert served_by(writer, path) == (200, 'primary')
+    # Stale within the allowed lag for everyone else
+    assert served_by(anonymous, path) == (404, replica.name)
+
+    # The monitor sees the write on the primary, then the replica stays behind
+    replica_pool.check()
+    assert replica.healthy
+    time.sleep(MAX_LAG + 0.1)
+    replica_pool.check()
+    assert not replica.healthy
+    assert served_by(anonymous, path) == (200, 'primary')
+
+    replicate(replica)
+    assert replica.healthy
+    assert served_by(writer, path) == (200, replica.name)
+
+
+def test_failed_replica_falls_back_to_the_primary(app, replica):
+    from main import replica_pool
+
+    client = app.test_client()
+    replicate(replica)
+    replica.engine.dispose()
+    os.remove(sqlite_path(REPLICA_URL))
+    assert served_by(client, '/api/v1/certificates?limit=50&sort=valid_until') == (200, 'primary')
+    assert not replica.healthy
+
+    replica.engine.dispose()
+    os.remove(sqlite_path(REPLICA_URL))
+    replica_pool.check()
+    assert not replica.healthy and replica.error
+    assert served_by(client, '/api/v1/servers') == (200, 'primary')
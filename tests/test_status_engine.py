@@ -0,0 +1,80 @@
+"""Status engine transitions under concurrent scheduling, driven by a fake clock."""
+
+import random
+import threading
+from datetime import timedelta
+
+SEEDED = 20000
+ROUNDS = 3
+THREADS = 4
+ISSUED = 25
+
+
+def test_certificates_scheduled_during_a_reload_expire_on_time(app, fake_clock):
+    """Certificates issued while the heap reloads are expired by it, without waiting for the next reload."""
+    from main import db, Certificate
+    from status_engine import EXPIRING_WINDOW, StatusEngine
+
+    clock = fake_clock
+    horizon = timedelta(hours=1)
+    engine = StatusEngine(db, Certificate, horizon=horizon, clock=clock, sleep=clock.sleep)
+    ours = Certificate.name.like('status-%')
+    rng = random.Random(0)
+
+    with app.app_context():
+        rows = []
+        for n in range(SEEDED):
+            valid_until = clock.now + timedelta(days=rng.uniform(-2, 60))
+            rows.append({'name': f'status-seed-{n}', 'common_name': f'seed-{n}.example.com',
+                         'issuer': 'Vault Intermediate CA', 'valid_from': valid_until - timedelta(days=90),
+                         'valid_until': valid_until, 'status': 'valid'})
+        db.session.execute(db.insert(Certificate), rows)
+        db.session.commit()
+
+    def issue(start, issued):
+        local = random.Random(threading.get_ident())
+        with app.app_context():
+            start.wait()
+            for n in range(ISSUED):
+                valid_until = clock.now + timedelta(seconds=local.uniform(60, horizon.total_seconds() - 120))
+                cert = Certificate(name=f'status-issued-{threading.get_ident()}-{n}', common_name='issued.example.com',
+                                   issuer='Vault Intermediate CA', valid_from=valid_until - timedelta(hours=1),
+                                   valid_until=valid_until, status='valid')
+                db.session.add(cert)
+                db.session.commit()
+                issued.append(cert.id)
+                engine.schedule(cert.id, cert.valid_until)
+
+    for _ in range(ROUNDS):
+        issued = []
+        start = threading.Barrier(THREADS + 1)
+        threads = [threading.Thread(target=issue, args=(start, issued)) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        loaded_at = clock.now
+        with app.app_context():
+            start.wait()
+            engine.run_once()
+            for thread in threads:
+                thread.join()
+            # Everything issued above is due now, and the horizon has not run out
+            clock.now = loaded_at + horizon - timedelta(seconds=1)
+            engine.run_once()
+            missed = db.session.scalar(
+                db.select(db.func.count()).select_from(Certificate)
+                .where(Certificate.id.in_(issued), Certificate.status != 'expired')
+            )
+            now = clock.now
+            wrong = db.session.scalar(
+                db.select(db.func.count()).select_from(Certificate).where(ours, db.or_(
+                    db.and_(Certificate.valid_until <= now, Certificate.status != 'expired'),
+                    db.and_(Certificate.valid_until > now,
+                            Certificate.valid_until <= now + EXPIRING_WINDOW, Certificate.status != 'expiring'),
+                    db.and_(Certificate.valid_until > now + EXPIRING_WINDOW, Certificate.status != 'valid'),
+                ))
+            )
+            db.session.rollback()
+        assert len(issued) == THREADS * ISSUED
+        assert missed == 0
+        assert wrong == 0
+        clock.now = loaded_at + horizon
@@ -0,0 +1,229 @@
+"""
+Concurrent Vault health poller.
+
+Every registered Vault server is polled with ``GET /v1/sys/health`` and
+``GET /v1/sys/seal-status`` concurrently on one asyncio event loop. Requests
+go over a small HTTP/1.1 keep-alive connection pool shared by all cycles, so
+a steady-state cycle reuses the connections opened by the previous one
+instead of paying a TCP (and TLS) handshake per server. Each server has its
+own timeout, and unreachable servers are retried with exponential backoff
+rather than on every cycle.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import ssl
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# /v1/sys/health status codes that mean the node is initialized, unsealed and serving
+HEALTHY_CODES = {200, 429, 472, 473}
+SEALED_CODE = 503
+NOT_INITIALIZED_CODE = 501
+
+
+class HTTPError(Exception):
+    """Raised when a response cannot be read."""
+
+
+class ConnectionClosed(HTTPError):
+    """Raised when the server closed the connection before sending a status line."""
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections, kept idle per (scheme, host, port)."""
+
+    def __init__(self, max_idle_per_host=2, ssl_context=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.ssl_context = ssl_context
+        self._idle = defaultdict(list)
+        self.opened = 0
+        self.reused = 0
+        # Requests sent again because a reused connection had been closed
+        self.retried = 0
+
+    async def _connect(self, scheme, host, port, reuse=True):
+        """Return ``(reader, writer, reused)``, taking an idle connection if ``reuse`` allows."""
+        key = (scheme, host, port)
+        while reuse and self._idle[key]:
+            reader, writer = self._idle[key].pop()
+            if not writer.is_closing() and not reader.at_eof():
+                self.reused += 1
+                return reader, writer, True
+            writer.close()
+        ssl_context = None
+        if scheme == 'https':
+            ssl_context = self.ssl_context or ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+        self.opened += 1
+        return reader, writer, False
+
+    def _release(self, key, reader, writer, keep_alive):
+        if keep_alive and len(self._idle[key]) < self.max_idle_per_host:
+            self._idle[key].append((reader, writer))
+        else:
+            writer.close()
+
+    async def get(self, scheme, host, port, path):
+        """Send a GET request and return ``(status, body)``.
+
+        The server may close an idle keep-alive connection just as it is
+        reused, which ``at_eof()`` cannot tell in advance. If a reused
+        connection is closed before the status line arrives, the request
+        is sent once more on a new connection.
+        """
+        reader, writer, reused = await self._connect(scheme, host, port)
+        try:
+            return await self._request(scheme, host, port, path, reader, writer)
+        except ConnectionClosed as err:
+            if not reused:
+                raise
+            logger.debug("Reused connection to %s:%s was closed (%s), retrying on a new one", host, port, err)
+            self.retried += 1
+        reader, writer, _ = await self._connect(scheme, host, port, reuse=False)
+        return await self._request(scheme, host, port, path, reader, writer)
+
+    async def _request(self, scheme, host, port, path, reader, writer):
+        key = (scheme, host, port)
+        try:
+            try:
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                    "Accept: application/json\r\nConnection: keep-alive\r\n\r\n".encode()
+                )
+                await writer.drain()
+                status_line = await reader.readline()
+            except (ConnectionResetError, BrokenPipeError) as err:
+                raise ConnectionClosed(f'Connection closed by server: {err}') from err
+            if not status_line:
+                raise ConnectionClosed('Connection closed by server')
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                raise HTTPError(f'Malformed status line: {status_line!r}')
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if headers.get('transfer-encoding', '').lower() == 'chunked':
+                body = b''
+                while True:
+                    size = int((await reader.readline()).split(b';')[0], 16)
+                    if size == 0:
+                        await reader.readline()
+                        break
+                    body += await reader.readexactly(size)
+                    await reader.readline()
+            else:
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+        except BaseException:
+            writer.close()
+            raise
+        self._release(key, reader, writer, headers.get('connection', '').lower() != 'close')
+        return status, body
+
+    def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+def parse_address(address, default_scheme='https'):
+    """Split a VaultServer address like "vault-0.vault-internal:8200" into (scheme, host, port)."""
+    if '://' not in address:
+        address = f'{default_scheme}://{address}'
+    parts = urlsplit(address)
+    return parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+
+
+class HealthPoller:
+    """Polls Vault servers concurrently and tracks per-server backoff."""
+
+    def __init__(self, pool=None, timeout=2.0, max_concurrency=100,
+                 base_backoff=5.0, max_backoff=300.0, default_scheme='https',
+                 clock=time.monotonic):
+        """
+        Args:
+            pool (ConnectionPool, optional): Connection pool shared across cycles
+            timeout (float): Seconds allowed for both requests to one server
+            max_concurrency (int): Maximum number of servers polled at once
+            base_backoff (float): Delay after the first failure, doubled on each further failure
+            max_backoff (float): Upper bound for the backoff delay
+            default_scheme (str): Scheme used for addresses without one
+            clock (callable): Monotonic clock in seconds
+        """
+        self.pool = pool or ConnectionPool()
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.default_scheme = default_scheme
+        self.clock = clock
+        self._failures = {}
+        self._retry_at = {}
+
+    def _backoff(self, server_id):
+        failures = self._failures.get(server_id, 0) + 1
+        self._failures[server_id] = failures
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (failures - 1))
+        # Jitter keeps servers that failed together from being retried together
+        self._retry_at[server_id] = self.clock() + delay * random.uniform(0.5, 1.0)
+
+    async def _fetch(self, scheme, host, port):
+        health_status, health_body = await self.pool.get(scheme, host, port, '/v1/sys/health')
+        seal_status, seal_body = await self.pool.get(scheme, host, port, '/v1/sys/seal-status')
+        health = json.loads(health_body or b'{}')
+        seal = json.loads(seal_body or b'{}') if seal_status == 200 else {}
+        return health_status, health, seal
+
+    async def poll_server(self, server_id, address):
+        """Poll one server.
+
+        Returns:
+            dict: Column values for the VaultServer row, or None if the server
+            is in backoff
+        """
+        if self._retry_at.get(server_id, 0) > self.clock():
+            return None
+        try:
+            scheme, host, port = parse_address(address, self.default_scheme)
+            code, health, seal = await asyncio.wait_for(self._fetch(scheme, host, port), self.timeout)
+        except (OSError, asyncio.TimeoutError, HTTPError, ValueError, asyncio.IncompleteReadError) as err:
+            logger.debug("Polling %s failed: %s", address, err)
+            self._backoff(server_id)
+            return {'id': server_id, 'status': 'unhealthy'}
+
+        self._failures.pop(server_id, None)
+        self._retry_at.pop(server_id, None)
+        sealed = seal.get('sealed', health.get('sealed', code == SEALED_CODE))
+        if code in HEALTHY_CODES and not sealed:
+            status = 'healthy'
+        elif code == SEALED_CODE or sealed:
+            status = 'degraded'
+        else:
+            status = 'unhealthy'
+        result = {'id': server_id, 'status': status, 'sealed': bool(sealed)}
+        version = health.get('version') or seal.get('version')
+        if version:
+            result['version'] = version
+        return result
+
+    async def poll_all(self, servers):
+        """Poll ``(server_id, address)`` pairs concurrently and return the results."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(server_id, address):
+            async with semaphore:
+                return await self.poll_server(server_id, address)
+
+        results = await asyncio.gather(*(bounded(server_id, address) for server_id, address in servers))
+        return [result for result in results if result is not None]